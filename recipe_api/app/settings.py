@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,9 +86,34 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
     }
 }
 
+# Read replicas of the primary, as comma separated DB_REPLICA_HOSTS sharing its name and credentials. Tests
+# give every replica its own test database and read from the primary, but for the replica tests, so DB_REPLICA_HOSTS
+# may point at the primary's server: DB_REPLICA_HOSTS=db docker-compose run app python manage.py test
+
+for number, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = dict(DATABASES['default'], HOST=host.strip(),
+                                         TEST={'NAME': f"test_{DATABASES['default']['NAME']}_replica{number}"})
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+
+TEST_RUNNER = 'core.test_runner.PrimaryReadsTestRunner'
+
+# Safe requests of the recipe, tag, ingredient and user endpoints read from the replicas, picked round_robin
+# or by least_latency; a user's reads stay on the primary for STICKY_SECONDS after they write. The pins are
+# kept in CACHE_ALIAS, which must be shared by every process (CACHE_BACKEND) when replicas are configured: the
+# core.E001 check rejects a process-local one
+
+DATABASE_REPLICAS = {
+    'ALIASES': [alias for alias in DATABASES if alias != 'default'],
+    'STRATEGY': os.environ.get('DB_REPLICA_STRATEGY', 'round_robin'),
+    'STICKY_SECONDS': int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5)),
+    'CACHE_ALIAS': 'default',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -137,3 +163,126 @@ STATIC_ROOT = '/vol/web/static'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
+
+# Token authentication cache used by user.authentication.CachedTokenAuthentication
+# Set CACHE_ALIAS to a shared cache (e.g. memcached or redis) to share entries between processes and invalidate
+# them in every process at once; without one, other processes accept revoked tokens for up to TTL seconds, which
+# the user.E001 check caps
+
+TOKEN_AUTH_CACHE = {
+    'MAX_ENTRIES': int(os.environ.get('TOKEN_AUTH_CACHE_MAX_ENTRIES', 10000)),
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60 if os.environ.get('TOKEN_AUTH_CACHE_ALIAS') else 5)),
+    'CACHE_ALIAS': os.environ.get('TOKEN_AUTH_CACHE_ALIAS') or None,
+}
+
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    },
+}
+
+# Per-user versioned response cache used by the recipe, tag and ingredient endpoints. The data versions also
+# back their ETags and the in-memory cookable and autocomplete indexes, so they must be shared by every process:
+# the cache is only on by default with a CACHE_BACKEND, and the recipe.E001 check rejects a process-local one
+
+RESPONSE_CACHE = {
+    'ENABLED': os.environ.get('RESPONSE_CACHE_ENABLED', '1' if 'CACHE_BACKEND' in os.environ else '0') == '1',
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300)),
+}
+
+# Recipe image thumbnails, rendered by recipe.thumbnails in a bounded process pool
+
+RECIPE_THUMBNAILS = {
+    'SIZES': {'small': 160, 'medium': 480, 'large': 1080},
+    'FORMAT': os.environ.get('RECIPE_THUMBNAIL_FORMAT', 'WEBP'),
+    'QUALITY': 80,
+    'WORKERS': int(os.environ.get('RECIPE_THUMBNAIL_WORKERS', 2)),
+    'EAGER': False,
+}
+
+# Per-user ingredient indexes answering recipe.views.RecipeViewSet.cookable, kept in an LRU per process. They are
+# only used with the shared RESPONSE_CACHE versions, which tell them about writes; otherwise the database ranks
+
+COOKABLE_INDEX = {
+    'MAX_USERS': int(os.environ.get('COOKABLE_INDEX_MAX_USERS', 1000)),
+}
+
+# Sorted in-memory name indexes answering the tag and ingredient ?prefix= autocomplete of the users
+# sending the most lookups to a process
+
+AUTOCOMPLETE_CACHE = {
+    'MAX_USERS': int(os.environ.get('AUTOCOMPLETE_CACHE_MAX_USERS', 50)),
+    'HOT_AFTER': int(os.environ.get('AUTOCOMPLETE_CACHE_HOT_AFTER', 20)),
+    'EAGER': False,
+}
+
+# Similar recipes of recipe.views.RecipeViewSet.similar; larger catalogues are precomputed by
+# the precompute_similar_recipes command
+
+SIMILAR_RECIPES = {
+    'ONLINE_MAX_RECIPES': int(os.environ.get('SIMILAR_RECIPES_ONLINE_MAX_RECIPES', 2000)),
+    'NEIGHBOURS': 50,
+    'BATCH_SIZE': 1000,
+    'MAX_OVERLAPS': int(os.environ.get('SIMILAR_RECIPES_MAX_OVERLAPS', 2000000)),
+}
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Async read views (recipe.async_views) run ORM reads in worker threads;
+# keep this off in production so reads run concurrently instead of on one shared thread.
+# ASYNC_READS_THREADS bounds the concurrent reads, and the database connections, of each process
+
+ASYNC_READS_THREAD_SENSITIVE = os.environ.get('ASYNC_READS_THREAD_SENSITIVE', '0') == '1'
+ASYNC_READS_THREADS = int(os.environ.get('ASYNC_READS_THREADS', 32))
+
+# Request metrics recorded by core.middleware.MetricsMiddleware and served on /metrics;
+# set METRICS_TOKEN to require an "Authorization: Bearer <token>" header from the scraper
+
+METRICS = {
+    'ENABLED': os.environ.get('METRICS_ENABLED', '1') == '1',
+    'TOKEN': os.environ.get('METRICS_TOKEN') or None,
+}
+
+# Pre-import the URLconf and serializers, and open the persistent database connections of every worker process,
+# when the WSGI/ASGI application starts (core.warmup), so the first requests do not pay for it
+
+WARM_UP = os.environ.get('WARM_UP', '1') == '1'
+
+# Logging
+# https://docs.djangoproject.com/en/3.2/topics/logging/
+# Django's default configuration hides INFO records, such as the warm-up phase timings
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.warmup': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+from core.warmup import warm_up, warm_up_enabled  # noqa: E402
+
+if warm_up_enabled():
+    warm_up()
@@ -1,10 +1,87 @@
 from django.contrib import admin
 from django.contrib.admin import ModelAdmin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.text import smart_split, unescape_string_literal
 from django.utils.translation import gettext_lazy as _
 
 from . import models
 
+ESTIMATE_COUNT_SQL = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+
+
+def estimate_count(queryset):
+    """Return the planner's row estimate of an unfiltered queryset's table, or None when unavailable
+
+    PostgreSQL refreshes pg_class.reltuples on VACUUM and ANALYZE, so the
+    estimate may lag behind recent writes. Filtered, distinct or sliced
+    querysets, and other databases, get None.
+    """
+    query = queryset.query
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or query.where or query.distinct or query.is_sliced:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(ESTIMATE_COUNT_SQL, [connection.ops.quote_name(queryset.model._meta.db_table)])
+        row = cursor.fetchone()
+    return row[0] if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator counting large unfiltered changelists from planner statistics instead of COUNT(*)
+
+    Below exact_count_threshold estimated rows, and for filtered or searched
+    changelists, the exact count is used.
+    """
+    exact_count_threshold = 100000
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < self.exact_count_threshold:
+            return super().count
+        return estimate
+
+
+class LargeTableAdmin(ModelAdmin):
+    """Changelist settings for tables too large for exact counts and sorting on arbitrary columns"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-id',)
+    sortable_by = ('id',)
+    raw_id_fields = ('user',)
+    list_select_related = ('user',)
+
+
+class TimeMinutesFilter(admin.SimpleListFilter):
+    """Filter recipes by cooking time ranges, answered from the time_minutes index"""
+    title = _('cooking time')
+    parameter_name = 'time'
+    ranges = {
+        'quick': (None, 15),
+        'medium': (16, 45),
+        'long': (46, None),
+    }
+
+    def lookups(self, request, model_admin):
+        return (
+            ('quick', _('15 minutes or less')),
+            ('medium', _('16 to 45 minutes')),
+            ('long', _('More than 45 minutes')),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.ranges:
+            return queryset
+        low, high = self.ranges[self.value()]
+        if low is not None:
+            queryset = queryset.filter(time_minutes__gte=low)
+        if high is not None:
+            queryset = queryset.filter(time_minutes__lte=high)
+        return queryset
+
 
 @admin.register(models.User)
 class UserAdmin(BaseUserAdmin):
@@ -26,16 +103,36 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class RecipeAttributeAdmin(LargeTableAdmin):
+    """Changelist of tags or ingredients, searched on their normalised name_key
+
+    Each search word must be contained in the name_key, which the trigram
+    index on it answers, for the changelist and the recipe autocomplete
+    widget alike.
+    """
+    list_display = ('id', 'name', 'user')
+    search_fields = ('name',)
+
+    def get_search_results(self, request, queryset, search_term):
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            queryset = queryset.filter(name_key__contains=models.normalize_name(bit))
+        return queryset, False
+
+
 @admin.register(models.Tag)
-class TagAdmin(ModelAdmin):
+class TagAdmin(RecipeAttributeAdmin):
     pass
 
 
 @admin.register(models.Ingredient)
-class IngredientAdmin(ModelAdmin):
+class IngredientAdmin(RecipeAttributeAdmin):
     pass
 
 
 @admin.register(models.Recipe)
-class RecipeAdmin(ModelAdmin):
-    pass
+class RecipeAdmin(LargeTableAdmin):
+    list_display = ('id', 'title', 'user', 'time_minutes', 'price')
+    list_filter = (TimeMinutesFilter,)
+    autocomplete_fields = ('tags', 'ingredients')
@@ -0,0 +1,105 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from rest_framework import exceptions, status
+from rest_framework.authentication import get_authorization_header
+from user.authentication import CachedTokenAuthentication, get_cached_credentials
+
+from .renderers import dumps
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_read_executor():
+    """Return the thread pool running the ORM reads of async views, sized by ASYNC_READS_THREADS"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(getattr(settings, 'ASYNC_READS_THREADS', 32),
+                                           thread_name_prefix='async-reads')
+        return _executor
+
+
+def sync_read(func):
+    """Wrap a read-only ORM callable to be awaited from an async view
+
+    Django's ORM is synchronous, so the call runs in a worker thread. With
+    ASYNC_READS_THREAD_SENSITIVE off, calls run concurrently in a dedicated
+    pool of ASYNC_READS_THREADS threads rather than the loop's default
+    executor, whose min(32, CPUs + 4) threads would bound the concurrent
+    reads on small hosts. Each thread keeps its own (persistent, per
+    CONN_MAX_AGE) connection; tests turn the setting on to share the test
+    transaction.
+    """
+    thread_sensitive = getattr(settings, 'ASYNC_READS_THREAD_SENSITIVE', False)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if not thread_sensitive:
+                close_old_connections()
+
+    if thread_sensitive:
+        return sync_to_async(wrapper, thread_sensitive=True)
+
+    @functools.wraps(func)
+    async def read(*args, **kwargs):
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, wrapper, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(get_read_executor(), call)
+
+    return read
+
+
+def json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    """Return a JSON response rendered with the API's JSON renderer"""
+    response = HttpResponse(dumps(data), status=status_code, content_type='application/json')
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+async def authenticate(request):
+    """Return the (user, token) of the request, skipping the thread hop when the token is cached locally"""
+    authenticator = CachedTokenAuthentication()
+    header = get_authorization_header(request).split()
+    if len(header) == 2 and header[0].lower() == authenticator.keyword.lower().encode():
+        credentials = get_cached_credentials(header[1].decode('latin1'))
+        if credentials is not None:
+            return credentials
+    return await sync_read(authenticator.authenticate)(request)
+
+
+def async_api_view(view):
+    """Turn an async function into a GET-only, token authenticated JSON view"""
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return json_response({'detail': f'Method "{request.method}" not allowed.'},
+                                 status.HTTP_405_METHOD_NOT_ALLOWED, {'Allow': 'GET'})
+        try:
+            credentials = await authenticate(request)
+        except exceptions.AuthenticationFailed as exc:
+            credentials, detail = None, exc.detail
+        else:
+            detail = exceptions.NotAuthenticated.default_detail
+        if credentials is None:
+            return json_response({'detail': detail}, status.HTTP_401_UNAUTHORIZED,
+                                 {'WWW-Authenticate': CachedTokenAuthentication.keyword})
+
+        request.user, request.auth = credentials
+        return await view(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,90 @@
+import math
+import random
+from collections import namedtuple
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from rest_framework.authtoken.models import Token
+
+from .models import Ingredient, Recipe, Tag
+from .signals import recipes_bulk_created
+
+
+def percentile(values, q):
+    """Return the q-th percentile (0-100) of the values using the nearest-rank method"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies, elapsed):
+    """Return throughput and latency percentiles, in milliseconds, of timed requests"""
+    return {
+        'requests': len(latencies),
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+BenchUser = namedtuple('BenchUser', 'id email token recipe_ids tag_ids ingredient_ids')
+
+
+def seed_dataset(users=10, recipes=100, tags=20, ingredients=50, links=3, password='benchmark', seed=0):
+    """Create users with tokens, tags, ingredients and recipes in bulk, and return the users
+
+    Every user gets the given number of tags, ingredients and recipes, and each
+    recipe is linked to ``links`` random tags and ingredients of its owner.
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+    hashed = make_password(password)
+    User.objects.bulk_create(
+        User(email=f'bench{index}@example.com', name=f'Bench {index}', password=hashed) for index in range(users))
+    user_ids = list(User.objects.filter(email__startswith='bench').order_by('id').values_list('id', flat=True))
+    Token.objects.bulk_create(Token(key=Token.generate_key(), user_id=user_id) for user_id in user_ids)
+
+    Tag.objects.bulk_create(
+        Tag(user_id=user_id, name=f'Tag {index}') for user_id in user_ids for index in range(tags))
+    Ingredient.objects.bulk_create(
+        Ingredient(user_id=user_id, name=f'Ingredient {index}') for user_id in user_ids for index in range(ingredients))
+    Recipe.objects.bulk_create(
+        Recipe(user_id=user_id, title=f'Recipe {index}', time_minutes=rng.randint(5, 120),
+               price=Decimal(rng.randint(100, 9999)) / 100)
+        for user_id in user_ids for index in range(recipes))
+
+    tag_ids = owned_ids(Tag, user_ids)
+    ingredient_ids = owned_ids(Ingredient, user_ids)
+    recipe_ids = owned_ids(Recipe, user_ids)
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+        for user_id in user_ids for recipe_id in recipe_ids[user_id]
+        for tag_id in rng.sample(tag_ids[user_id], min(links, tags)))
+    Recipe.ingredients.through.objects.bulk_create(
+        Recipe.ingredients.through(recipe_id=recipe_id, ingredient_id=ingredient_id)
+        for user_id in user_ids for recipe_id in recipe_ids[user_id]
+        for ingredient_id in rng.sample(ingredient_ids[user_id], min(links, ingredients)))
+
+    for user_id in user_ids:
+        recipes_bulk_created.send(sender=Recipe, user_id=user_id, recipe_ids=recipe_ids[user_id], using='default')
+
+    tokens = dict(Token.objects.filter(user_id__in=user_ids).values_list('user_id', 'key'))
+    emails = dict(User.objects.filter(id__in=user_ids).values_list('id', 'email'))
+    return [
+        BenchUser(user_id, emails[user_id], tokens[user_id], recipe_ids[user_id], tag_ids[user_id],
+                  ingredient_ids[user_id])
+        for user_id in user_ids
+    ]
+
+
+def owned_ids(model, user_ids):
+    """Return the ids of the model's rows grouped by owning user"""
+    grouped = {user_id: [] for user_id in user_ids}
+    for pk, user_id in model.objects.filter(user_id__in=user_ids).order_by('id').values_list('id', 'user_id'):
+        grouped[user_id].append(pk)
+    return grouped
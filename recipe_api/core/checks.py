@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from . import replicas
+
+# Cache backends whose entries are only seen by the process that wrote them
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_process_local_cache(alias):
+    """Return whether the cache alias keeps its entries in the memory of each process"""
+    return settings.CACHES.get(alias, {}).get('BACKEND') in PROCESS_LOCAL_CACHE_BACKENDS
+
+
+@register(Tags.caches, Tags.database)
+def check_shared_replica_pins(app_configs, **kwargs):
+    """Require the pins of users who wrote to live in a cache shared by every process when replicas are configured
+
+    A process that misses the pin set by another one would send the reads of
+    that user to a replica which may not have their write yet.
+    """
+    alias = replicas.get_config('CACHE_ALIAS')
+    if not replicas.get_config('ALIASES') or not is_process_local_cache(alias):
+        return []
+    return [Error(
+        f'DATABASE_REPLICAS pins users to the primary in the process-local cache "{alias}".',
+        hint='Set CACHE_BACKEND to a cache shared by every process, or leave DB_REPLICA_HOSTS unset.',
+        id='core.E001',
+    )]
@@ -0,0 +1,285 @@
+import contextvars
+import itertools
+import json
+import platform
+import threading
+import time
+from collections import namedtuple
+from importlib import import_module
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import URLResolver, reverse
+
+from core.benchmarks import seed_dataset, summarize
+
+PASSWORD = 'benchmark'
+
+# Mutable per-request query counter, propagated into sync_to_async worker threads by asgiref
+query_counter = contextvars.ContextVar('query_counter', default=None)
+
+Scenario = namedtuple('Scenario', 'route method kwargs data content_type')
+
+
+def scenario(route, method='GET', kwargs=None, data=None, content_type='application/json'):
+    """Return a benchmark scenario
+
+    kwargs and data (the query parameters of GETs) are callables of (user, request number).
+    """
+    return Scenario(route, method, kwargs, data, content_type)
+
+
+def recipe_pk(user, number):
+    return {'pk': user.recipe_ids[number % len(user.recipe_ids)]}
+
+
+SCENARIOS = (
+    scenario('recipe:api-root'),
+    scenario('recipe:tag-list'),
+    scenario('recipe:tag-list', 'POST', data=lambda user, number: {'name': f'Bench tag {number}'}),
+    scenario('recipe:tag-bulk', 'POST', data=lambda user, number: {
+        'names': ['Tag 0', 'Tag 1', f'Bench bulk tag {number}']}),
+    scenario('recipe:ingredient-list'),
+    scenario('recipe:ingredient-list', 'POST', data=lambda user, number: {'name': f'Bench ingredient {number}'}),
+    scenario('recipe:ingredient-bulk', 'POST', data=lambda user, number: {
+        'names': ['Ingredient 0', 'Ingredient 1', f'Bench bulk ingredient {number}']}),
+    scenario('recipe:recipe-list'),
+    scenario('recipe:recipe-list', 'POST', data=lambda user, number: {
+        'title': f'Bench recipe {number}', 'time_minutes': 10, 'price': '5.00',
+        'tags': user.tag_ids[:2], 'ingredients': user.ingredient_ids[:3]}),
+    scenario('recipe:recipe-detail', kwargs=recipe_pk),
+    scenario('recipe:recipe-export'),
+    scenario('recipe:recipe-stats'),
+    scenario('recipe:recipe-similar', kwargs=recipe_pk),
+    scenario('recipe:recipe-cookable', data=lambda user, number: {
+        'have': ','.join(str(pk) for pk in user.ingredient_ids[number % 10:number % 10 + 8])}),
+    scenario('recipe:recipe-bulk', 'POST', content_type='application/x-ndjson', data=lambda user, number: json.dumps({
+        'title': f'Bench import {number}', 'time_minutes': 10, 'price': '5.00', 'tags': ['Tag 0']})),
+    scenario('recipe:async-recipe-list'),
+    scenario('recipe:async-recipe-detail', kwargs=recipe_pk),
+    scenario('recipe:async-tag-list'),
+    scenario('recipe:async-ingredient-list'),
+    scenario('user:create', 'POST', data=lambda user, number: {
+        'email': f'bench-new{number}@example.com', 'password': PASSWORD, 'name': 'Bench'}),
+    scenario('user:token', 'POST', data=lambda user, number: {'email': user.email, 'password': PASSWORD}),
+    scenario('user:me'),
+)
+
+
+def iter_patterns(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(pattern.url_patterns)
+        else:
+            yield pattern
+
+
+def discover_routes(namespaces=('recipe', 'user')):
+    """Return the names of the routes of the app URLconfs, without format suffix variants"""
+    routes = set()
+    for namespace in namespaces:
+        for pattern in iter_patterns(import_module(f'{namespace}.urls').urlpatterns):
+            if pattern.name and 'format' not in pattern.pattern.regex.groupindex:
+                routes.add(f'{namespace}:{pattern.name}')
+    return routes
+
+
+def count_query(execute, sql, params, many, context):
+    counter = query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def add_query_counter(sender, connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+class Command(BaseCommand):
+    """Django command benchmarking every API route against a seeded throwaway database
+
+    The dataset is created in a fresh test database, which is destroyed
+    afterwards. Every route of recipe.urls and user.urls with a scenario is
+    driven through the test client by --concurrency threads, and latency
+    percentiles, throughput and SQL queries per request are written to a
+    JSON artifact that can be compared with an earlier run via --baseline.
+    """
+    help = 'Benchmark the API routes on a seeded throwaway database and write the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--recipes', type=int, default=200, help='Recipes per user')
+        parser.add_argument('--tags', type=int, default=20, help='Tags per user')
+        parser.add_argument('--ingredients', type=int, default=50, help='Ingredients per user')
+        parser.add_argument('--requests', type=int, default=200, help='Requests sent to each route')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent client threads')
+        parser.add_argument('--route', action='append', dest='routes', help='Only benchmark these route names')
+        parser.add_argument('--output', default='bench_api.json', help="JSON artifact path, or '-' for stdout")
+        parser.add_argument('--baseline', help='JSON artifact of an earlier run to compare with')
+        parser.add_argument(
+            '--max-regression', type=float,
+            help='Fail when a p95 latency grew by more than this percentage over the baseline')
+
+    def handle(self, *args, **options):
+        baseline = self.load_baseline(options['baseline']) if options['baseline'] else None
+        scenarios = [item for item in SCENARIOS if not options['routes'] or item.route in options['routes']]
+        if not scenarios:
+            raise CommandError('No scenario matches the requested routes')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        connection_created.connect(add_query_counter)
+        add_query_counter(None, connection)
+        # Only the primary gets a test database: reads routed to the replicas would see real data
+        primary_reads = override_settings(DATABASE_REPLICAS=dict(settings.DATABASE_REPLICAS, ALIASES=[]))
+        primary_reads.enable()
+        try:
+            start = time.perf_counter()
+            users = seed_dataset(
+                users=options['users'], recipes=options['recipes'], tags=options['tags'],
+                ingredients=options['ingredients'], password=PASSWORD)
+            seed_seconds = time.perf_counter() - start
+            results = {
+                f'{item.method} {item.route}': self.run_scenario(item, users, options) for item in scenarios
+            }
+        finally:
+            primary_reads.disable()
+            connection_created.disconnect(add_query_counter)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        artifact = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'dataset': {key: options[key] for key in ('users', 'recipes', 'tags', 'ingredients')},
+                'seed_seconds': round(seed_seconds, 3),
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+            },
+            'routes': results,
+            'skipped_routes': sorted(discover_routes() - {item.route for item in SCENARIOS}),
+        }
+        if baseline is not None:
+            artifact['comparison'] = self.compare(baseline, results)
+        self.write_artifact(artifact, options['output'])
+        self.report(artifact)
+
+        if baseline is not None and options['max_regression'] is not None:
+            regressed = [label for label, diff in artifact['comparison'].items()
+                         if diff['p95_ms_change_pct'] > options['max_regression']]
+            if regressed:
+                raise CommandError(f'p95 latency regressed by more than {options["max_regression"]}%: '
+                                   + ', '.join(regressed))
+
+    def run_scenario(self, item, users, options):
+        """Send the scenario's requests from concurrent client threads and summarize them"""
+        numbers = itertools.count()
+        lock = threading.Lock()
+        latencies = []
+        queries = []
+        errors = []
+
+        def client_loop():
+            client = Client(raise_request_exception=False)
+            while True:
+                with lock:
+                    number = next(numbers)
+                if number >= options['requests']:
+                    break
+                user = users[number % len(users)]
+                counter = [0]
+                context_token = query_counter.set(counter)
+                start = time.perf_counter()
+                response = self.send(client, item, user, number)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - start
+                query_counter.reset(context_token)
+                with lock:
+                    latencies.append(elapsed)
+                    queries.append(counter[0])
+                    if response.status_code >= 400:
+                        errors.append(response.status_code)
+            connections.close_all()
+
+        concurrency = options['concurrency']
+        if item.method != 'GET' and connection.vendor == 'sqlite':
+            # The shared in-memory SQLite test database locks whole tables on concurrent writes
+            concurrency = 1
+        threads = [threading.Thread(target=client_loop) for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = summarize(latencies, time.perf_counter() - start)
+        stats['concurrency'] = concurrency
+        stats['queries_per_request'] = round(sum(queries) / len(queries), 2) if queries else 0.0
+        stats['errors'] = len(errors)
+        return stats
+
+    def send(self, client, item, user, number):
+        url = reverse(item.route, kwargs=item.kwargs(user, number) if item.kwargs else None)
+        headers = {}
+        if not item.route.startswith(('user:create', 'user:token')):
+            headers['HTTP_AUTHORIZATION'] = f'Token {user.token}'
+        if item.method == 'GET':
+            return client.get(url, item.data(user, number) if item.data else None, **headers)
+        return client.generic(
+            item.method, url, self.encode(item, user, number), content_type=item.content_type, **headers)
+
+    def encode(self, item, user, number):
+        data = item.data(user, number) if item.data else ''
+        return data if isinstance(data, str) else json.dumps(data)
+
+    def load_baseline(self, path):
+        try:
+            with open(path) as baseline:
+                return json.load(baseline)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read baseline {path}: {exc}')
+
+    def compare(self, baseline, results):
+        """Return the relative change of each route's metrics against the baseline run"""
+        comparison = {}
+        for label, stats in results.items():
+            previous = baseline.get('routes', {}).get(label)
+            if not previous:
+                continue
+            comparison[label] = {
+                f'{metric}_change_pct': round((stats[metric] - previous[metric]) / previous[metric] * 100, 1)
+                if previous[metric] else 0.0
+                for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries_per_request')
+            }
+        return comparison
+
+    def write_artifact(self, artifact, path):
+        content = json.dumps(artifact, indent=2, sort_keys=True)
+        if path == '-':
+            self.stdout.write(content)
+            return
+        with open(path, 'w') as output:
+            output.write(content + '\n')
+        self.stderr.write(f'Wrote {path}')
+
+    def report(self, artifact):
+        comparison = artifact.get('comparison', {})
+        for label, stats in artifact['routes'].items():
+            line = (f'{label:<36} {stats["throughput_rps"]:>8.1f} req/s  p50 {stats["p50_ms"]:>8.2f}  '
+                    f'p95 {stats["p95_ms"]:>8.2f}  p99 {stats["p99_ms"]:>8.2f} ms  '
+                    f'{stats["queries_per_request"]:>6.2f} q/req  {stats["errors"]} errors')
+            if label in comparison:
+                line += f'  p95 {comparison[label]["p95_ms_change_pct"]:+.1f}%'
+            self.stderr.write(line)
+        if artifact['skipped_routes']:
+            self.stderr.write('Not benchmarked: ' + ', '.join(artifact['skipped_routes']))
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.benchmarks import summarize
+
+ROUTES = (
+    ('recipes', 'recipe:recipe-list', 'recipe:async-recipe-list'),
+    ('tags', 'recipe:tag-list', 'recipe:async-tag-list'),
+    ('ingredients', 'recipe:ingredient-list', 'recipe:async-ingredient-list'),
+)
+
+
+class Command(BaseCommand):
+    """Django command comparing the sync and async read endpoints under many concurrent clients
+
+    Each client sends its requests one after another. Sync requests go through
+    the WSGI handler and must hold one of --workers thread slots, like a
+    threaded WSGI server; async requests go through the ASGI handler on one
+    event loop. --db-latency adds a sleep to every query to model a slow or
+    distant database. The response cache is disabled by default so both sides
+    hit the database.
+    """
+    help = 'Compare latency and throughput of sync (WSGI) and async (ASGI) read endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', required=True, help='Email of the user whose data is read')
+        parser.add_argument('--clients', type=int, default=100, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=5, help='Requests sent by each client')
+        parser.add_argument('--workers', type=int, default=8, help='Thread slots of the simulated WSGI server')
+        parser.add_argument('--db-latency', type=float, default=20.0, help='Milliseconds added to every query')
+        parser.add_argument(
+            '--response-cache', action='store_true',
+            help='Keep the response cache of the sync endpoints enabled (the async ones have none)')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User {options["email"]} does not exist')
+        token, _ = Token.objects.get_or_create(user=user)
+        self.authorization = f'Token {token.key}'
+
+        delay = options['db_latency'] / 1000
+        self.install_latency(delay)
+        try:
+            with override_settings(
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                    RESPONSE_CACHE={**settings.RESPONSE_CACHE, 'ENABLED': options['response_cache']}):
+                for name, sync_route, async_route in ROUTES:
+                    sync_stats = self.run_sync(reverse(sync_route), options)
+                    async_stats = self.run_async(reverse(async_route), options)
+                    self.report(name, 'sync', sync_stats)
+                    self.report(name, 'async', async_stats)
+        finally:
+            connection_created.disconnect(self.add_latency_wrapper)
+
+    def install_latency(self, delay):
+        """Add the simulated latency to every database connection, in every thread"""
+        def slow_execute(execute, sql, params, many, context):
+            time.sleep(delay)
+            return execute(sql, params, many, context)
+
+        self.slow_execute = slow_execute
+        connection_created.connect(self.add_latency_wrapper)
+
+    def add_latency_wrapper(self, sender, connection, **kwargs):
+        if self.slow_execute not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self.slow_execute)
+
+    def run_sync(self, path, options):
+        """Drive a sync endpoint with client threads sharing a fixed number of worker slots"""
+        slots = threading.Semaphore(options['workers'])
+        latencies = []
+        lock = threading.Lock()
+
+        def client_loop():
+            client = Client()
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                with slots:
+                    response = client.get(path, HTTP_AUTHORIZATION=self.authorization)
+                    connections.close_all()
+                elapsed = time.perf_counter() - start
+                self.check_response(response, path)
+                with lock:
+                    latencies.append(elapsed)
+
+        threads = [threading.Thread(target=client_loop) for _ in range(options['clients'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return summarize(latencies, time.perf_counter() - start)
+
+    def run_async(self, path, options):
+        """Drive an async endpoint with client coroutines on a single event loop"""
+        latencies = []
+
+        async def client_loop():
+            client = AsyncClient()
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                response = await client.get(path, authorization=self.authorization)
+                latencies.append(time.perf_counter() - start)
+                self.check_response(response, path)
+
+        async def run():
+            await asyncio.gather(*(client_loop() for _ in range(options['clients'])))
+
+        start = time.perf_counter()
+        asyncio.run(run())
+        return summarize(latencies, time.perf_counter() - start)
+
+    def check_response(self, response, path):
+        if response.status_code != 200:
+            raise CommandError(f'GET {path} returned {response.status_code}')
+
+    def report(self, name, mode, stats):
+        self.stdout.write(
+            f'{name:<12} {mode:<6} {stats["requests"]:>6} req  {stats["throughput_rps"]:>8.1f} req/s  '
+            f'p50 {stats["p50_ms"]:>8.2f} ms  p95 {stats["p95_ms"]:>8.2f} ms  p99 {stats["p99_ms"]:>8.2f} ms')
@@ -0,0 +1,46 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from core.similarity import clear_neighbours, get_config, precompute_neighbours
+
+
+class Command(BaseCommand):
+    """Django command storing the most similar recipes of every recipe of large catalogues
+
+    Catalogues of at most SIMILAR_RECIPES['ONLINE_MAX_RECIPES'] recipes are
+    cheap to compute on the fly, so their stored neighbours are dropped
+    instead unless --all is given. Run it periodically: stored lists are
+    not updated when other recipes change.
+    """
+    help = 'Precompute and store the similar recipes of every recipe of users with large catalogues'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='Only handle the user with this email')
+        parser.add_argument('--all', action='store_true', help='Also precompute small catalogues')
+        parser.add_argument('--neighbours', type=int, help='Neighbours stored per recipe')
+        parser.add_argument('--batch-size', type=int, help='Recipes scored per sparse matrix product')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        if options['email']:
+            users = users.filter(email=options['email'])
+            if not users.exists():
+                raise CommandError(f'User {options["email"]} does not exist')
+
+        online_max = get_config('ONLINE_MAX_RECIPES')
+        start = time.perf_counter()
+        computed = cleared = stored = 0
+        for user_id, recipe_count in users.annotate(recipe_count=Count('recipe')).values_list('pk', 'recipe_count'):
+            if recipe_count <= online_max and not options['all']:
+                clear_neighbours(user_id)
+                cleared += 1
+                continue
+            stored += precompute_neighbours(user_id, k=options['neighbours'], batch_size=options['batch_size'])
+            computed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {stored} neighbours for {computed} users in {time.perf_counter() - start:.2f}s, '
+            f'{cleared} small catalogues left to on the fly computation'))
@@ -0,0 +1,55 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import RecipeStats
+from core.stats import aggregate_stats, rebuild_stats
+
+COMPARED_FIELDS = ('recipe_count', 'price_counts', 'time_counts', 'tag_counts', 'ingredient_counts')
+
+
+class Command(BaseCommand):
+    """Django command recomputing the incrementally maintained recipe statistics
+
+    With --check nothing is written: the stored statistics are compared with
+    a fresh aggregate and the command fails when any of them drifted.
+    """
+    help = 'Recompute the recipe statistics of every user, or check them against a full aggregate'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='Only handle the user with this email')
+        parser.add_argument('--check', action='store_true', help='Compare instead of rebuilding')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        if options['email']:
+            users = users.filter(email=options['email'])
+            if not users.exists():
+                raise CommandError(f'User {options["email"]} does not exist')
+        user_ids = users.values_list('pk', flat=True)
+
+        start = time.perf_counter()
+        if options['check']:
+            self.check_stats(user_ids)
+        else:
+            count = 0
+            for user_id in user_ids.iterator():
+                rebuild_stats(user_id)
+                count += 1
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt the statistics of {count} users in {time.perf_counter() - start:.2f}s'))
+
+    def check_stats(self, user_ids):
+        stored = RecipeStats.objects.in_bulk(list(user_ids))
+        drifted = 0
+        for user_id, stats in stored.items():
+            expected = aggregate_stats(user_id)
+            fields = [field for field in COMPARED_FIELDS if getattr(stats, field) != getattr(expected, field)]
+            if fields:
+                drifted += 1
+                self.stdout.write(f'User {user_id}: {", ".join(fields)} differ')
+
+        self.stdout.write(f'Checked the statistics of {len(stored)} users, {drifted} inconsistent')
+        if drifted:
+            raise CommandError('Recipe statistics are inconsistent, run rebuild_recipe_stats to repair them')
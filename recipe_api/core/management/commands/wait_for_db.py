@@ -1,6 +1,6 @@
 import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import OperationalError
 from django.db import connections
 
@@ -8,13 +8,32 @@ from django.db import connections
 class Command(BaseCommand):
     """Django command to pause execution until database is available"""
 
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to wait for')
+        parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait before giving up')
+        parser.add_argument('--initial-delay', type=float, default=0.1, help='Seconds before the first retry')
+        parser.add_argument('--max-delay', type=float, default=5, help='Upper bound of the retry delay')
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
-        db_connection = None
-        while not db_connection:
+        start = time.monotonic()
+        deadline = start + options['timeout']
+        delay = options['initial_delay']
+        attempts = 0
+        connection = connections[options['database']]
+        while True:
+            attempts += 1
             try:
-                db_connection = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
-        self.stdout.write(self.style.SUCCESS('Database is available!'))
+                connection.ensure_connection()
+                break
+            except OperationalError as exc:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(f'Database unavailable after {attempts} attempts: {exc}')
+                delay = min(delay, remaining)
+                self.stdout.write(f'Database unavailable, waiting {delay:.1f} seconds...')
+                time.sleep(delay)
+                delay = min(delay * 2, options['max_delay'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Database is available! ({attempts} attempts, {time.monotonic() - start:.3f}s)'))
@@ -0,0 +1,201 @@
+import contextvars
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+DEFAULTS = {
+    'ENABLED': True,
+    'TOKEN': None,
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# [query count, query seconds] of the request being handled, shared with sync_to_async worker threads
+request_queries = contextvars.ContextVar('request_queries', default=None)
+
+
+def get_config(name):
+    """Return a metrics setting from METRICS"""
+    return getattr(settings, 'METRICS', {}).get(name, DEFAULTS[name])
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper adding the query and its duration to the current request's totals"""
+    totals = request_queries.get()
+    if totals is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        totals[0] += 1
+        totals[1] += time.perf_counter() - start
+
+
+class Histogram:
+    """Bucketed observations; counts are stored per bucket and made cumulative on export"""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        for index, value in enumerate(other.counts):
+            self.counts[index] += value
+        self.sum += other.sum
+        self.count += other.count
+
+
+class Shard:
+    """Metrics recorded by a single thread; only that thread ever writes to it"""
+
+    def __init__(self):
+        self.requests = defaultdict(int)
+        self.latency = {}
+        self.sizes = {}
+        self.queries = {}
+        self.query_seconds = defaultdict(float)
+
+    def histogram(self, metric, key, buckets):
+        histogram = metric.get(key)
+        if histogram is None:
+            histogram = metric[key] = Histogram(buckets)
+        return histogram
+
+    def merge(self, other):
+        for key, value in list(other.requests.items()):
+            self.requests[key] += value
+        for key, value in list(other.query_seconds.items()):
+            self.query_seconds[key] += value
+        for name in ('latency', 'sizes', 'queries'):
+            merged = getattr(self, name)
+            for key, histogram in list(getattr(other, name).items()):
+                self.histogram(merged, key, histogram.buckets).merge(histogram)
+
+
+class ShardOwner:
+    """Kept in the thread-local of the thread recording into a shard, so the shard retires when the thread exits"""
+
+
+class MetricsRegistry:
+    """Request metrics sharded per thread so recording never takes a lock
+
+    Each thread lazily registers its own shard, which is the only time the
+    registry lock is taken besides scrapes. When the thread exits its shard
+    is folded into a retired one, so servers starting a thread per
+    connection keep one shard per live thread. Metrics are per process, so
+    scrape every worker process separately.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.shards = []
+        self.retired = Shard()
+
+    def get_shard(self):
+        shard = getattr(self.local, 'shard', None)
+        if shard is None:
+            shard = Shard()
+            with self.lock:
+                self.shards.append(shard)
+            self.local.owner = ShardOwner()
+            weakref.finalize(self.local.owner, self.retire, shard)
+            self.local.shard = shard
+        return shard
+
+    def retire(self, shard):
+        """Fold the shard of an exited thread into the retired metrics"""
+        with self.lock:
+            self.retired.merge(shard)
+            self.shards.remove(shard)
+
+    def observe_request(self, route, method, status, duration, size, queries, query_seconds):
+        """Record one handled request; size is None for streaming responses"""
+        shard = self.get_shard()
+        shard.requests[route, method, status] += 1
+        shard.histogram(shard.latency, (route, method), LATENCY_BUCKETS).observe(duration)
+        shard.histogram(shard.queries, (route,), QUERY_COUNT_BUCKETS).observe(queries)
+        shard.query_seconds[route] += query_seconds
+        if size is not None:
+            shard.histogram(shard.sizes, (route,), SIZE_BUCKETS).observe(size)
+
+    def collect(self):
+        """Return the merged metrics of all shards, retired ones included"""
+        total = Shard()
+        with self.lock:
+            total.merge(self.retired)
+            for shard in self.shards:
+                total.merge(shard)
+        histograms = {'latency': total.latency, 'sizes': total.sizes, 'queries': total.queries}
+        return total.requests, total.query_seconds, histograms
+
+    def reset(self):
+        with self.lock:
+            self.retired.__init__()
+            for shard in self.shards:
+                shard.__init__()
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format"""
+        requests, query_seconds, histograms = self.collect()
+        lines = [
+            '# HELP http_requests_total Handled HTTP requests.',
+            '# TYPE http_requests_total counter',
+        ]
+        for (route, method, status), value in sorted(requests.items()):
+            lines.append(f'http_requests_total{labels(route=route, method=method, status=status)} {value}')
+
+        lines += render_histogram(
+            'http_request_duration_seconds', 'Time spent handling requests.',
+            histograms['latency'], ('route', 'method'))
+        lines += render_histogram(
+            'http_response_size_bytes', 'Size of non-streaming response bodies.', histograms['sizes'], ('route',))
+        lines += render_histogram(
+            'db_queries_per_request', 'SQL queries executed per request.', histograms['queries'], ('route',))
+
+        lines += [
+            '# HELP db_query_duration_seconds_total Time spent executing SQL queries.',
+            '# TYPE db_query_duration_seconds_total counter',
+        ]
+        for route, value in sorted(query_seconds.items()):
+            lines.append(f'db_query_duration_seconds_total{labels(route=route)} {value:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def labels(**values):
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in values.items()) + '}'
+
+
+def render_histogram(name, description, histograms, label_names):
+    lines = [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+    for key, histogram in sorted(histograms.items()):
+        base = dict(zip(label_names, key))
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{labels(**base, le=bound)} {cumulative}')
+        lines.append(f'{name}_sum{labels(**base)} {histogram.sum:.6f}')
+        lines.append(f'{name}_count{labels(**base)} {histogram.count}')
+    return lines
+
+
+registry = MetricsRegistry()
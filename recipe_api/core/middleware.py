@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from django.core.exceptions import MiddlewareNotUsed
+
+from .metrics import get_config, registry, request_queries
+
+try:
+    from asgiref.sync import markcoroutinefunction
+except ImportError:  # asgiref < 3.6
+    def markcoroutinefunction(func):
+        func._is_coroutine = asyncio.coroutines._is_coroutine
+        return func
+
+
+class MetricsMiddleware:
+    """Record latency, status, response size and SQL usage of every request per route name
+
+    The middleware runs natively in both modes, so ASGI requests are not
+    funnelled through a single sync thread to be measured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_config('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        totals = [0, 0.0]
+        context_token = request_queries.set(totals)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_queries.reset(context_token)
+        return self.observe(request, response, time.perf_counter() - start, totals)
+
+    async def __acall__(self, request):
+        totals = [0, 0.0]
+        context_token = request_queries.set(totals)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_queries.reset(context_token)
+        return self.observe(request, response, time.perf_counter() - start, totals)
+
+    def observe(self, request, response, duration, totals):
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        registry.observe_request(route, request.method, response.status_code, duration, size, totals[0], totals[1])
+        return response
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Add (attribute_id, recipe_id) indexes to the recipe M2M through tables
+
+    The auto-created through tables only index (recipe_id, attribute_id) and
+    each column on its own, so filtering recipes by tag or ingredient could not
+    be answered from the index alone.
+    """
+
+    dependencies = [
+        ('core', '0004_recipe'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX core_recipe_tags_tag_recipe_idx ON core_recipe_tags (tag_id, recipe_id);',
+            reverse_sql='DROP INDEX core_recipe_tags_tag_recipe_idx;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX core_recipe_ingredients_ingredient_recipe_idx '
+                'ON core_recipe_ingredients (ingredient_id, recipe_id);',
+            reverse_sql='DROP INDEX core_recipe_ingredients_ingredient_recipe_idx;',
+        ),
+    ]
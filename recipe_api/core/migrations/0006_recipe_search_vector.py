@@ -0,0 +1,59 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+CREATE_INDEX = 'CREATE INDEX core_recipe_search_gin ON core_recipe USING gin (search_vector);'
+
+DROP_INDEX = 'DROP INDEX core_recipe_search_gin;'
+
+BACKFILL = """
+UPDATE core_recipe SET search_vector =
+    setweight(to_tsvector('english', title), 'A')
+    || setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(t.name, ' ') FROM core_tag t
+        JOIN core_recipe_tags rt ON rt.tag_id = t.id WHERE rt.recipe_id = core_recipe.id), '')), 'B')
+    || setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(i.name, ' ') FROM core_ingredient i
+        JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id WHERE ri.recipe_id = core_recipe.id), '')), 'C');
+"""
+
+
+def create_search_index(apps, schema_editor):
+    """Create and backfill the GIN index on PostgreSQL only"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(BACKFILL)
+    schema_editor.execute(CREATE_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_through_reverse_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='recipe',
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        fields=['search_vector'], name='core_recipe_search_gin'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_index, drop_search_index),
+            ],
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, model_name, relation):
+    """Keep the oldest of each user's same-named tags or ingredients and move recipe links onto it"""
+    model = apps.get_model('core', model_name)
+    through = getattr(apps.get_model('core', 'Recipe'), relation).through
+    column = f'{model_name.lower()}_id'
+
+    groups = (model.objects.values('user_id', 'name')
+              .annotate(keep=Min('id'), total=Count('id'))
+              .filter(total__gt=1)
+              .order_by())
+    for group in groups.iterator():
+        duplicate_ids = list(model.objects.filter(user_id=group['user_id'], name=group['name'])
+                             .exclude(pk=group['keep']).values_list('pk', flat=True))
+        linked = set(through.objects.filter(**{column: group['keep']}).values_list('recipe_id', flat=True))
+        moved = set(through.objects.filter(**{f'{column}__in': duplicate_ids})
+                    .values_list('recipe_id', flat=True)) - linked
+        through.objects.filter(**{f'{column}__in': duplicate_ids}).delete()
+        through.objects.bulk_create([through(recipe_id=recipe_id, **{column: group['keep']}) for recipe_id in moved])
+        model.objects.filter(pk__in=duplicate_ids).delete()
+
+
+def merge_duplicate_attributes(apps, schema_editor):
+    merge_duplicates(apps, 'Tag', 'tags')
+    merge_duplicates(apps, 'Ingredient', 'ingredients')
+
+
+class Migration(migrations.Migration):
+    """Merge tags and ingredients a user has more than once under the same name
+
+    Runs separately from the migration adding the unique constraints, as
+    PostgreSQL refuses to alter a table with pending deferred foreign key
+    checks in the same transaction.
+    """
+
+    dependencies = [
+        ('core', '0007_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_attributes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+# Prefix lookups and their ordering use the C collation expression index, trigram
+# substring lookups the GIN index, both on the upper cased name matched by recipe.autocomplete
+CREATE_INDEXES = """
+CREATE INDEX {table}_name_prefix ON {table} (user_id, (upper(name) COLLATE "C"));
+CREATE INDEX {table}_name_trgm ON {table} USING gin (upper(name) gin_trgm_ops);
+"""
+
+DROP_INDEXES = """
+DROP INDEX {table}_name_prefix;
+DROP INDEX {table}_name_trgm;
+"""
+
+TABLES = ('core_tag', 'core_ingredient')
+
+
+def create_name_indexes(apps, schema_editor):
+    """Create the name autocomplete indexes on PostgreSQL only"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+    for table in TABLES:
+        schema_editor.execute(CREATE_INDEXES.format(table=table))
+
+
+def drop_name_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        schema_editor.execute(DROP_INDEXES.format(table=table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipe_neighbours'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_name_indexes, drop_name_indexes),
+    ]
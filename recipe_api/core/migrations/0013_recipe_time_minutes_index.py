@@ -0,0 +1,17 @@
+# Generated by Django 3.2.6 on 2026-10-18 02:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_attribute_name_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['time_minutes'], name='core_recipe_time_minutes_idx'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+import unicodedata
+
+from django.db import migrations, models
+
+# The autocomplete indexes of 0012 move from upper(name) onto the normalised name_key column, which SQL,
+# the in-memory name indexes and the tag and ingredient admin searches all match prefixes and substrings against
+CREATE_INDEXES = """
+CREATE INDEX {table}_name_key_prefix ON {table} (user_id, name_key COLLATE "C");
+CREATE INDEX {table}_name_key_trgm ON {table} USING gin (name_key gin_trgm_ops);
+"""
+
+DROP_INDEXES = """
+DROP INDEX {table}_name_key_prefix;
+DROP INDEX {table}_name_key_trgm;
+"""
+
+CREATE_UPPER_INDEXES = """
+CREATE INDEX {table}_name_prefix ON {table} (user_id, (upper(name) COLLATE "C"));
+CREATE INDEX {table}_name_trgm ON {table} USING gin (upper(name) gin_trgm_ops);
+"""
+
+DROP_UPPER_INDEXES = """
+DROP INDEX {table}_name_prefix;
+DROP INDEX {table}_name_trgm;
+"""
+
+TABLES = ('core_tag', 'core_ingredient')
+
+
+def normalize_name(name):
+    """Frozen copy of core.models.normalize_name"""
+    return unicodedata.normalize('NFKC', name).casefold()
+
+
+def fill_name_keys(apps, schema_editor):
+    for model_name in ('Tag', 'Ingredient'):
+        model = apps.get_model('core', model_name)
+        instances = model.objects.using(schema_editor.connection.alias).only('id', 'name').order_by('id')
+        batch = []
+        for instance in instances.iterator(chunk_size=1000):
+            instance.name_key = normalize_name(instance.name)
+            batch.append(instance)
+            if len(batch) == 1000:
+                model.objects.using(schema_editor.connection.alias).bulk_update(batch, ['name_key'])
+                batch = []
+        model.objects.using(schema_editor.connection.alias).bulk_update(batch, ['name_key'])
+
+
+def create_name_key_indexes(apps, schema_editor):
+    """Swap the upper(name) autocomplete indexes for name_key ones, on PostgreSQL only"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        schema_editor.execute(DROP_UPPER_INDEXES.format(table=table))
+        schema_editor.execute(CREATE_INDEXES.format(table=table))
+
+
+def drop_name_key_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        schema_editor.execute(DROP_INDEXES.format(table=table))
+        schema_editor.execute(CREATE_UPPER_INDEXES.format(table=table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipe_time_minutes_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='name_key',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='name_key',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(fill_name_keys, migrations.RunPython.noop),
+        migrations.RunPython(create_name_key_indexes, drop_name_key_indexes),
+    ]
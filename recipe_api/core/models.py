@@ -1,8 +1,25 @@
+import os
+import unicodedata
+import uuid
+
 from django.conf import settings
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 
+def recipe_image_file_path(instance, filename):
+    """Generate file path for a new recipe image"""
+    extension = os.path.splitext(filename)[1].lower()
+    return os.path.join('uploads', 'recipe', f'{uuid.uuid4()}{extension}')
+
+
+def normalize_name(name):
+    """Return the caseless form tag and ingredient names are searched and ordered by, in SQL and in memory alike"""
+    return unicodedata.normalize('NFKC', name).casefold()
+
+
 class UserManager(BaseUserManager):
 
     def create_user(self, email, password=None, **extra_fields):
@@ -36,23 +53,74 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
-class Tag(models.Model):
+class RecipeAttributeManager(models.Manager):
+    """Manager for tags and ingredients, whose names are unique per user"""
+
+    def get_or_create_names(self, user, names, batch_size=None):
+        """Return a name to instance map for the names, creating the missing ones, and the created names
+
+        Names that already exist cost a single query. Missing names are inserted
+        in bulk ignoring conflicts, so concurrent requests creating the same
+        names do not fail, and are then read back.
+        """
+        names = list(dict.fromkeys(names))
+        queryset = self.filter(user=user)
+        found = {instance.name: instance for instance in queryset.filter(name__in=names)}
+        missing = [name for name in names if name not in found]
+        if missing:
+            self.bulk_create([self.model(user=user, name=name) for name in missing],
+                             batch_size=batch_size, ignore_conflicts=True)
+            found.update((instance.name, instance) for instance in queryset.filter(name__in=missing))
+        return found, missing
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.name_key = normalize_name(obj.name)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class RecipeAttribute(models.Model):
+    """Base of tags and ingredients, keeping the normalised name_key of their name"""
+    name_key = models.TextField(editable=False, default='')
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, update_fields=None, **kwargs):
+        self.name_key = normalize_name(self.name)
+        if update_fields is not None and 'name' in update_fields:
+            update_fields = {*update_fields, 'name_key'}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class Tag(RecipeAttribute):
     """Tag model for a recipe"""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
-    objects = models.Manager()
+    objects = RecipeAttributeManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='core_tag_user_name_uniq'),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(RecipeAttribute):
     """Ingredient model for a recipe"""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
-    objects = models.Manager()
+    objects = RecipeAttributeManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='core_ingredient_user_name_uniq'),
+        ]
 
     def __str__(self):
         return self.name
@@ -67,8 +135,52 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
+    image = models.ImageField(null=True, blank=True, upload_to=recipe_image_file_path)
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     objects = models.Manager()
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='core_recipe_search_gin'),
+            models.Index(fields=['time_minutes'], name='core_recipe_time_minutes_idx'),
+        ]
+
     def __str__(self):
         return self.title
+
+
+class RecipeStats(models.Model):
+    """Recipe statistics of a user, kept up to date incrementally by core.stats"""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='recipe_stats')
+    recipe_count = models.PositiveIntegerField(default=0)
+    # Histograms keyed by price in cents, time in minutes and tag or ingredient id
+    price_counts = models.JSONField(default=dict)
+    time_counts = models.JSONField(default=dict)
+    tag_counts = models.JSONField(default=dict)
+    ingredient_counts = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f'Recipe statistics of {self.user_id}'
+
+
+class RecipeNeighbour(models.Model):
+    """A precomputed most similar recipe of a recipe, written by precompute_similar_recipes"""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='neighbours')
+    neighbour = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    # Jaccard similarity of the tags and ingredients of both recipes
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'rank'], name='core_recipeneighbour_recipe_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.neighbour_id} is neighbour {self.rank} of {self.recipe_id}'
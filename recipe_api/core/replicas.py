@@ -0,0 +1,127 @@
+import contextvars
+import itertools
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+DEFAULTS = {
+    'ALIASES': [],
+    'STRATEGY': 'round_robin',
+    'STICKY_SECONDS': 5,
+    'CACHE_ALIAS': 'default',
+    'LATENCY_WEIGHT': 0.2,
+    'PROBE_EVERY': 100,
+}
+
+# Whether the ORM reads of the request being handled may be served by a replica, shared with sync_to_async threads
+replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+# Moving average of the query seconds of every replica alias, for the least_latency strategy
+replica_latencies = {}
+
+_choices = itertools.count()
+
+
+def get_config(name):
+    """Return a read replica setting from DATABASE_REPLICAS"""
+    return getattr(settings, 'DATABASE_REPLICAS', {}).get(name, DEFAULTS[name])
+
+
+def pinned_key(user_id):
+    return f'replicas:pinned:{user_id}'
+
+
+def pin_to_primary(user):
+    """Send the reads of the user to the primary for STICKY_SECONDS, so they see their own writes"""
+    if user.is_authenticated and get_config('ALIASES'):
+        caches[get_config('CACHE_ALIAS')].set(pinned_key(user.pk), True, get_config('STICKY_SECONDS'))
+
+
+def is_pinned(user):
+    """Return whether the user wrote recently enough for replicas to miss it"""
+    return user.is_authenticated and bool(caches[get_config('CACHE_ALIAS')].get(pinned_key(user.pk)))
+
+
+def record_replica_latency(execute, sql, params, many, context):
+    """Execute wrapper folding the duration of the query into the moving average of its replica
+
+    Concurrent updates race without a lock, which only loses an observation.
+    """
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        alias = context['connection'].alias
+        duration = time.perf_counter() - start
+        previous = replica_latencies.get(alias)
+        weight = get_config('LATENCY_WEIGHT')
+        replica_latencies[alias] = duration if previous is None else previous + weight * (duration - previous)
+
+
+def choose_replica(aliases):
+    """Return the replica alias to read from with the configured STRATEGY
+
+    round_robin cycles through the replicas. least_latency picks the one
+    with the lowest moving average query time, trying unmeasured replicas
+    first, and still cycles one read in PROBE_EVERY so a replica that was
+    slow gets measured again once it recovers.
+    """
+    choice = next(_choices)
+    if get_config('STRATEGY') == 'least_latency' and choice % get_config('PROBE_EVERY'):
+        return min(aliases, key=lambda alias: replica_latencies.get(alias, 0.0))
+    return aliases[choice % len(aliases)]
+
+
+class ReplicaRouter:
+    """Database router sending reads marked by ReplicaReadsMixin to the replicas, everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        aliases = get_config('ALIASES')
+        if aliases and replica_reads.get():
+            return choose_replica(aliases)
+        return None
+
+    def db_for_write(self, model, **hints):
+        """Write to the primary, even objects read from a replica"""
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Replicas hold the same rows as the primary, so objects read from any of them may be related"""
+        databases = {DEFAULT_DB_ALIAS, *get_config('ALIASES')}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaReadsMixin:
+    """Serve the safe requests of an API view from the read replicas, and pin users who write to the primary
+
+    Requests are authenticated against the primary first. Reads made while
+    streaming a response after the view returned go to the primary. Keep
+    STICKY_SECONDS above the replication lag: reads after it may be served,
+    and cached, from a replica that has not caught up yet.
+    """
+
+    _replica_reads_token = None
+
+    def dispatch(self, request, *args, **kwargs):
+        """Dispatch the request, unmarking its replica reads even when the view raises past handle_exception"""
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._replica_reads_token is not None:
+                replica_reads.reset(self._replica_reads_token)
+                self._replica_reads_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and get_config('ALIASES') and not is_pinned(request.user):
+            self._replica_reads_token = replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
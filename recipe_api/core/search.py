@@ -0,0 +1,50 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Ingredient, Recipe, Tag
+
+SEARCH_CONFIG = 'english'
+
+
+def is_full_text_supported(using='default'):
+    """Return whether the database supports the stored tsvector search"""
+    return connections[using].vendor == 'postgresql'
+
+
+def _names(model, field):
+    """Return a subquery aggregating the names of a recipe relation"""
+    names = model.objects.filter(recipe=OuterRef('pk')).values('recipe').annotate(names=StringAgg(field, ' '))
+    return Coalesce(Subquery(names.values('names')), Value(''))
+
+
+def update_search_vectors(recipe_ids, using='default'):
+    """Recompute the stored search vector of the given recipes in a single UPDATE"""
+    if not is_full_text_supported(using):
+        return
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    Recipe.objects.using(using).filter(pk__in=recipe_ids).update(search_vector=(
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(_names(Tag, 'name'), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(_names(Ingredient, 'name'), weight='C', config=SEARCH_CONFIG)
+    ))
+
+
+def search_recipes(queryset, term):
+    """Filter recipes matching the search term, best matches first
+
+    PostgreSQL ranks the stored, GIN indexed search vector; other databases
+    fall back to a case insensitive match on title, tag and ingredient names.
+    """
+    if is_full_text_supported(queryset.db):
+        query = SearchQuery(term, config=SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)).order_by('-rank', 'id')
+
+    tags = Tag.objects.filter(recipe=OuterRef('pk'), name__icontains=term)
+    ingredients = Ingredient.objects.filter(recipe=OuterRef('pk'), name__icontains=term)
+    return queryset.filter(Q(title__icontains=term) | Exists(tags) | Exists(ingredients)).order_by('id')
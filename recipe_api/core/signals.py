@@ -0,0 +1,185 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from .metrics import record_query
+from .models import Ingredient, Recipe, Tag
+from .replicas import get_config as get_replica_config, record_replica_latency
+from .search import is_full_text_supported, update_search_vectors
+from .similarity import forget_neighbours
+from .stats import (RELATIONS, record_attribute_deleted, record_bulk_created, record_links, record_recipe_deleted,
+                    record_recipe_saved, to_cents)
+
+# Sent with user_id and recipe_ids after recipes and their relations are written in bulk,
+# bypassing the per-instance model signals
+recipes_bulk_created = Signal()
+
+
+def is_bulk_created(instance):
+    """Return whether a recipe is saved one at a time by a bulk writer, which sends recipes_bulk_created for it"""
+    return getattr(instance, '_bulk_created', False)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, update_fields=None, **kwargs):
+    """Refresh the search vector when the recipe title may have changed"""
+    if is_bulk_created(instance):
+        return
+    if update_fields is None or 'title' in update_fields:
+        update_search_vectors([instance.pk], using=instance._state.db)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_linked_search_vectors(sender, instance, action, reverse, pk_set, **kwargs):
+    """Refresh the search vectors of recipes whose tags or ingredients changed"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            update_search_vectors([instance.pk], using=instance._state.db)
+        return
+
+    if action == 'pre_clear' and is_full_text_supported(instance._state.db):
+        instance._search_recipe_ids = list(instance.recipe_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        update_search_vectors(getattr(instance, '_search_recipe_ids', ()), using=instance._state.db)
+    elif action in ('post_add', 'post_remove'):
+        update_search_vectors(pk_set, using=instance._state.db)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def update_renamed_search_vectors(sender, instance, created, **kwargs):
+    """Refresh the search vectors of recipes using a renamed tag or ingredient"""
+    if not created:
+        update_search_vectors(instance.recipe_set.values_list('pk', flat=True), using=instance._state.db)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def collect_deleted_search_vectors(sender, instance, **kwargs):
+    """Remember the recipes using a tag or ingredient before it is deleted"""
+    if is_full_text_supported(instance._state.db):
+        instance._search_recipe_ids = list(instance.recipe_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_deleted_search_vectors(sender, instance, **kwargs):
+    """Refresh the search vectors of recipes that used a deleted tag or ingredient"""
+    update_search_vectors(getattr(instance, '_search_recipe_ids', ()), using=instance._state.db)
+
+
+@receiver(recipes_bulk_created)
+def update_bulk_created_search_vectors(sender, recipe_ids, using='default', **kwargs):
+    """Compute the search vectors of recipes created in bulk"""
+    update_search_vectors(recipe_ids, using=using)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Time the queries of every new database connection for the request metrics"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def install_replica_latency_recorder(sender, connection, **kwargs):
+    """Time the queries of new read replica connections for the least_latency replica choice"""
+    if connection.alias in get_replica_config('ALIASES') and record_replica_latency not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_replica_latency)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_stats_values(sender, instance, raw, update_fields=None, **kwargs):
+    """Remember the stored price and time of an updated recipe for its owner's statistics"""
+    instance._stats_previous = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not {'price', 'time_minutes'} & set(update_fields):
+        return
+    instance._stats_previous = (Recipe.objects.using(instance._state.db).filter(pk=instance.pk)
+                                .values_list('price', 'time_minutes').first())
+
+
+@receiver(post_save, sender=Recipe)
+def update_saved_recipe_stats(sender, instance, created, raw, **kwargs):
+    """Count a new recipe, or a changed price or time, in its owner's statistics
+
+    Raw saves, such as fixtures, are counted by rebuild_recipe_stats and
+    recipes saved by bulk writers by recipes_bulk_created instead.
+    """
+    if raw or is_bulk_created(instance):
+        return
+    if created:
+        record_recipe_saved(instance, None)
+        return
+    previous = getattr(instance, '_stats_previous', None)
+    if previous is not None and (to_cents(previous[0]), previous[1]) != (to_cents(instance.price),
+                                                                         int(instance.time_minutes)):
+        record_recipe_saved(instance, previous)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_deleted_recipe_links(sender, instance, **kwargs):
+    """Remember the tags and ingredients of a recipe before its links are deleted"""
+    instance._stats_links = {
+        relation: list(getattr(Recipe, relation).through.objects.using(instance._state.db)
+                       .filter(recipe_id=instance.pk).values_list(f'{model._meta.model_name}_id', flat=True))
+        for relation, (_, model) in RELATIONS.items()
+    }
+
+
+@receiver(post_delete, sender=Recipe)
+def update_deleted_recipe_stats(sender, instance, **kwargs):
+    """Remove a deleted recipe from its owner's statistics"""
+    record_recipe_deleted(instance, getattr(instance, '_stats_links', {}))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_link_stats(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """Count added and removed recipe tags and ingredients in the owners' statistics"""
+    relation = 'tags' if sender is Recipe.tags.through else 'ingredients'
+    column = f'{RELATIONS[relation][1]._meta.model_name}_id'
+    owner_id = None if reverse else instance.user_id
+
+    if action in ('pre_remove', 'pre_clear'):
+        links = sender.objects.using(using).filter(**{column if reverse else 'recipe_id': instance.pk})
+        if action == 'pre_remove':
+            links = links.filter(**{'recipe_id__in' if reverse else f'{column}__in': pk_set})
+        instance._stats_removed_links = list(links.values_list('recipe_id', column))
+    elif action in ('post_remove', 'post_clear'):
+        record_links(relation, getattr(instance, '_stats_removed_links', ()), -1, using, owner_id)
+    elif action == 'post_add':
+        pairs = [(pk, instance.pk) for pk in pk_set] if reverse else [(instance.pk, pk) for pk in pk_set]
+        record_links(relation, pairs, 1, using, owner_id)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_deleted_attribute_stats(sender, instance, **kwargs):
+    """Forget a deleted tag or ingredient in its owner's statistics"""
+    record_attribute_deleted('tags' if sender is Tag else 'ingredients', instance)
+
+
+@receiver(recipes_bulk_created)
+def update_bulk_created_stats(sender, user_id, recipe_ids, using='default', **kwargs):
+    """Count recipes and links created in bulk in the owner's statistics"""
+    record_bulk_created(user_id, recipe_ids, using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def forget_relinked_neighbours(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """Drop the precomputed similar recipes of recipes whose tags or ingredients change
+
+    Other recipes' lists that include a relinked recipe keep their scores
+    until precompute_similar_recipes runs again.
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            forget_neighbours([instance.pk], using)
+    elif action in ('post_add', 'post_remove'):
+        forget_neighbours(pk_set, using)
+    elif action == 'pre_clear':
+        forget_neighbours(instance.recipe_set.using(using).values('pk'), using)
@@ -0,0 +1,161 @@
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+from .models import Recipe, RecipeNeighbour
+
+DEFAULTS = {
+    # Catalogues up to this many recipes are always computed on the fly and never precomputed
+    'ONLINE_MAX_RECIPES': 2000,
+    'NEIGHBOURS': 50,
+    'BATCH_SIZE': 1000,
+    # Bound on the entries of one sparse overlap product, a few dozen bytes each
+    'MAX_OVERLAPS': 2000000,
+}
+
+# Through table column of each relation whose attributes form the recipe feature vectors
+RELATIONS = (
+    ('tags', 'tag_id'),
+    ('ingredients', 'ingredient_id'),
+)
+
+
+def get_config(name):
+    """Return a similar recipes setting from SIMILAR_RECIPES"""
+    return getattr(settings, 'SIMILAR_RECIPES', {}).get(name, DEFAULTS[name])
+
+
+def load_incidence(user_id, using='default'):
+    """Return the sorted ids of the user's recipes having tags or ingredients and their incidence matrix
+
+    Row i of the sparse matrix is recipe_ids[i], with a one in the column of
+    each of its tags and ingredients. Loading takes one query per relation.
+    """
+    rows = []
+    columns = []
+    offset = 0
+    for relation, column in RELATIONS:
+        through = getattr(Recipe, relation).through.objects.using(using)
+        pairs = np.array(list(through.filter(recipe__user_id=user_id).values_list('recipe_id', column)),
+                         dtype=np.int64).reshape(-1, 2)
+        attribute_ids, attribute_columns = np.unique(pairs[:, 1], return_inverse=True)
+        rows.append(pairs[:, 0])
+        columns.append(attribute_columns.ravel() + offset)
+        offset += len(attribute_ids)
+
+    recipe_ids, recipe_rows = np.unique(np.concatenate(rows), return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(recipe_rows)), (recipe_rows.ravel(), np.concatenate(columns))), shape=(len(recipe_ids), offset))
+    return recipe_ids, matrix
+
+
+def overlap_estimates(matrix, rows):
+    """Return an upper bound of the number of rows each of the rows shares a feature with
+
+    That is the sum of the frequencies of its features, capped at the row
+    count: a feature shared by most rows makes the row's overlaps dense.
+    """
+    frequencies = np.asarray(matrix.sum(axis=0)).ravel()
+    return np.minimum(matrix[rows] @ frequencies, matrix.shape[0])
+
+
+def top_neighbours(matrix, rows, k, max_overlaps=None):
+    """Return (row, neighbour row, score) arrays of the k rows most similar to each of the rows
+
+    Scores are the Jaccard similarity |a & b| / |a | b| of the rows' features:
+    sparse products give the overlaps of the rows with every other row, so
+    only pairs sharing a feature are ever scored. The rows are split into
+    chunks whose products hold at most max_overlaps estimated entries, or a
+    single row. Neighbours are sorted by row, given in increasing order,
+    then by decreasing score and increasing neighbour row.
+    """
+    max_overlaps = max_overlaps or get_config('MAX_OVERLAPS')
+    rows = np.asarray(rows, dtype=np.int64)
+    sizes = np.asarray(matrix.sum(axis=1)).ravel()
+    cumulative = np.cumsum(overlap_estimates(matrix, rows))
+
+    results = []
+    start = 0
+    while start < len(rows):
+        done = cumulative[start - 1] if start else 0
+        stop = max(start + 1, int(np.searchsorted(cumulative, done + max_overlaps, side='right')))
+        results.append(score_rows(matrix, sizes, rows[start:stop], k))
+        start = stop
+    if not results:
+        return score_rows(matrix, sizes, rows, k)
+    return tuple(np.concatenate(arrays) for arrays in zip(*results))
+
+
+def score_rows(matrix, sizes, rows, k):
+    """Return the top_neighbours of the rows from one sparse product"""
+    overlaps = (matrix[rows] @ matrix.T).tocoo()
+
+    sources = rows[overlaps.row]
+    keep = overlaps.col != sources
+    sources, targets, shared = sources[keep], overlaps.col[keep].astype(np.int64), overlaps.data[keep]
+    scores = shared / (sizes[sources] + sizes[targets] - shared)
+
+    order = np.lexsort((targets, -scores, sources))
+    sources, targets, scores = sources[order], targets[order], scores[order]
+    keep = np.arange(len(sources)) - np.searchsorted(sources, sources) < k
+    return sources[keep], targets[keep], scores[keep]
+
+
+def compute_similar(recipe, k, using='default'):
+    """Return (recipe id, score) of the k recipes most similar to the recipe, computed from its owner's catalogue"""
+    recipe_ids, matrix = load_incidence(recipe.user_id, using)
+    row = np.searchsorted(recipe_ids, recipe.pk)
+    if row == len(recipe_ids) or recipe_ids[row] != recipe.pk:
+        return []
+    _, targets, scores = top_neighbours(matrix, [row], k)
+    return list(zip(recipe_ids[targets].tolist(), scores.tolist()))
+
+
+def get_similar(recipe, k, using='default'):
+    """Return (recipe id, score) of the k recipes most similar to the recipe
+
+    The precomputed neighbours are used when the recipe has any; small
+    catalogues, recipes created or relinked since the last precomputation
+    and recipes without stored neighbours are computed on the fly.
+    """
+    stored = list(RecipeNeighbour.objects.using(using).filter(recipe=recipe, rank__lt=k)
+                  .order_by('rank').values_list('neighbour_id', 'score'))
+    return stored or compute_similar(recipe, k, using)
+
+
+def precompute_neighbours(user_id, k=None, batch_size=None, using='default'):
+    """Replace the stored neighbours of every recipe of the user and return how many were written
+
+    Rows are scored in batches of batch_size recipes, and top_neighbours
+    splits batches further by MAX_OVERLAPS, to bound the memory of the
+    overlap matrix.
+    """
+    k = k or get_config('NEIGHBOURS')
+    batch_size = batch_size or get_config('BATCH_SIZE')
+    recipe_ids, matrix = load_incidence(user_id, using)
+
+    neighbours = []
+    for start in range(0, len(recipe_ids), batch_size):
+        rows = np.arange(start, min(start + batch_size, len(recipe_ids)))
+        sources, targets, scores = top_neighbours(matrix, rows, k)
+        ranks = np.arange(len(sources)) - np.searchsorted(sources, sources)
+        neighbours.extend(
+            RecipeNeighbour(recipe_id=recipe_id, neighbour_id=neighbour_id, rank=rank, score=score)
+            for recipe_id, neighbour_id, rank, score in zip(
+                recipe_ids[sources].tolist(), recipe_ids[targets].tolist(), ranks.tolist(), scores.tolist()))
+
+    with transaction.atomic(using=using):
+        clear_neighbours(user_id, using)
+        RecipeNeighbour.objects.using(using).bulk_create(neighbours, batch_size=1000)
+    return len(neighbours)
+
+
+def clear_neighbours(user_id, using='default'):
+    """Delete the stored neighbours of the user's recipes"""
+    RecipeNeighbour.objects.using(using).filter(recipe__user_id=user_id).delete()
+
+
+def forget_neighbours(recipes, using='default'):
+    """Delete the stored neighbours of the recipes, ids or a queryset, which are then computed on the fly"""
+    RecipeNeighbour.objects.using(using).filter(recipe__in=recipes).delete()
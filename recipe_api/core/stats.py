@@ -0,0 +1,210 @@
+from collections import Counter, defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Ingredient, Recipe, RecipeStats, Tag
+
+# Upper bounds, in minutes, of the time histogram buckets returned by summarize_stats
+TIME_BUCKETS = (10, 20, 30, 45, 60, 90, 120)
+TOP_COUNT = 10
+CENT = Decimal('0.01')
+
+# Statistics field and model of the tags and ingredients counted per recipe relation
+RELATIONS = {
+    'tags': ('tag_counts', Tag),
+    'ingredients': ('ingredient_counts', Ingredient),
+}
+
+
+def to_cents(price):
+    """Return a price, as stored in the two decimal places of Recipe.price, in cents"""
+    return int(Decimal(str(price)).quantize(CENT, ROUND_HALF_UP) * 100)
+
+
+def adjust(counts, key, delta):
+    """Add delta to the count of key in a JSON histogram, dropping it once it reaches zero"""
+    key = str(key)
+    value = counts.get(key, 0) + delta
+    if value > 0:
+        counts[key] = value
+    else:
+        counts.pop(key, None)
+
+
+def aggregate_stats(user_id, using='default', **recipe_filters):
+    """Return unsaved statistics of the user's recipes matching the filters, aggregated from scratch"""
+    recipes = Recipe.objects.using(using).filter(user_id=user_id, **recipe_filters).order_by()
+    stats = RecipeStats(user_id=user_id)
+    for price, minutes, total in recipes.values_list('price', 'time_minutes').annotate(total=Count('id')):
+        stats.recipe_count += total
+        adjust(stats.price_counts, to_cents(price), total)
+        adjust(stats.time_counts, minutes, total)
+    for relation, (field, model) in RELATIONS.items():
+        through = getattr(Recipe, relation).through.objects.using(using)
+        rows = (through.filter(recipe__in=recipes.values('pk'))
+                .values_list(f'{model._meta.model_name}_id').annotate(total=Count('id')).order_by())
+        for attribute_id, total in rows:
+            adjust(getattr(stats, field), attribute_id, total)
+    return stats
+
+
+def rebuild_stats(user_id, using='default'):
+    """Recompute and store the statistics of the user"""
+    stats = aggregate_stats(user_id, using)
+    values = {field.name: getattr(stats, field.name) for field in RecipeStats._meta.concrete_fields
+              if field.name not in ('user', 'updated_at')}
+    stats, _ = RecipeStats.objects.using(using).update_or_create(user_id=user_id, defaults=values)
+    return stats
+
+
+def get_stats(user_id, using='default'):
+    """Return the statistics of the user, computing them if they were never stored"""
+    stats = RecipeStats.objects.using(using).filter(user_id=user_id).first()
+    return stats if stats is not None else rebuild_stats(user_id, using)
+
+
+def update_stats(user_id, using, change, create=True):
+    """Apply change(stats) to the user's locked statistics row
+
+    Without a stored row the statistics are computed from scratch instead,
+    which already reflects the write being handled. With create=False a
+    missing row is left alone, e.g. while the user itself is being deleted.
+    """
+    with transaction.atomic(using=using):
+        stats = RecipeStats.objects.using(using).select_for_update().filter(user_id=user_id).first()
+        if stats is None:
+            if create:
+                rebuild_stats(user_id, using)
+            return
+        change(stats)
+        stats.save(using=using)
+
+
+def count_recipe(stats, price, minutes, sign):
+    stats.recipe_count += sign
+    adjust(stats.price_counts, to_cents(price), sign)
+    adjust(stats.time_counts, minutes, sign)
+
+
+def record_recipe_saved(recipe, previous):
+    """Account for a created recipe, or for the price and time of an updated one"""
+    def change(stats):
+        if previous is not None:
+            count_recipe(stats, previous[0], previous[1], -1)
+        count_recipe(stats, recipe.price, recipe.time_minutes, 1)
+
+    update_stats(recipe.user_id, recipe._state.db, change)
+
+
+def record_recipe_deleted(recipe, links):
+    """Remove a deleted recipe and the links it had, as {relation: attribute ids}"""
+    def change(stats):
+        count_recipe(stats, recipe.price, recipe.time_minutes, -1)
+        for relation, attribute_ids in links.items():
+            counts = getattr(stats, RELATIONS[relation][0])
+            for attribute_id in attribute_ids:
+                adjust(counts, attribute_id, -1)
+
+    update_stats(recipe.user_id, recipe._state.db, change, create=False)
+
+
+def record_links(relation, pairs, sign, using, owner_id=None):
+    """Account for added (sign 1) or removed (sign -1) (recipe id, attribute id) links
+
+    The recipe owners are looked up unless all recipes belong to owner_id.
+    """
+    if not pairs:
+        return
+    recipe_ids = {recipe_id for recipe_id, _ in pairs}
+    if owner_id is None:
+        owners = dict(Recipe.objects.using(using).filter(pk__in=recipe_ids).values_list('pk', 'user_id'))
+    else:
+        owners = dict.fromkeys(recipe_ids, owner_id)
+
+    by_owner = defaultdict(Counter)
+    for recipe_id, attribute_id in pairs:
+        if recipe_id in owners:
+            by_owner[owners[recipe_id]][attribute_id] += sign
+
+    field = RELATIONS[relation][0]
+    for user_id, deltas in by_owner.items():
+        def change(stats, deltas=deltas):
+            counts = getattr(stats, field)
+            for attribute_id, delta in deltas.items():
+                adjust(counts, attribute_id, delta)
+
+        update_stats(user_id, using, change)
+
+
+def record_attribute_deleted(relation, attribute):
+    """Forget a deleted tag or ingredient, whose links are removed without m2m_changed signals"""
+    def change(stats):
+        getattr(stats, RELATIONS[relation][0]).pop(str(attribute.pk), None)
+
+    update_stats(attribute.user_id, attribute._state.db, change, create=False)
+
+
+def record_bulk_created(user_id, recipe_ids, using):
+    """Account for recipes and links written in bulk, without per-row signals"""
+    if not recipe_ids:
+        return
+    added = aggregate_stats(user_id, using, pk__in=recipe_ids)
+
+    def change(stats):
+        stats.recipe_count += added.recipe_count
+        for field in ('price_counts', 'time_counts', 'tag_counts', 'ingredient_counts'):
+            counts = getattr(stats, field)
+            for key, total in getattr(added, field).items():
+                adjust(counts, key, total)
+
+    update_stats(user_id, using, change)
+
+
+def median_cents(price_counts, count):
+    """Return the median of a price histogram in cents"""
+    middle = ((count - 1) // 2, count // 2)
+    values = []
+    seen = 0
+    for cents in sorted(int(key) for key in price_counts):
+        total = price_counts[str(cents)]
+        values.extend(cents for position in middle if seen <= position < seen + total)
+        seen += total
+        if len(values) == 2:
+            break
+    return sum(values) / 2
+
+
+def top_attributes(counts, model, using, top=TOP_COUNT):
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], int(item[0])))[:top]
+    names = dict(model.objects.using(using).filter(pk__in=[key for key, _ in ranked]).values_list('id', 'name'))
+    return [{'id': int(key), 'name': names[int(key)], 'count': total} for key, total in ranked if int(key) in names]
+
+
+def summarize_stats(stats, using='default', top=TOP_COUNT):
+    """Return the dashboard summary of stored statistics"""
+    count = stats.recipe_count
+    average = median = None
+    if count:
+        total = sum(int(cents) * number for cents, number in stats.price_counts.items())
+        average = (Decimal(total) / count / 100).quantize(CENT, ROUND_HALF_UP)
+        median = (Decimal(median_cents(stats.price_counts, count)) / 100).quantize(CENT, ROUND_HALF_UP)
+
+    buckets = [0] * (len(TIME_BUCKETS) + 1)
+    for minutes, number in stats.time_counts.items():
+        buckets[next((index for index, bound in enumerate(TIME_BUCKETS) if int(minutes) <= bound),
+                     len(TIME_BUCKETS))] += number
+    lower_bounds = (0,) + tuple(bound + 1 for bound in TIME_BUCKETS)
+    histogram = [
+        {'min_minutes': low, 'max_minutes': high, 'count': number}
+        for low, high, number in zip(lower_bounds, TIME_BUCKETS + (None,), buckets)
+    ]
+
+    return {
+        'recipe_count': count,
+        'price': {'average': average, 'median': median},
+        'time_minutes': histogram,
+        'top_tags': top_attributes(stats.tag_counts, Tag, using, top),
+        'top_ingredients': top_attributes(stats.ingredient_counts, Ingredient, using, top),
+    }
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class PrimaryReadsTestRunner(DiscoverRunner):
+    """Test runner keeping every read on the primary, except in tests that set DATABASE_REPLICAS themselves
+
+    Rows a TestCase writes stay in its transaction on the primary, so reads
+    routed to a replica database would not see them. The replicas are only
+    dropped once their test databases are migrated, which relates the rows
+    read back from them.
+    """
+
+    def setup_databases(self, **kwargs):
+        old_config = super().setup_databases(**kwargs)
+        self.primary_reads = override_settings(DATABASE_REPLICAS=dict(settings.DATABASE_REPLICAS, ALIASES=[]))
+        self.primary_reads.enable()
+        return old_config
+
+    def teardown_databases(self, old_config, **kwargs):
+        self.primary_reads.disable()
+        super().teardown_databases(old_config, **kwargs)
@@ -1,7 +1,12 @@
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase, Client
 from django.urls import reverse
 
+from ..admin import EstimatedCountPaginator, estimate_count
+from ..models import Ingredient, Recipe, Tag
+
 
 class AdminSiteTests(TestCase):
 
@@ -32,3 +37,66 @@ class AdminSiteTests(TestCase):
         url = reverse('admin:core_user_add')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
+
+    def test_recipe_change_page_autocompletes_relations(self):
+        """Test the recipe form renders only the selected tags and ingredients instead of every row"""
+        recipe = Recipe.objects.create(user=self.user, title='Porridge', time_minutes=5, price=1)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Breakfast'))
+        Tag.objects.create(user=self.user, name='Unselected tag')
+        Ingredient.objects.create(user=self.user, name='Unselected ingredient')
+
+        response = self.client.get(reverse('admin:core_recipe_change', args=[recipe.id]))
+
+        self.assertContains(response, 'Breakfast')
+        self.assertNotContains(response, 'Unselected tag')
+        self.assertNotContains(response, 'Unselected ingredient')
+        self.assertContains(response, 'admin-autocomplete')
+
+    def test_tag_autocomplete(self):
+        """Test tags are searchable by name for the recipe autocomplete widget"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Dessert')
+
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'veg', 'app_label': 'core', 'model_name': 'recipe', 'field_name': 'tags'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['id'] for result in response.json()['results']], [str(tag.id)])
+
+    def test_tag_search_ignores_case_beyond_ascii(self):
+        """Test the tag changelist matches search words against the normalised names"""
+        Tag.objects.create(user=self.user, name='STRASSENFEST')
+        Tag.objects.create(user=self.user, name='Éclair')
+
+        response = self.client.get(reverse('admin:core_tag_changelist'), {'q': 'straßen'})
+
+        self.assertContains(response, 'STRASSENFEST')
+        self.assertNotContains(response, 'Éclair')
+
+    def test_recipe_changelist_filtered_by_time(self):
+        """Test the recipe changelist filters by cooking time range"""
+        Recipe.objects.create(user=self.user, title='Toast', time_minutes=5, price=1)
+        Recipe.objects.create(user=self.user, title='Roast', time_minutes=90, price=10)
+
+        response = self.client.get(reverse('admin:core_recipe_changelist'), {'time': 'quick'})
+
+        self.assertContains(response, 'Toast')
+        self.assertNotContains(response, 'Roast')
+
+    def test_estimated_count_paginator(self):
+        """Test large unfiltered changelists use the planner estimate and others count exactly"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        tags = Tag.objects.order_by('id')
+
+        with patch('core.admin.estimate_count', return_value=5000000):
+            self.assertEqual(EstimatedCountPaginator(tags, 100).count, 5000000)
+            self.assertEqual(EstimatedCountPaginator(tags, 100).num_pages, 50000)
+        with patch('core.admin.estimate_count', return_value=5000):
+            self.assertEqual(EstimatedCountPaginator(tags, 100).count, 1)
+        with patch('core.admin.estimate_count', return_value=None):
+            self.assertEqual(EstimatedCountPaginator(tags.filter(name='Vegan'), 100).count, 1)
+
+    def test_estimate_count_skips_filtered_querysets(self):
+        """Test no estimate is made for filtered querysets or databases without planner statistics"""
+        self.assertIsNone(estimate_count(Tag.objects.filter(name='Vegan')))
+        self.assertIsNone(estimate_count(Tag.objects.all()))
@@ -0,0 +1,51 @@
+from importlib import import_module
+
+from django.test import SimpleTestCase, TestCase
+
+from .. import models
+from ..benchmarks import percentile, seed_dataset, summarize
+
+bench_api = import_module('core.management.commands.bench_api')
+
+
+class BenchmarkHelperTests(SimpleTestCase):
+
+    def test_percentile_nearest_rank(self):
+        """Test percentiles use the nearest rank of the sorted values"""
+        values = list(range(100, 0, -1))
+
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_summarize(self):
+        """Test request timings are summarized in milliseconds with throughput"""
+        stats = summarize([0.01, 0.02, 0.03, 0.04], elapsed=0.5)
+
+        self.assertEqual(stats['requests'], 4)
+        self.assertEqual(stats['throughput_rps'], 8.0)
+        self.assertEqual(stats['p50_ms'], 20.0)
+        self.assertEqual(stats['p99_ms'], 40.0)
+
+    def test_every_route_has_a_scenario(self):
+        """Test new routes are not silently left out of bench_api"""
+        covered = {item.route for item in bench_api.SCENARIOS}
+
+        self.assertEqual(bench_api.discover_routes() - covered, {'recipe:recipe-upload-image'})
+
+
+class SeedDatasetTests(TestCase):
+
+    def test_seed_dataset(self):
+        """Test the benchmark dataset is created with linked tags and ingredients"""
+        users = seed_dataset(users=2, recipes=3, tags=4, ingredients=5, links=2)
+
+        self.assertEqual(len(users), 2)
+        self.assertEqual(models.Recipe.objects.count(), 6)
+        self.assertEqual(models.Tag.objects.count(), 8)
+        self.assertEqual(models.Ingredient.objects.count(), 10)
+        self.assertEqual(models.Recipe.tags.through.objects.count(), 12)
+        self.assertEqual(models.Recipe.ingredients.through.objects.count(), 12)
+        self.assertEqual(len(users[0].recipe_ids), 3)
+        self.assertTrue(users[0].token)
+        self.assertTrue(models.User.objects.get(pk=users[0].id).check_password('benchmark'))
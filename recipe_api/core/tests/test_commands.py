@@ -1,24 +1,66 @@
+from io import StringIO
 from unittest.mock import patch
 
-from django.core.management import call_command
+from django.core.management import CommandError, call_command
+from django.db import connections
 from django.db.utils import OperationalError
 from django.test import TestCase
 
+from core.warmup import open_connections, warm_up
+
+ENSURE_CONNECTION = 'django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection'
+
 
 class CommandsTest(TestCase):
 
     def test_wait_for_db_ready(self):
         """Test waiting for database when database is available"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as mock_getitem:
-            mock_getitem.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(mock_getitem.call_count, 1)
+        with patch(ENSURE_CONNECTION) as ensure_connection:
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(ensure_connection.call_count, 1)
 
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, time_sleep):
         """Test waiting for database"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as mock_getitem:
-            mock_getitem.side_effect = [OperationalError, OperationalError, OperationalError, OperationalError,
-                                        OperationalError, True]
-            call_command('wait_for_db')
-            self.assertEqual(mock_getitem.call_count, 6)
+        with patch(ENSURE_CONNECTION) as ensure_connection:
+            ensure_connection.side_effect = [OperationalError, OperationalError, OperationalError, OperationalError,
+                                             OperationalError, None]
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(ensure_connection.call_count, 6)
+
+        delays = [call.args[0] for call in time_sleep.call_args_list]
+        self.assertEqual(delays, [0.1, 0.2, 0.4, 0.8, 1.6])
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_deadline(self, time_sleep):
+        """Test waiting for database gives up once the timeout has passed"""
+        with patch(ENSURE_CONNECTION, side_effect=OperationalError('connection refused')):
+            with self.assertRaisesMessage(CommandError, 'Database unavailable after 1 attempts'):
+                call_command('wait_for_db', '--timeout=0', stdout=StringIO())
+        time_sleep.assert_not_called()
+
+    @patch('core.warmup._fork_hooks_registered', False)
+    def test_warm_up(self):
+        """Test warming up logs the duration of every phase and opens the connections of every forked process"""
+        with patch.dict(connections['default'].settings_dict, CONN_MAX_AGE=60), \
+                patch(ENSURE_CONNECTION) as ensure_connection, patch('os.register_at_fork') as register_at_fork, \
+                self.assertLogs('core.warmup', 'INFO') as logs:
+            timings = warm_up()
+
+        self.assertEqual(list(timings), ['urlconf', 'modules', 'connections'])
+        self.assertIn('Warm-up finished: urlconf', logs.output[0])
+        ensure_connection.assert_called_once_with()
+        register_at_fork.assert_called_once_with(before=connections.close_all, after_in_child=open_connections)
+
+    def test_warm_up_database_unavailable(self):
+        """Test a database that cannot be reached is left to the first request instead of failing the start-up"""
+        with patch.dict(connections['default'].settings_dict, CONN_MAX_AGE=60), \
+                patch(ENSURE_CONNECTION, side_effect=OperationalError('connection refused')), \
+                self.assertLogs('core.warmup', 'WARNING'):
+            open_connections()
+
+    def test_warm_up_skips_short_lived_connections(self):
+        """Test connections closed after every request (CONN_MAX_AGE=0) are not opened ahead"""
+        with patch.dict(connections['default'].settings_dict, CONN_MAX_AGE=0), patch(ENSURE_CONNECTION) as ensure:
+            open_connections()
+        ensure.assert_not_called()
@@ -0,0 +1,114 @@
+import asyncio
+from threading import Thread
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..metrics import Histogram, MetricsRegistry, registry
+from ..middleware import MetricsMiddleware
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class MetricsRegistryTests(SimpleTestCase):
+
+    def test_histogram_buckets(self):
+        """Test observations land in the first bucket whose bound is not below them"""
+        histogram = Histogram((1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(histogram.sum, 14.5)
+
+    def test_render_merges_thread_shards(self):
+        """Test a scrape merges the shards of every recording thread, retiring those of exited threads"""
+        metrics = MetricsRegistry()
+
+        def observe():
+            metrics.observe_request('recipe:recipe-list', 'GET', 200, 0.02, 100, 3, 0.01)
+
+        threads = [Thread(target=observe) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        observe()
+        output = metrics.render()
+
+        self.assertEqual(len(metrics.shards), 1)
+        self.assertIn('http_requests_total{route="recipe:recipe-list",method="GET",status="200"} 4', output)
+        self.assertIn(
+            'http_request_duration_seconds_bucket{route="recipe:recipe-list",method="GET",le="0.025"} 4', output)
+        self.assertIn('http_response_size_bytes_bucket{route="recipe:recipe-list",le="+Inf"} 4', output)
+        self.assertIn('db_queries_per_request_sum{route="recipe:recipe-list"} 12.000000', output)
+        self.assertIn('db_query_duration_seconds_total{route="recipe:recipe-list"} 0.040000', output)
+
+    def test_exited_threads_do_not_keep_shards(self):
+        """Test short-lived threads leave a single retired shard behind instead of one each"""
+        metrics = MetricsRegistry()
+
+        for _ in range(50):
+            thread = Thread(target=metrics.observe_request, args=('user:me', 'GET', 200, 0.02, None, 1, 0.01))
+            thread.start()
+            thread.join()
+
+        self.assertEqual(metrics.shards, [])
+        self.assertIn('http_requests_total{route="user:me",method="GET",status="200"} 50', metrics.render())
+
+
+class MetricsMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        registry.reset()
+
+    def test_async_requests_stay_async(self):
+        """Test the middleware awaits async handlers itself instead of adapting them to a sync thread"""
+        async def get_response(request):
+            return HttpResponse(b'ok')
+
+        middleware = MetricsMiddleware(get_response)
+        response = asyncio.run(middleware(RequestFactory().get('/api/missing/')))
+
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        self.assertEqual(response.content, b'ok')
+        self.assertIn('http_requests_total{route="unmatched",method="GET",status="200"} 1', registry.render())
+
+    def test_sync_requests_stay_sync(self):
+        """Test the middleware calls sync handlers directly"""
+        middleware = MetricsMiddleware(lambda request: HttpResponse(b'ok'))
+
+        self.assertFalse(asyncio.iscoroutinefunction(middleware))
+        self.assertEqual(middleware(RequestFactory().get('/')).content, b'ok')
+
+
+class MetricsEndpointTests(TestCase):
+
+    def setUp(self):
+        registry.reset()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user('metrics@test.com', 'testpass')
+        self.client.force_authenticate(self.user)
+
+    def test_requests_are_recorded_by_route_name(self):
+        """Test the middleware records status, latency and query counts per route name"""
+        self.client.get(RECIPES_URL)
+        self.client.get('/api/missing/')
+
+        output = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn('http_requests_total{route="recipe:recipe-list",method="GET",status="200"} 1', output)
+        self.assertIn('http_requests_total{route="unmatched",method="GET",status="404"} 1', output)
+        self.assertIn('db_queries_per_request_count{route="recipe:recipe-list"} 1', output)
+        self.assertNotIn('db_queries_per_request_sum{route="recipe:recipe-list"} 0.000000', output)
+
+    @override_settings(METRICS={'TOKEN': 'secret'})
+    def test_metrics_token(self):
+        """Test the metrics endpoint requires the configured bearer token"""
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+        self.assertEqual(self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
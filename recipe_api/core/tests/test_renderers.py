@@ -0,0 +1,104 @@
+import datetime
+import io
+import json
+import os
+import time
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from .. import renderers
+from ..parsers import FastJSONParser
+from ..renderers import FastJSONRenderer
+
+BENCHMARKS = bool(os.environ.get('RECIPE_API_BENCHMARKS'))
+
+
+def recipe_payload(count):
+    """Return a list payload shaped like the recipe list endpoint"""
+    return ReturnList([ReturnDict([
+        ('id', i),
+        ('title', f'Recipe {i} – crème brûlée'),
+        ('ingredients', [i, i + 1, i + 2]),
+        ('tags', [i % 7, i % 11]),
+        ('time_minutes', i % 120),
+        ('price', f'{i % 1000}.50'),
+        ('link', f'https://example.com/recipes/{i}'),
+    ], serializer=None) for i in range(count)], serializer=None)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+
+    def test_matches_default_renderer(self):
+        """Test the output is identical to DRF's JSONRenderer for API payloads"""
+        data = {
+            'results': recipe_payload(3),
+            'detail': gettext_lazy('Not found.'),
+            'created': datetime.datetime(2021, 10, 15, 8, 58, 1, 123456, tzinfo=datetime.timezone.utc),
+            'separator': 'a\u2028b',
+            1: None,
+        }
+
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        with patch.object(renderers, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_decimal_without_float_round_trip(self):
+        """Test decimals are written as exact strings"""
+        data = {'price': Decimal('999.99'), 'total': Decimal('0.10')}
+
+        self.assertEqual(FastJSONRenderer().render(data), b'{"price":"999.99","total":"0.10"}')
+        with patch.object(renderers, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data), b'{"price":"999.99","total":"0.10"}')
+
+    def test_indented_output(self):
+        """Test indented output is still available"""
+        content = FastJSONRenderer().render({'price': Decimal('1.50')}, 'application/json; indent=2')
+
+        self.assertEqual(json.loads(content), {'price': '1.50'})
+        self.assertIn(b'\n  ', content)
+
+
+class FastJSONParserTests(SimpleTestCase):
+
+    def test_parse(self):
+        """Test parsing matches DRF's JSONParser"""
+        body = json.dumps({'title': 'Crème brûlée', 'tags': [1, 2], 'price': 5.5}).encode('utf-8')
+
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+
+    def test_parse_invalid(self):
+        """Test invalid JSON raises a parse error"""
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"title": NaN}'))
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"title": '))
+
+
+@skipUnless(BENCHMARKS, 'Set RECIPE_API_BENCHMARKS=1 to run benchmarks')
+class JSONBenchmark(SimpleTestCase):
+
+    def test_encode_decode(self):
+        """Benchmark encoding and decoding a 1,000 recipe payload"""
+        data = recipe_payload(1000)
+        body = JSONRenderer().render(data)
+        candidates = [('JSONRenderer/JSONParser', JSONRenderer(), JSONParser()),
+                      ('FastJSONRenderer/FastJSONParser', FastJSONRenderer(), FastJSONParser())]
+
+        for name, renderer, parser in candidates:
+            start = time.perf_counter()
+            for _ in range(50):
+                renderer.render(data)
+            encode = (time.perf_counter() - start) / 50
+            start = time.perf_counter()
+            for _ in range(50):
+                parser.parse(io.BytesIO(body))
+            decode = (time.perf_counter() - start) / 50
+            print(f'\n{name}: encode {encode * 1000:.2f} ms, decode {decode * 1000:.2f} ms')
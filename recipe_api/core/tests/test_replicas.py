@@ -0,0 +1,165 @@
+from contextlib import ExitStack
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .. import replicas
+from ..checks import check_shared_replica_pins
+from ..models import Recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+ME_URL = reverse('user:me')
+REPLICAS = [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+class FakeConnection:
+    alias = 'replica2'
+
+
+@override_settings(DATABASE_REPLICAS={'ALIASES': ['replica1', 'replica2']})
+class ReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = replicas.ReplicaRouter()
+        replicas.replica_latencies.clear()
+
+    def read_aliases(self, count):
+        token = replicas.replica_reads.set(True)
+        try:
+            return [self.router.db_for_read(Recipe) for _ in range(count)]
+        finally:
+            replicas.replica_reads.reset(token)
+
+    def test_reads_outside_replica_requests_use_primary(self):
+        """Test the router leaves unmarked reads and every write to the primary"""
+        self.assertIsNone(self.router.db_for_read(Recipe))
+        token = replicas.replica_reads.set(True)
+        try:
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+        finally:
+            replicas.replica_reads.reset(token)
+
+    def test_round_robin(self):
+        """Test consecutive replica reads alternate between the replicas"""
+        aliases = self.read_aliases(4)
+
+        self.assertEqual(set(aliases), {'replica1', 'replica2'})
+        self.assertEqual(aliases[:2], aliases[2:])
+
+    @override_settings(DATABASE_REPLICAS={'ALIASES': ['replica1', 'replica2'], 'STRATEGY': 'least_latency',
+                                          'PROBE_EVERY': 4})
+    def test_least_latency(self):
+        """Test replica reads go to the fastest replica, probing the others periodically"""
+        replicas.replica_latencies.update({'replica1': 0.05, 'replica2': 0.01})
+
+        aliases = self.read_aliases(8)
+
+        self.assertEqual(aliases.count('replica2'), 6)
+        self.assertEqual(aliases.count('replica1'), 2)
+
+    def test_record_replica_latency(self):
+        """Test query durations are folded into the moving average of their replica"""
+        replicas.replica_latencies['replica2'] = 1.0
+
+        result = replicas.record_replica_latency(lambda *args: 'rows', 'SELECT 1', None, False,
+                                                 {'connection': FakeConnection()})
+
+        self.assertEqual(result, 'rows')
+        self.assertLess(replicas.replica_latencies['replica2'], 0.81)
+
+    def test_process_local_pin_cache_rejected(self):
+        """Test the system check requires the primary pins to be shared by every process"""
+        self.assertEqual([error.id for error in check_shared_replica_pins(None)], ['core.E001'])
+
+        backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}
+        with override_settings(CACHES={'default': backend}):
+            self.assertEqual(check_shared_replica_pins(None), [])
+        with override_settings(DATABASE_REPLICAS={'ALIASES': []}):
+            self.assertEqual(check_shared_replica_pins(None), [])
+
+
+@override_settings(DATABASE_REPLICAS={'ALIASES': ['replica1']}, RESPONSE_CACHE={'ENABLED': False})
+class ReplicaReadsApiTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = get_user_model().objects.create_user('replica@test.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Stand in for the replica with the primary, recording which reads would have used it
+        patcher = patch.object(replicas, 'choose_replica', return_value='default')
+        self.choose_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_safe_requests_read_from_replicas(self):
+        """Test list and retrieve requests read from a replica, and nothing else does"""
+        self.client.get(RECIPES_URL)
+        self.client.get(ME_URL)
+        self.assertTrue(self.choose_replica.called)
+
+        self.choose_replica.reset_mock()
+        Recipe.objects.filter(user=self.user).exists()
+        self.assertFalse(self.choose_replica.called)
+
+    def test_writes_pin_reads_to_primary(self):
+        """Test a user's reads use the primary right after they write, and replicas again later"""
+        response = self.client.post(RECIPES_URL, {'title': 'Soup', 'time_minutes': 5, 'price': 2})
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(self.choose_replica.called)
+
+        response = self.client.get(RECIPES_URL)
+        self.assertEqual(len(response.data), 1)
+        self.assertFalse(self.choose_replica.called)
+
+        other = get_user_model().objects.create_user('other@test.com', 'testpass')
+        self.client.force_authenticate(other)
+        self.client.get(RECIPES_URL)
+        self.assertTrue(self.choose_replica.called)
+
+        self.choose_replica.reset_mock()
+        self.client.force_authenticate(self.user)
+        caches['default'].delete(replicas.pinned_key(self.user.pk))
+        self.client.get(RECIPES_URL)
+        self.assertTrue(self.choose_replica.called)
+
+    def test_raising_view_unmarks_replica_reads(self):
+        """Test an exception escaping the view does not leave later reads of the thread on the replicas"""
+        with patch('recipe.views.RecipeViewSet.list', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.get(RECIPES_URL)
+
+        self.assertFalse(replicas.replica_reads.get())
+
+
+@skipUnless(REPLICAS, 'Set DB_REPLICA_HOSTS to test reads from a replica database')
+@override_settings(DATABASE_REPLICAS={'ALIASES': REPLICAS})
+class ReplicaDatabaseTests(TestCase):
+    databases = {'default', *REPLICAS}
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = get_user_model().objects.create_user('replica@test.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def replica_queries(self, url):
+        with ExitStack() as stack:
+            contexts = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in REPLICAS]
+            self.client.get(url)
+        return sum(len(context) for context in contexts)
+
+    def test_reads_use_replica_until_user_writes(self):
+        """Test recipe reads query a replica database, except right after the user wrote"""
+        self.assertGreater(self.replica_queries(RECIPES_URL), 0)
+
+        self.client.post(RECIPES_URL, {'title': 'Soup', 'time_minutes': 5, 'price': 2})
+
+        self.assertEqual(self.replica_queries(RECIPES_URL), 0)
@@ -0,0 +1,74 @@
+import os
+import time
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from .. import models
+from ..search import search_recipes
+
+POSTGRES = connection.vendor == 'postgresql'
+BENCHMARKS = bool(os.environ.get('RECIPE_API_BENCHMARKS'))
+
+
+@skipUnless(POSTGRES, 'Full-text search vectors require PostgreSQL')
+class SearchVectorTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='search@test.com', password='SearchPassword')
+
+    def search(self, term):
+        return list(search_recipes(models.Recipe.objects.filter(user=self.user), term))
+
+    def test_vector_follows_title_and_relations(self):
+        """Test the stored search vector is maintained on recipe, tag and ingredient writes"""
+        recipe = models.Recipe.objects.create(user=self.user, title='Tomato soup', time_minutes=10, price=5.00)
+        tag = models.Tag.objects.create(user=self.user, name='Winter')
+        self.assertEqual(self.search('tomato'), [recipe])
+        self.assertEqual(self.search('winter'), [])
+
+        recipe.tags.add(tag)
+        self.assertEqual(self.search('winter'), [recipe])
+
+        tag.name = 'Autumn'
+        tag.save()
+        self.assertEqual(self.search('winter'), [])
+        self.assertEqual(self.search('autumn'), [recipe])
+
+        tag.delete()
+        self.assertEqual(self.search('autumn'), [])
+
+    def test_title_ranked_above_ingredient(self):
+        """Test title matches rank above ingredient matches"""
+        by_ingredient = models.Recipe.objects.create(user=self.user, title='Stew', time_minutes=10, price=5.00)
+        by_ingredient.ingredients.add(models.Ingredient.objects.create(user=self.user, name='Carrot'))
+        by_title = models.Recipe.objects.create(user=self.user, title='Carrot cake', time_minutes=10, price=5.00)
+
+        self.assertEqual(self.search('carrot'), [by_title, by_ingredient])
+
+
+@skipUnless(POSTGRES and BENCHMARKS, 'Set RECIPE_API_BENCHMARKS=1 with PostgreSQL to run benchmarks')
+class SearchBenchmark(TestCase):
+
+    def test_search_latency_is_flat(self):
+        """Benchmark search latency as the recipe table grows"""
+        user = get_user_model().objects.create_user(email='bench@test.com', password='BenchPassword')
+        words = ('apple', 'basil', 'chilli', 'dill', 'fennel', 'garlic', 'honey', 'leek', 'mango', 'pepper')
+        created = 0
+        for size in (1000, 10000, 100000):
+            models.Recipe.objects.bulk_create([
+                models.Recipe(user=user, title=f'{words[i % 10]} {words[i // 10 % 10]} {i}', time_minutes=10, price=5)
+                for i in range(created, size)])
+            created = size
+            connection.cursor().execute(
+                "UPDATE core_recipe SET search_vector = to_tsvector('english', title); ANALYZE core_recipe;")
+
+            queryset = search_recipes(models.Recipe.objects.filter(user=user), 'mango basil')[:20]
+            list(queryset)
+            start = time.perf_counter()
+            for _ in range(20):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - start) / 20
+            print(f'\nsearch over {size} recipes: {elapsed * 1000:.2f} ms/query')
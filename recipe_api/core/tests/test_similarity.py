@@ -0,0 +1,111 @@
+import random
+from io import StringIO
+from unittest.mock import patch
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from scipy import sparse
+
+from .. import models, similarity
+from ..similarity import get_similar, load_incidence, precompute_neighbours, top_neighbours
+
+
+def brute_force_neighbours(features, row, k):
+    scores = [(-len(features[row] & other) / len(features[row] | other), index)
+              for index, other in enumerate(features) if index != row and features[row] & other]
+    return [(index, -score) for score, index in sorted(scores)[:k]]
+
+
+class TopNeighboursTests(TestCase):
+
+    def test_matches_brute_force(self):
+        """Test the sparse top-k agrees with pairwise Jaccard similarities, including ties"""
+        rng = random.Random(3)
+        features = [set(rng.sample(range(30), rng.randint(1, 6))) for _ in range(120)]
+        rows, columns = zip(*((row, column) for row, items in enumerate(features) for column in items))
+        matrix = sparse.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=(len(features), 30))
+
+        sources, targets, scores = top_neighbours(matrix, np.arange(10, 60), 7)
+
+        for row in range(10, 60):
+            found = [(target, score) for source, target, score in zip(sources, targets, scores) if source == row]
+            expected = brute_force_neighbours(features, row, 7)
+            self.assertEqual([target for target, _ in found], [target for target, _ in expected])
+            np.testing.assert_allclose([score for _, score in found], [score for _, score in expected])
+
+    def test_common_feature_bounds_products(self):
+        """Test a feature shared by every row splits the product into chunks of at most max_overlaps entries"""
+        rng = random.Random(5)
+        features = [{0} | set(rng.sample(range(1, 30), rng.randint(0, 4))) for _ in range(60)]
+        rows, columns = zip(*((row, column) for row, items in enumerate(features) for column in items))
+        matrix = sparse.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=(len(features), 30))
+        expected = top_neighbours(matrix, np.arange(60), 5, max_overlaps=10 ** 6)
+
+        with patch.object(similarity, 'score_rows', wraps=similarity.score_rows) as score_rows:
+            found = top_neighbours(matrix, np.arange(60), 5, max_overlaps=200)
+
+        self.assertEqual(score_rows.call_count, 20)
+        self.assertTrue(all(len(call.args[2]) * 60 <= 200 for call in score_rows.call_args_list))
+        for found_array, expected_array in zip(found, expected):
+            np.testing.assert_array_equal(found_array, expected_array)
+
+
+class SimilarRecipesTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('similar@test.com', 'testpass')
+        self.tag = models.Tag.objects.create(user=self.user, name='Vegan')
+        self.tofu = models.Ingredient.objects.create(user=self.user, name='Tofu')
+        self.rice = models.Ingredient.objects.create(user=self.user, name='Rice')
+        self.bowl = self.create_recipe('Bowl', [self.tag], [self.tofu, self.rice])
+        self.wrap = self.create_recipe('Wrap', [], [self.tofu, self.rice])
+        self.curry = self.create_recipe('Curry', [self.tag], [])
+
+    def create_recipe(self, title, tags, ingredients):
+        recipe = models.Recipe.objects.create(user=self.user, title=title, time_minutes=10, price=5)
+        recipe.tags.add(*tags)
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def test_load_incidence(self):
+        """Test the incidence matrix has a row per linked recipe and a column per tag and ingredient"""
+        self.create_recipe('Unlinked', [], [])
+
+        with self.assertNumQueries(2):
+            recipe_ids, matrix = load_incidence(self.user.pk)
+
+        self.assertEqual(recipe_ids.tolist(), [self.bowl.pk, self.wrap.pk, self.curry.pk])
+        self.assertEqual(matrix.shape, (3, 3))
+        self.assertEqual(matrix.sum(axis=1).ravel().tolist(), [[3, 2, 1]])
+
+    def test_precomputed_neighbours(self):
+        """Test stored neighbours are served until the recipe's links change"""
+        self.assertEqual(precompute_neighbours(self.user.pk), 4)
+
+        with self.assertNumQueries(1):
+            similar = get_similar(self.bowl, 10)
+        self.assertEqual([recipe_id for recipe_id, _ in similar], [self.wrap.pk, self.curry.pk])
+        self.assertEqual(models.RecipeNeighbour.objects.get(recipe=self.curry).neighbour_id, self.bowl.pk)
+
+        self.bowl.tags.remove(self.tag)
+        self.assertFalse(models.RecipeNeighbour.objects.filter(recipe=self.bowl).exists())
+        self.assertEqual(get_similar(self.bowl, 10), [(self.wrap.pk, 1.0)])
+
+        self.tag.recipe_set.clear()
+        self.assertFalse(models.RecipeNeighbour.objects.filter(recipe=self.curry).exists())
+
+    @override_settings(SIMILAR_RECIPES={'ONLINE_MAX_RECIPES': 3})
+    def test_command_skips_small_catalogues(self):
+        """Test the command drops the neighbours of small catalogues and stores those of large ones"""
+        precompute_neighbours(self.user.pk)
+        call_command('precompute_similar_recipes', stdout=StringIO())
+        self.assertFalse(models.RecipeNeighbour.objects.exists())
+
+        self.create_recipe('Stir fry', [], [self.tofu])
+        out = StringIO()
+        call_command('precompute_similar_recipes', '--neighbours', '1', stdout=out)
+
+        self.assertEqual(models.RecipeNeighbour.objects.count(), 4)
+        self.assertIn('Stored 4 neighbours for 1 users', out.getvalue())
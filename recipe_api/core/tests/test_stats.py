@@ -0,0 +1,110 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from .. import models
+from ..stats import aggregate_stats, get_stats, summarize_stats
+
+COMPARED_FIELDS = ('recipe_count', 'price_counts', 'time_counts', 'tag_counts', 'ingredient_counts')
+
+
+def create_recipe(user, price, time_minutes=10, title='Recipe'):
+    return models.Recipe.objects.create(user=user, title=title, time_minutes=time_minutes, price=price)
+
+
+class RecipeStatsTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('stats@test.com', 'testpass')
+        self.tag = models.Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = models.Ingredient.objects.create(user=self.user, name='Tofu')
+
+    def assertStatsConsistent(self):
+        stored = models.RecipeStats.objects.get(user=self.user)
+        expected = aggregate_stats(self.user.pk)
+        for field in COMPARED_FIELDS:
+            self.assertEqual(getattr(stored, field), getattr(expected, field), field)
+
+    def test_incremental_updates_match_aggregate(self):
+        """Test recipe, relation and attribute writes keep the statistics in line with a full aggregate"""
+        other_tag = models.Tag.objects.create(user=self.user, name='Quick')
+        first = create_recipe(self.user, 5.99, 15)
+        first.tags.add(self.tag, other_tag)
+        first.ingredients.add(self.ingredient)
+        second = create_recipe(self.user, Decimal('12.50'), 45)
+        self.tag.recipe_set.add(second)
+        self.assertStatsConsistent()
+
+        first.price = Decimal('7.00')
+        first.save()
+        first.tags.remove(other_tag, self.tag)
+        second.tags.clear()
+        self.assertStatsConsistent()
+
+        first.tags.add(other_tag)
+        other_tag.delete()
+        second.delete()
+        self.assertStatsConsistent()
+        self.assertEqual(models.RecipeStats.objects.get(user=self.user).recipe_count, 1)
+
+    def test_statistics_of_other_users_untouched(self):
+        """Test writes only change the statistics of the recipe owner"""
+        other = get_user_model().objects.create_user('other@test.com', 'testpass')
+        create_recipe(other, 3)
+        create_recipe(self.user, 4)
+
+        self.assertEqual(models.RecipeStats.objects.get(user=other).recipe_count, 1)
+        self.assertEqual(models.RecipeStats.objects.get(user=self.user).recipe_count, 1)
+
+    def test_missing_statistics_computed_on_demand(self):
+        """Test statistics are rebuilt from the recipes when no row was stored yet"""
+        create_recipe(self.user, 4)
+        models.RecipeStats.objects.all().delete()
+
+        self.assertEqual(get_stats(self.user.pk).recipe_count, 1)
+        self.assertTrue(models.RecipeStats.objects.filter(user=self.user).exists())
+
+    def test_deleting_user_deletes_statistics(self):
+        """Test the statistics row goes away with its user"""
+        create_recipe(self.user, 4).tags.add(self.tag)
+        self.user.delete()
+
+        self.assertFalse(models.RecipeStats.objects.exists())
+
+    def test_summary(self):
+        """Test the summary reports count, average, median, time histogram and top tags"""
+        for price, minutes in ((2, 5), (4, 25), (10, 25), (20, 200)):
+            create_recipe(self.user, price, minutes).tags.add(self.tag)
+
+        summary = summarize_stats(get_stats(self.user.pk))
+
+        self.assertEqual(summary['recipe_count'], 4)
+        self.assertEqual(summary['price'], {'average': Decimal('9.00'), 'median': Decimal('7.00')})
+        counts = {bucket['max_minutes']: bucket['count'] for bucket in summary['time_minutes']}
+        self.assertEqual((counts[10], counts[30], counts[None]), (1, 2, 1))
+        self.assertEqual(summary['top_tags'], [{'id': self.tag.id, 'name': 'Vegan', 'count': 4}])
+        self.assertEqual(summary['top_ingredients'], [])
+
+    def test_empty_summary(self):
+        """Test the summary of a user without recipes"""
+        summary = summarize_stats(get_stats(self.user.pk))
+
+        self.assertEqual(summary['recipe_count'], 0)
+        self.assertEqual(summary['price'], {'average': None, 'median': None})
+
+    def test_rebuild_command_repairs_drift(self):
+        """Test the check reports drifted statistics and a rebuild repairs them"""
+        recipe = create_recipe(self.user, 4)
+        models.Recipe.objects.filter(pk=recipe.pk).update(price=8)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_recipe_stats', '--check', stdout=StringIO())
+        call_command('rebuild_recipe_stats', stdout=StringIO())
+        stdout = StringIO()
+        call_command('rebuild_recipe_stats', '--check', stdout=stdout)
+
+        self.assertIn('0 inconsistent', stdout.getvalue())
+        self.assertEqual(models.RecipeStats.objects.get(user=self.user).price_counts, {'800': 1})
@@ -0,0 +1,14 @@
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from .metrics import get_config, registry
+
+
+@require_GET
+def metrics(request):
+    """Expose the request metrics of this process in the Prometheus text format"""
+    token = get_config('TOKEN')
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,87 @@
+import logging
+import os
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+# Modules whose import is otherwise paid for by the first request that needs them
+WARM_UP_MODULES = (
+    'recipe.serializers',
+    'recipe.readers',
+    'user.serializers',
+    'core.renderers',
+    'core.parsers',
+)
+
+
+def load_urlconf():
+    """Import every view module and build the URL resolver's lookup tables"""
+    resolver = get_resolver()
+    resolver.url_patterns
+    resolver.reverse_dict
+
+
+def import_modules():
+    for module in WARM_UP_MODULES:
+        import_module(module)
+
+
+def open_connections():
+    """Open the connection to every database kept between requests (CONN_MAX_AGE), for the first request to reuse"""
+    for alias in connections:
+        if connections[alias].settings_dict['CONN_MAX_AGE'] == 0:
+            continue
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError as exc:
+            logger.warning('Could not open a connection to database %s during warm-up: %s', alias, exc)
+
+
+_fork_hooks_registered = False
+
+
+def open_connections_per_process():
+    """Open the database connections now, and again in every process forked afterwards
+
+    A pre-fork server importing the application in its master process
+    (--preload) forks its workers after the warm-up: the connections are
+    closed before every fork, so no worker inherits and shares them, and
+    each child opens its own.
+    """
+    global _fork_hooks_registered
+    if not _fork_hooks_registered and hasattr(os, 'register_at_fork'):
+        os.register_at_fork(before=connections.close_all, after_in_child=open_connections)
+        _fork_hooks_registered = True
+    open_connections()
+
+
+PHASES = (
+    ('urlconf', load_urlconf),
+    ('modules', import_modules),
+    ('connections', open_connections_per_process),
+)
+
+
+def warm_up():
+    """Run the start-up phases that would otherwise slow down the first requests
+
+    Returns the duration in seconds of each phase, which are also logged.
+    Database errors are logged rather than raised, so a warm-up never stops
+    the server from starting.
+    """
+    timings = {}
+    for name, phase in PHASES:
+        start = time.perf_counter()
+        phase()
+        timings[name] = time.perf_counter() - start
+    logger.info('Warm-up finished: %s', ', '.join(f'{name} {seconds:.3f}s' for name, seconds in timings.items()))
+    return timings
+
+
+def warm_up_enabled():
+    return getattr(settings, 'WARM_UP', True)
@@ -0,0 +1,50 @@
+from core.async_views import async_api_view, json_response, sync_read
+from core.models import Ingredient, Recipe, Tag
+from rest_framework import exceptions, status
+
+from .readers import (ATTRIBUTE_COLUMNS, RECIPE_COLUMNS, RECIPE_DETAIL_COLUMNS, serialize_attributes,
+                      serialize_recipe_details, serialize_recipes)
+
+
+def read_recipes(user):
+    """Return the recipe list representation of the user's recipes"""
+    return serialize_recipes(Recipe.objects.filter(user=user).order_by('id').values(*RECIPE_COLUMNS))
+
+
+def read_recipe(user, pk, request):
+    """Return the recipe detail representation of one of the user's recipes, or None"""
+    rows = Recipe.objects.filter(user=user, pk=pk).values(*RECIPE_DETAIL_COLUMNS)
+    details = serialize_recipe_details(rows, request)
+    return details[0] if details else None
+
+
+def read_attributes(model, user):
+    """Return the list representation of the user's tags or ingredients"""
+    return serialize_attributes(model.objects.filter(user=user).order_by('-name').values(*ATTRIBUTE_COLUMNS))
+
+
+@async_api_view
+async def recipe_list(request):
+    """Async API view listing the authenticated user's recipes"""
+    return json_response(await sync_read(read_recipes)(request.user))
+
+
+@async_api_view
+async def recipe_detail(request, pk):
+    """Async API view retrieving one of the authenticated user's recipes"""
+    recipe = await sync_read(read_recipe)(request.user, pk, request)
+    if recipe is None:
+        return json_response({'detail': exceptions.NotFound.default_detail}, status.HTTP_404_NOT_FOUND)
+    return json_response(recipe)
+
+
+@async_api_view
+async def tag_list(request):
+    """Async API view listing the authenticated user's tags"""
+    return json_response(await sync_read(read_attributes)(Tag, request.user))
+
+
+@async_api_view
+async def ingredient_list(request):
+    """Async API view listing the authenticated user's ingredients"""
+    return json_response(await sync_read(read_attributes)(Ingredient, request.user))
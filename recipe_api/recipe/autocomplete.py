@@ -0,0 +1,167 @@
+import logging
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from core.models import normalize_name
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.db.models.functions import Collate
+
+from .cache import get_attribute_version, is_enabled
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MAX_USERS': 50,
+    'HOT_AFTER': 20,
+    'EAGER': False,
+}
+
+# Collations comparing strings by code point, like Python, used to order names identically in SQL and in memory
+BINARY_COLLATIONS = {
+    'postgresql': 'C',
+    'sqlite': 'BINARY',
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_config(name):
+    """Return an autocomplete cache setting from AUTOCOMPLETE_CACHE"""
+    return getattr(settings, 'AUTOCOMPLETE_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def get_executor():
+    """Return the thread loading name indexes in the background, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='autocomplete')
+        return _executor
+
+
+def name_order(using='default'):
+    """Return the expression names are matched and ordered by: their normalised name_key, compared by code point
+
+    On PostgreSQL the core_tag_name_key_prefix and core_ingredient_name_key_prefix
+    indexes are built on this expression, so prefix lookups and their
+    ordering are both answered from the index.
+    """
+    collation = BINARY_COLLATIONS.get(connections[using].vendor)
+    return Collate('name_key', collation) if collation else F('name_key')
+
+
+def autocomplete_names(queryset, prefix='', term=''):
+    """Filter tags or ingredients whose name starts with prefix and contains term, ignoring case, ordered by name"""
+    queryset = queryset.annotate(name_order=name_order(queryset.db))
+    if prefix:
+        queryset = queryset.filter(name_order__startswith=normalize_name(prefix))
+    if term:
+        queryset = queryset.filter(name_key__contains=normalize_name(term))
+    return queryset.order_by('name_order', 'id')
+
+
+class NameIndex:
+    """Names of one user's tags or ingredients, sorted like autocomplete_names for bisect prefix searches"""
+
+    def __init__(self, version, rows):
+        rows = sorted((normalize_name(name), pk, name) for pk, name in rows)
+        self.version = version
+        self.keys = [key for key, _, _ in rows]
+        self.rows = [{'id': pk, 'name': name} for _, pk, name in rows]
+
+    @classmethod
+    def build(cls, model, user_id, version):
+        return cls(version, model.objects.filter(user_id=user_id).values_list('id', 'name'))
+
+    def search(self, prefix, limit):
+        """Return the first limit {id, name} rows whose name starts with prefix, ignoring case"""
+        prefix = normalize_name(prefix)
+        start = end = bisect_left(self.keys, prefix)
+        stop = min(start + limit, len(self.keys))
+        while end < stop and self.keys[end].startswith(prefix):
+            end += 1
+        return self.rows[start:end]
+
+
+class NameIndexCache:
+    """Thread-safe LRU of the name indexes of the users autocompleting most, checked against their attribute version
+
+    A user's names are only loaded after HOT_AFTER prefix lookups reached
+    this process, so occasional users are served by the database indexes
+    alone. Indexes are (re)loaded in the background while the database keeps
+    answering, so a write never makes a keystroke wait for its reload.
+    """
+
+    def __init__(self):
+        self._indexes = OrderedDict()
+        self._hits = {}
+        self._loading = set()
+        self._lock = threading.Lock()
+
+    def search(self, model, user_id, prefix, limit):
+        """Return the matching {id, name} rows from the user's up to date index, or None to query the database"""
+        if not is_enabled():
+            return None
+        key = (model._meta.label, user_id)
+        version = get_attribute_version(user_id)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+            elif not self.is_hot(key):
+                return None
+            load = (index is None or index.version != version) and key not in self._loading
+            if load:
+                self._loading.add(key)
+
+        if load:
+            if get_config('EAGER'):
+                index = self.load(model, user_id, version)
+            else:
+                get_executor().submit(self.load, model, user_id, version)
+        if index is None or index.version != version:
+            return None
+        return index.search(prefix, limit)
+
+    def is_hot(self, key):
+        """Count a lookup of a user without index and return whether it reached HOT_AFTER; call with the lock"""
+        if len(self._hits) > 10 * get_config('MAX_USERS'):
+            # Forget stale counts instead of tracking every user that ever autocompleted
+            self._hits.clear()
+        self._hits[key] = self._hits.get(key, 0) + 1
+        return self._hits[key] >= get_config('HOT_AFTER')
+
+    def load(self, model, user_id, version):
+        """Load and cache the name index of the user at the version"""
+        key = (model._meta.label, user_id)
+        try:
+            index = NameIndex.build(model, user_id, version)
+            with self._lock:
+                self._indexes[key] = index
+                self._indexes.move_to_end(key)
+                self._hits.pop(key, None)
+                while len(self._indexes) > get_config('MAX_USERS'):
+                    self._indexes.popitem(last=False)
+            return index
+        except Exception:
+            if get_config('EAGER'):
+                raise
+            logger.exception('Loading the autocomplete index of %s %s failed', model._meta.label, user_id)
+        finally:
+            with self._lock:
+                self._loading.discard(key)
+            if not get_config('EAGER'):
+                connections.close_all()
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._hits.clear()
+
+
+name_indexes = NameIndexCache()
@@ -0,0 +1,196 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+USER_VERSION_KEY = 'recipe-api:user-version:{}'
+ATTRIBUTE_VERSION_KEY = 'recipe-api:attribute-version:{}'
+RECIPE_VERSION_KEY = 'recipe-api:recipe-version:{}:{}'
+COOKABLE_VERSION_KEY = 'recipe-api:cookable-version:{}'
+RESPONSE_KEY = 'recipe-api:response:{}:{}:{}'
+
+
+def get_config(name):
+    """Return a response cache setting from RESPONSE_CACHE"""
+    return getattr(settings, 'RESPONSE_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def is_enabled():
+    """Return whether responses, ETags and in-memory indexes are cached against the per-user data versions"""
+    return get_config('ENABLED')
+
+
+def get_cache():
+    """Return the cache backend holding data versions and responses"""
+    return caches[get_config('CACHE_ALIAS')]
+
+
+def new_version():
+    """Return a starting version that is larger than any version handed out before"""
+    return time.time_ns()
+
+
+def get_version(key):
+    """Return the current version stored under the key, initialising it if missing"""
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Increment the version stored under the key in O(1) and return the new version"""
+    cache = get_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = new_version()
+        return version if cache.add(key, version, None) else cache.get(key)
+
+
+def get_user_version(user_id):
+    """Return the version of all recipe data owned by the user"""
+    return get_version(USER_VERSION_KEY.format(user_id))
+
+
+def bump_user_version(user_id):
+    """Invalidate every cached response of the user"""
+    bump_version(USER_VERSION_KEY.format(user_id))
+
+
+def get_attribute_version(user_id):
+    """Return the version of the tags and ingredients owned by the user"""
+    return get_version(ATTRIBUTE_VERSION_KEY.format(user_id))
+
+
+def bump_attribute_version(user_id):
+    """Mark the tags or ingredients of the user as changed"""
+    bump_version(ATTRIBUTE_VERSION_KEY.format(user_id))
+
+
+def get_recipe_version(user_id, recipe_id):
+    """Return the version of a single recipe of the user"""
+    return get_version(RECIPE_VERSION_KEY.format(user_id, recipe_id))
+
+
+def bump_recipe_version(user_id, recipe_id):
+    """Mark a single recipe of the user as changed"""
+    bump_version(RECIPE_VERSION_KEY.format(user_id, recipe_id))
+
+
+def bump_versions_on_commit(user_id, recipe_id=None, attributes=False, using='default'):
+    """Invalidate the cached responses of the user once the current transaction commits
+
+    Bumping earlier would let a concurrent request read the rows from before
+    the commit and cache them under the new versions.
+    """
+    def bump():
+        bump_user_version(user_id)
+        if recipe_id is not None:
+            bump_recipe_version(user_id, recipe_id)
+        if attributes:
+            bump_attribute_version(user_id)
+
+    transaction.on_commit(bump, using=using)
+
+
+def get_cookable_version(user_id):
+    """Return the version of the recipe ingredients of the user, as seen by the cookable index"""
+    return get_version(COOKABLE_VERSION_KEY.format(user_id))
+
+
+def bump_cookable_version(user_id):
+    """Mark the recipe ingredients of the user as changed and return the new version"""
+    return bump_version(COOKABLE_VERSION_KEY.format(user_id))
+
+
+def reset_user_version(user_id):
+    """Start fresh versions for a new user, so reused ids never see older entries"""
+    version = new_version()
+    get_cache().set_many({
+        USER_VERSION_KEY.format(user_id): version,
+        ATTRIBUTE_VERSION_KEY.format(user_id): version,
+        COOKABLE_VERSION_KEY.format(user_id): version,
+    }, None)
+
+
+class CacheStats:
+    """Hit and miss counters of the response cache"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+stats = CacheStats()
+
+
+def get_response_key(request):
+    """Return the cache key of the response to a request at the user's current data version"""
+    version = get_user_version(request.user.pk)
+    variant = f'{request.accepted_renderer.format}:{request.build_absolute_uri()}'
+    digest = hashlib.sha1(variant.encode('utf-8')).hexdigest()
+    return RESPONSE_KEY.format(request.user.pk, version, digest)
+
+
+def cached_response(handler, request, *args, **kwargs):
+    """Return the cached response data for the request, or call the handler and cache its data"""
+    if not is_enabled():
+        return handler(request, *args, **kwargs)
+
+    cache = get_cache()
+    key = get_response_key(request)
+    data = cache.get(key)
+    if data is not None:
+        stats.record(hit=True)
+        return Response(data, headers={'X-Cache': 'HIT'})
+
+    stats.record(hit=False)
+    response = handler(request, *args, **kwargs)
+    if response.status_code == 200:
+        cache.set(key, response.data, get_config('TIMEOUT'))
+        response['X-Cache'] = 'MISS'
+    return response
+
+
+class CachedListMixin:
+    """Serve list responses from the per-user versioned response cache"""
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(super().list, request, *args, **kwargs)
+
+
+class CachedRetrieveMixin:
+    """Serve retrieve responses from the per-user versioned response cache"""
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,21 @@
+from core.checks import is_process_local_cache
+from django.core.checks import Error, Tags, register
+
+from .cache import get_config
+
+
+@register(Tags.caches)
+def check_shared_version_cache(app_configs, **kwargs):
+    """Require the per-user data versions to live in a cache shared by every process
+
+    Responses, ETags and the cookable and autocomplete indexes are checked
+    against these versions, so a process that misses the writes handled by
+    another one would keep serving stale data.
+    """
+    if not get_config('ENABLED') or not is_process_local_cache(get_config('CACHE_ALIAS')):
+        return []
+    return [Error(
+        f'RESPONSE_CACHE is enabled on the process-local cache "{get_config("CACHE_ALIAS")}".',
+        hint='Set CACHE_BACKEND to a cache shared by every process, or RESPONSE_CACHE_ENABLED=0.',
+        id='recipe.E001',
+    )]
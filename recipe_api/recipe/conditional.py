@@ -0,0 +1,65 @@
+import hashlib
+
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import get_attribute_version, get_recipe_version, get_user_version, is_enabled
+
+
+def make_etag(*parts):
+    """Return a strong ETag for the version parts"""
+    digest = hashlib.sha1(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def get_variant(request):
+    """Return what distinguishes representations of the same data"""
+    return f'{request.accepted_renderer.format}:{request.build_absolute_uri()}'
+
+
+def conditional_response(etag, handler, request, *args, **kwargs):
+    """Answer 304 Not Modified when the client already has the ETag, else call the handler and tag its response"""
+    if etag is None:
+        return handler(request, *args, **kwargs)
+
+    if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+    response = handler(request, *args, **kwargs)
+    if response.status_code == status.HTTP_200_OK:
+        response['ETag'] = etag
+    return response
+
+
+class ConditionalListMixin:
+    """Support If-None-Match on list responses using the per-user data version
+
+    Like the response cache, ETags are only sent while the data versions are
+    shared by every process, so no worker answers 304 after another one
+    handled a write.
+    """
+
+    def list(self, request, *args, **kwargs):
+        etag = None
+        if is_enabled():
+            etag = make_etag(request.user.pk, get_user_version(request.user.pk), get_variant(request))
+        return conditional_response(etag, super().list, request, *args, **kwargs)
+
+
+class ConditionalRetrieveMixin:
+    """Support If-None-Match on recipe detail responses using per-recipe versions
+
+    The detail ETag combines the recipe version with the version of the user's
+    tags and ingredients, so editing one recipe leaves the others untouched.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = str(kwargs.get(self.lookup_url_kwarg or self.lookup_field, ''))
+        etag = None
+        if pk.isdigit() and is_enabled():
+            user_id = request.user.pk
+            etag = make_etag(user_id, get_recipe_version(user_id, pk), get_attribute_version(user_id),
+                             get_variant(request))
+        return conditional_response(etag, super().retrieve, request, *args, **kwargs)
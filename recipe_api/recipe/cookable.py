@@ -0,0 +1,269 @@
+import heapq
+import threading
+from collections import OrderedDict, defaultdict
+
+from core.models import Recipe
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast
+
+from .cache import bump_cookable_version, get_cookable_version, is_enabled
+
+DEFAULTS = {
+    'MAX_USERS': 1000,
+}
+
+
+def get_config(name):
+    """Return a cookable index setting from COOKABLE_INDEX"""
+    return getattr(settings, 'COOKABLE_INDEX', {}).get(name, DEFAULTS[name])
+
+
+def add_to_counter(planes, bits):
+    """Add one to the bit-sliced counter of every position set in bits
+
+    planes[k] holds bit k of every position's count, so one bitwise ripple
+    carry counts a whole posting at once instead of one recipe at a time.
+    """
+    carry = bits
+    for index, plane in enumerate(planes):
+        planes[index] = plane ^ carry
+        carry &= plane
+        if not carry:
+            return
+    planes.append(carry)
+
+
+def set_positions(bits):
+    """Yield the positions set in bits, in increasing order"""
+    digits = format(bits, 'b')[::-1]
+    position = digits.find('1')
+    while position != -1:
+        yield position
+        position = digits.find('1', position + 1)
+
+
+class IngredientIndex:
+    """Inverted index of one user's recipes: ingredient id -> bitset of recipe positions
+
+    Recipes get dense bit positions, reused after deletion, so bitsets stay
+    as small as the user's catalogue. The version is the user's cookable
+    version the index reflects.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.lock = threading.Lock()
+        self.positions = {}
+        self.recipe_ids = []
+        self.ingredients = []
+        self.free = []
+        self.postings = {}
+
+    @classmethod
+    def build(cls, user_id, version):
+        """Load the index of the user in two queries"""
+        index = cls(version)
+        for recipe_id in Recipe.objects.filter(user_id=user_id).order_by('id').values_list('id', flat=True):
+            index.add_recipe(recipe_id)
+        links = Recipe.ingredients.through.objects.filter(recipe__user_id=user_id)
+        for recipe_id, ingredient_id in links.values_list('recipe_id', 'ingredient_id'):
+            index.link(recipe_id, (ingredient_id,))
+        return index
+
+    def add_recipe(self, recipe_id):
+        if recipe_id in self.positions:
+            return
+        if self.free:
+            position = self.free.pop()
+            self.recipe_ids[position] = recipe_id
+            self.ingredients[position] = set()
+        else:
+            position = len(self.recipe_ids)
+            self.recipe_ids.append(recipe_id)
+            self.ingredients.append(set())
+        self.positions[recipe_id] = position
+
+    def remove_recipe(self, recipe_id):
+        position = self.positions.pop(recipe_id, None)
+        if position is None:
+            return
+        self.unlink_position(position, self.ingredients[position])
+        self.recipe_ids[position] = None
+        self.ingredients[position] = None
+        self.free.append(position)
+
+    def link(self, recipe_id, ingredient_ids):
+        position = self.positions.get(recipe_id)
+        if position is None:
+            return
+        bit = 1 << position
+        for ingredient_id in ingredient_ids:
+            self.postings[ingredient_id] = self.postings.get(ingredient_id, 0) | bit
+            self.ingredients[position].add(ingredient_id)
+
+    def unlink(self, recipe_id, ingredient_ids):
+        position = self.positions.get(recipe_id)
+        if position is not None:
+            self.unlink_position(position, ingredient_ids)
+
+    def unlink_position(self, position, ingredient_ids):
+        mask = ~(1 << position)
+        for ingredient_id in list(ingredient_ids):
+            bits = self.postings.get(ingredient_id, 0) & mask
+            if bits:
+                self.postings[ingredient_id] = bits
+            else:
+                self.postings.pop(ingredient_id, None)
+            self.ingredients[position].discard(ingredient_id)
+
+    def clear_recipe(self, recipe_id):
+        position = self.positions.get(recipe_id)
+        if position is not None:
+            self.unlink_position(position, self.ingredients[position])
+
+    def remove_ingredient(self, ingredient_id):
+        bits = self.postings.pop(ingredient_id, 0)
+        for position in set_positions(bits):
+            self.ingredients[position].discard(ingredient_id)
+
+    def change_links(self, action, reverse, pk, pk_set):
+        """Apply a post_add, post_remove or post_clear of Recipe.ingredients, from either side"""
+        if not reverse:
+            if action == 'post_add':
+                self.link(pk, pk_set)
+            elif action == 'post_remove':
+                self.unlink(pk, pk_set)
+            else:
+                self.clear_recipe(pk)
+        elif action == 'post_clear':
+            self.remove_ingredient(pk)
+        else:
+            for recipe_id in pk_set:
+                if action == 'post_add':
+                    self.link(recipe_id, (pk,))
+                else:
+                    self.unlink(recipe_id, (pk,))
+
+    def rank(self, have, limit):
+        """Return (recipe id, matched, required, missing ingredient ids) of the best covered recipes
+
+        Recipes are ordered by the fraction of their ingredients on hand, then
+        by fewest missing ingredients. Recipes sharing no ingredient with
+        have, and recipes without ingredients, are left out.
+        """
+        have = set(have)
+        planes = []
+        candidates = 0
+        for ingredient_id in have:
+            bits = self.postings.get(ingredient_id)
+            if bits:
+                add_to_counter(planes, bits)
+                candidates |= bits
+
+        digits = [format(plane, 'b')[::-1] for plane in planes]
+        ranked = []
+        for position in set_positions(candidates):
+            matched = sum(1 << k for k, plane in enumerate(digits) if position < len(plane) and plane[position] == '1')
+            required = len(self.ingredients[position])
+            ranked.append((-matched / required, required - matched, self.recipe_ids[position], position, matched))
+
+        return [
+            (recipe_id, matched, matched + missing, sorted(self.ingredients[position] - have))
+            for _, missing, recipe_id, position, matched in heapq.nsmallest(limit, ranked)
+        ]
+
+
+class IngredientIndexCache:
+    """Thread-safe LRU of per-user ingredient indexes, checked against the user's cookable version"""
+
+    def __init__(self):
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return the up to date index of the user, building it when missing or outdated"""
+        version = get_cookable_version(user_id)
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+        if index is not None and index.version == version:
+            return index
+
+        index = IngredientIndex.build(user_id, version)
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > get_config('MAX_USERS'):
+                self._indexes.popitem(last=False)
+        return index
+
+    def apply(self, user_id, update):
+        """Record a committed write of the user and apply update(index) to the index in memory
+
+        The update is only applied when the write's version directly follows
+        the index version; otherwise a write from another process was missed
+        and the index is dropped to be rebuilt on the next request.
+        """
+        version = bump_cookable_version(user_id)
+        with self._lock:
+            index = self._indexes.get(user_id)
+        if index is None:
+            return
+        with index.lock:
+            if version is not None and index.version + 1 == version:
+                update(index)
+                index.version = version
+                return
+        with self._lock:
+            if self._indexes.get(user_id) is index:
+                del self._indexes[user_id]
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+indexes = IngredientIndexCache()
+
+
+def record_write(user_id, update, using='default'):
+    """Update the cookable index of the user once the current transaction commits"""
+    transaction.on_commit(lambda: indexes.apply(user_id, update), using=using)
+
+
+def rank_in_database(user_id, have, limit):
+    """Return the ranking of IngredientIndex.rank computed by the database, in two queries"""
+    have = set(have)
+    if not have:
+        return []
+    ranked = list(
+        Recipe.objects.filter(user_id=user_id).values('id')
+        .annotate(required=Count('ingredients'), matched=Count('ingredients', filter=Q(ingredients__in=have)))
+        .filter(matched__gt=0)
+        .annotate(coverage=Cast('matched', FloatField()) / F('required'))
+        .order_by('-coverage', F('required') - F('matched'), 'id')
+        .values_list('id', 'matched', 'required')[:limit])
+
+    missing = defaultdict(list)
+    links = (Recipe.ingredients.through.objects.filter(recipe_id__in=[row[0] for row in ranked])
+             .exclude(ingredient_id__in=have).order_by('ingredient_id'))
+    for recipe_id, ingredient_id in links.values_list('recipe_id', 'ingredient_id'):
+        missing[recipe_id].append(ingredient_id)
+    return [(recipe_id, matched, required, missing[recipe_id]) for recipe_id, matched, required in ranked]
+
+
+def rank_cookable(user_id, have, limit):
+    """Return the ranking of the user's recipes by coverage of the ingredients on hand
+
+    The in-memory indexes only learn about the writes of other processes
+    through the shared version cache, so without it (RESPONSE_CACHE
+    disabled) the database ranks the recipes instead.
+    """
+    if not is_enabled():
+        return rank_in_database(user_id, have, limit)
+    index = indexes.get(user_id)
+    with index.lock:
+        return index.rank(have, limit)
@@ -0,0 +1,69 @@
+import csv
+from itertools import islice
+
+from core.models import Recipe
+
+from .renderers import json_line
+
+EXPORT_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link', 'tags', 'ingredients')
+
+
+def names_by_recipe(through, field, recipe_ids):
+    """Return the tag or ingredient names of each recipe in one query"""
+    name_field = f'{field}__name'
+    names = {}
+    rows = through.objects.filter(recipe_id__in=recipe_ids).order_by('recipe_id', name_field)
+    for recipe_id, name in rows.values_list('recipe_id', name_field):
+        names.setdefault(recipe_id, []).append(name)
+    return names
+
+
+def iter_export_rows(queryset, chunk_size):
+    """Yield every recipe with its tag and ingredient names, holding one chunk in memory at a time
+
+    Recipes are read through a server-side cursor and the names of each chunk
+    are fetched with one query per relation, selecting the chunk by its id
+    range rather than binding every id.
+    """
+    rows = queryset.order_by('id').values_list('id', 'title', 'time_minutes', 'price', 'link')
+    rows = rows.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        recipe_ids = queryset.filter(id__range=(chunk[0][0], chunk[-1][0])).order_by().values('id')
+        tags = names_by_recipe(Recipe.tags.through, 'tag', recipe_ids)
+        ingredients = names_by_recipe(Recipe.ingredients.through, 'ingredient', recipe_ids)
+        for recipe_id, title, time_minutes, price, link in chunk:
+            yield {
+                'id': recipe_id,
+                'title': title,
+                'time_minutes': time_minutes,
+                'price': str(price),
+                'link': link,
+                'tags': tags.get(recipe_id, []),
+                'ingredients': ingredients.get(recipe_id, []),
+            }
+
+
+def ndjson_lines(rows):
+    """Yield the rows as newline delimited JSON"""
+    for row in rows:
+        yield json_line(row)
+
+
+class Echo:
+    """File-like object returning what is written, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    """Yield the rows as CSV, joining tag and ingredient names with semicolons"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        row['tags'] = ';'.join(row['tags'])
+        row['ingredients'] = ';'.join(row['ingredients'])
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
@@ -0,0 +1,87 @@
+from rest_framework.exceptions import ValidationError
+
+
+def parse_field_names(request, param):
+    """Return the comma separated field names of a query parameter, or None when it is missing"""
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def get_sparse_fields(request, available):
+    """Return the available fields kept by ?fields= and ?omit=, in their declared order, or None to keep all"""
+    fields = parse_field_names(request, 'fields')
+    omit = parse_field_names(request, 'omit')
+    if fields is None and omit is None:
+        return None
+
+    for param, names in (('fields', fields), ('omit', omit)):
+        unknown = [name for name in names or () if name not in available]
+        if unknown:
+            raise ValidationError({param: [f'Unknown fields: {", ".join(unknown)}.']})
+
+    selected = tuple(name for name in available if (fields is None or name in fields) and name not in (omit or ()))
+    if not selected:
+        raise ValidationError({'fields': ['Select at least one field.']})
+    return selected
+
+
+def get_expanded_fields(request, expandable):
+    """Return the relations of expandable listed in ?expand=, rejecting the others"""
+    names = parse_field_names(request, 'expand') or ()
+    unknown = [name for name in names if name not in expandable]
+    if unknown:
+        raise ValidationError({'expand': [f'Cannot expand: {", ".join(unknown)}. Expected {", ".join(expandable)}.']})
+    return tuple(name for name in expandable if name in names)
+
+
+def get_only_columns(model, fields):
+    """Return the concrete columns of the model needed to render the fields, always including the primary key"""
+    concrete = {field.name for field in model._meta.concrete_fields}
+    return (model._meta.pk.name,) + tuple(name for name in fields if name in concrete and name != model._meta.pk.name)
+
+
+class SparseFieldsSerializerMixin:
+    """Serializer keeping only the fields named in its `fields` keyword argument"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class SparseFieldsMixin:
+    """Narrow list and retrieve responses with ?fields= or ?omit=, and expand relations with ?expand=
+
+    Views use get_sparse_fields to skip the columns, relations and
+    serialization work of the fields left out, and get_expanded_fields to
+    inline the representations of expandable_fields. Writes always use every
+    field.
+    """
+    sparse_actions = ('list', 'retrieve')
+    expandable_fields = ()
+    expand_actions = ('list',)
+
+    def get_sparse_fields(self):
+        """Return the names of the fields requested, or None for all of them"""
+        if self.action not in self.sparse_actions:
+            return None
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = get_sparse_fields(self.request, self.get_serializer_class().Meta.fields)
+        return self._sparse_fields
+
+    def get_expanded_fields(self):
+        """Return the relations to render as nested objects instead of ids"""
+        if self.action not in self.expand_actions:
+            return ()
+        if not hasattr(self, '_expanded_fields'):
+            self._expanded_fields = get_expanded_fields(self.request, self.expandable_fields)
+        return self._expanded_fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,147 @@
+import json
+import time
+from contextlib import nullcontext
+
+from core.models import Ingredient, Recipe, Tag
+from core.signals import recipes_bulk_created
+from django.db import connections, router, transaction
+
+from .serializers import RecipeImportSerializer
+
+ATOMIC_MODES = ('batch', 'all')
+MAX_REPORTED_ERRORS = 100
+
+
+def parse_ndjson(lines):
+    """Yield (line number, record) for each non-blank NDJSON line, with a ValueError as the record if invalid"""
+    for line_number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield line_number, ValueError(f'Invalid JSON: {exc}')
+            continue
+        if not isinstance(record, dict):
+            yield line_number, ValueError('Expected a JSON object')
+            continue
+        yield line_number, record
+
+
+def unique(names):
+    """Return the names without duplicates, keeping their order"""
+    return list(dict.fromkeys(names))
+
+
+class ImportResult:
+    """Outcome of a recipe import"""
+
+    def __init__(self, created, errors, elapsed):
+        self.created = created
+        self.errors = errors
+        self.elapsed = elapsed
+
+    @property
+    def rows_per_second(self):
+        return self.created / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'error_count': len(self.errors),
+            'errors': self.errors[:MAX_REPORTED_ERRORS],
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+class RecipeImporter:
+    """Import recipes for a user in batches
+
+    Tags and ingredients are resolved by name, creating the missing ones, with
+    a few queries per batch; recipes and through-table rows are inserted with
+    bulk_create. Each batch runs in its own transaction, or the whole import
+    in a single one with atomic='all'. Invalid records are skipped and
+    reported with their line number.
+    """
+
+    def __init__(self, user, batch_size=500, atomic='batch'):
+        if batch_size <= 0:
+            raise ValueError('batch_size must be positive')
+        if atomic not in ATOMIC_MODES:
+            raise ValueError(f'atomic must be one of {", ".join(ATOMIC_MODES)}')
+        self.user = user
+        self.batch_size = batch_size
+        self.atomic = atomic
+        self.using = router.db_for_write(Recipe)
+        self.attribute_ids = {Tag: {}, Ingredient: {}}
+
+    def run(self, records):
+        """Import (line number, record) pairs and return an ImportResult"""
+        start = time.perf_counter()
+        created = 0
+        errors = []
+        batch = []
+        with transaction.atomic(using=self.using) if self.atomic == 'all' else nullcontext():
+            for line_number, record in records:
+                if isinstance(record, Exception):
+                    errors.append({'line': line_number, 'errors': [str(record)]})
+                    continue
+                serializer = RecipeImportSerializer(data=record)
+                if not serializer.is_valid():
+                    errors.append({'line': line_number, 'errors': serializer.errors})
+                    continue
+                batch.append(serializer.validated_data)
+                if len(batch) >= self.batch_size:
+                    created += self.write_batch(batch)
+                    batch = []
+            if batch:
+                created += self.write_batch(batch)
+        return ImportResult(created, errors, time.perf_counter() - start)
+
+    def write_batch(self, batch):
+        """Insert a batch of validated recipes with their relations"""
+        with transaction.atomic(using=self.using):
+            tag_ids = self.resolve(Tag, [name for data in batch for name in data['tags']])
+            ingredient_ids = self.resolve(Ingredient, [name for data in batch for name in data['ingredients']])
+            recipes = self.create_recipes([
+                Recipe(user=self.user, title=data['title'], time_minutes=data['time_minutes'],
+                       price=data['price'], link=data['link'])
+                for data in batch
+            ])
+
+            Recipe.tags.through.objects.using(self.using).bulk_create([
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_ids[name])
+                for recipe, data in zip(recipes, batch) for name in unique(data['tags'])
+            ])
+            Recipe.ingredients.through.objects.using(self.using).bulk_create([
+                Recipe.ingredients.through(recipe_id=recipe.pk, ingredient_id=ingredient_ids[name])
+                for recipe, data in zip(recipes, batch) for name in unique(data['ingredients'])
+            ])
+
+            recipe_ids = [recipe.pk for recipe in recipes]
+            transaction.on_commit(lambda: recipes_bulk_created.send(
+                sender=Recipe, user_id=self.user.pk, recipe_ids=recipe_ids, using=self.using), using=self.using)
+        return len(recipes)
+
+    def create_recipes(self, recipes):
+        """Insert the recipes, falling back to one INSERT each where bulk inserts cannot return ids"""
+        if connections[self.using].features.can_return_rows_from_bulk_insert:
+            return Recipe.objects.using(self.using).bulk_create(recipes, batch_size=self.batch_size)
+        for recipe in recipes:
+            # Like bulk_create, leave the per-recipe receivers' work to recipes_bulk_created
+            recipe._bulk_created = True
+            recipe.save(force_insert=True, using=self.using)
+        return recipes
+
+    def resolve(self, model, names):
+        """Return a name to id map for the names, creating the missing tags or ingredients"""
+        known = self.attribute_ids[model]
+        missing = [name for name in unique(names) if name not in known]
+        if missing:
+            found, _ = model.objects.db_manager(self.using).get_or_create_names(
+                self.user, missing, batch_size=self.batch_size)
+            known.update((name, instance.pk) for name, instance in found.items())
+        return known
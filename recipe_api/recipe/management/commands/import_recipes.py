@@ -0,0 +1,40 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.importer import ATOMIC_MODES, RecipeImporter, parse_ndjson
+
+
+class Command(BaseCommand):
+    """Django command to bulk import recipes for a user from an NDJSON file"""
+    help = 'Import recipes from NDJSON, one {"title", "time_minutes", "price", "link", "tags", "ingredients"} per line'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON file to import, or - for standard input')
+        parser.add_argument('--email', required=True, help='Email of the user owning the imported recipes')
+        parser.add_argument('--batch-size', type=int, default=500, help='Recipes inserted per batch')
+        parser.add_argument('--atomic', choices=ATOMIC_MODES, default='batch',
+                            help='Commit after each batch, or the whole import at once')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User {options["email"]} does not exist')
+        try:
+            importer = RecipeImporter(user, batch_size=options['batch_size'], atomic=options['atomic'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if options['path'] == '-':
+            result = importer.run(parse_ndjson(sys.stdin))
+        else:
+            with open(options['path'], encoding='utf-8') as lines:
+                result = importer.run(parse_ndjson(lines))
+
+        for error in result.errors[:20]:
+            self.stderr.write(f'Line {error["line"]}: {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} recipes in {result.elapsed:.2f}s '
+            f'({result.rows_per_second:.0f} rows/sec), {len(result.errors)} errors'))
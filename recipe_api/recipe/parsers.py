@@ -0,0 +1,17 @@
+from rest_framework.parsers import BaseParser
+
+from .importer import parse_ndjson
+
+
+class NDJSONParser(BaseParser):
+    """Parser for newline delimited JSON
+
+    Returns a lazy iterator of (line number, record) pairs read line by line
+    from the request stream, so large bodies are never decoded at once.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return iter(())
+        return parse_ndjson(stream)
@@ -0,0 +1,169 @@
+from functools import lru_cache, partial
+from operator import itemgetter
+
+from core.models import Recipe
+from django.core.files.storage import default_storage
+from django.db.models import QuerySet
+from rest_framework.response import Response
+
+from .serializers import RecipeSerializer
+
+RECIPE_COLUMNS = ('id', 'title', 'time_minutes', 'price', 'link')
+RECIPE_DETAIL_COLUMNS = RECIPE_COLUMNS + ('image', 'thumbnails')
+ATTRIBUTE_COLUMNS = ('id', 'name')
+
+
+@lru_cache(maxsize=None)
+def get_price_field():
+    """Return the serializer field rendering prices, so decimals format exactly like RecipeSerializer"""
+    return RecipeSerializer().fields['price']
+
+
+def select_recipe_ids(rows):
+    """Return the rows as a list and what selects their recipes in relation lookups
+
+    An unsliced queryset is selected by a subquery, so large unpaginated
+    lists bind no parameter per recipe; a page is selected by its ids.
+    """
+    if isinstance(rows, QuerySet) and not rows.query.is_sliced:
+        return list(rows), rows.order_by().values('id')
+    rows = list(rows)
+    return rows, [row['id'] for row in rows]
+
+
+def related_ids(through, field, recipe_ids):
+    """Return the ids related to each recipe, ordered by id, read from the through table alone"""
+    ids = {}
+    rows = through.objects.filter(recipe_id__in=recipe_ids).order_by(f'{field}_id')
+    for recipe_id, related_id in rows.values_list('recipe_id', f'{field}_id'):
+        ids.setdefault(recipe_id, []).append(related_id)
+    return ids
+
+
+def related_objects(through, field, recipe_ids):
+    """Return the {id, name} representations related to each recipe, ordered by id
+
+    Objects shared by several recipes are represented by the same dict, built once.
+    """
+    objects = {}
+    representations = {}
+    rows = through.objects.filter(recipe_id__in=recipe_ids).order_by(f'{field}_id')
+    for recipe_id, related_id, name in rows.values_list('recipe_id', f'{field}_id', f'{field}__name'):
+        representation = representations.get(related_id)
+        if representation is None:
+            representation = representations[related_id] = {'id': related_id, 'name': name}
+        objects.setdefault(recipe_id, []).append(representation)
+    return objects
+
+
+def serialize_rows(rows, fields, getters):
+    """Return a representation of each row with only the fields, in order, read by their getters"""
+    getters = [(name, getters[name]) for name in fields]
+    return [{name: get(row) for name, get in getters} for row in rows]
+
+
+def related(through, field, recipe_ids, expand):
+    """Return the ids, or the {id, name} representations when expanded, related to each recipe"""
+    return (related_objects if expand else related_ids)(through, field, recipe_ids)
+
+
+def serialize_recipes(rows, fields=None, expand=()):
+    """Return the RecipeSerializer representation of recipe rows from .values(*RECIPE_COLUMNS)
+
+    With fields, only those are rendered and relations left out are not
+    queried; the full representation keeps a dict literal, which is faster.
+    Relations in expand are rendered as {id, name} objects instead of ids,
+    still in one query per relation.
+    """
+    rows, recipe_ids = select_recipe_ids(rows)
+    ingredients = (related(Recipe.ingredients.through, 'ingredient', recipe_ids, 'ingredients' in expand)
+                   if rows and (fields is None or 'ingredients' in fields) else {})
+    tags = (related(Recipe.tags.through, 'tag', recipe_ids, 'tags' in expand)
+            if rows and (fields is None or 'tags' in fields) else {})
+    price = get_price_field().to_representation
+    if fields is not None:
+        return serialize_rows(rows, fields, {
+            'id': itemgetter('id'),
+            'title': itemgetter('title'),
+            'ingredients': lambda row: ingredients.get(row['id'], []),
+            'tags': lambda row: tags.get(row['id'], []),
+            'time_minutes': itemgetter('time_minutes'),
+            'price': lambda row: price(row['price']),
+            'link': itemgetter('link'),
+        })
+    return [{
+        'id': row['id'],
+        'title': row['title'],
+        'ingredients': ingredients.get(row['id'], []),
+        'tags': tags.get(row['id'], []),
+        'time_minutes': row['time_minutes'],
+        'price': price(row['price']),
+        'link': row['link'],
+    } for row in rows]
+
+
+def serialize_recipe_details(rows, request=None):
+    """Return the RecipeDetailSerializer representation of recipe rows from .values(*RECIPE_DETAIL_COLUMNS)"""
+    rows, recipe_ids = select_recipe_ids(rows)
+    ingredients = related_objects(Recipe.ingredients.through, 'ingredient', recipe_ids) if rows else {}
+    tags = related_objects(Recipe.tags.through, 'tag', recipe_ids) if rows else {}
+    price = get_price_field().to_representation
+    return [{
+        'id': row['id'],
+        'title': row['title'],
+        'ingredients': ingredients.get(row['id'], []),
+        'tags': tags.get(row['id'], []),
+        'time_minutes': row['time_minutes'],
+        'price': price(row['price']),
+        'link': row['link'],
+        'image': media_url(row['image'], request) if row['image'] else None,
+        'thumbnails': {size: media_url(name, request) for size, name in row['thumbnails'].items()},
+    } for row in rows]
+
+
+def serialize_attributes(rows, fields=None):
+    """Return the TagSerializer / IngredientSerializer representation of rows from .values(*ATTRIBUTE_COLUMNS)"""
+    if fields is not None:
+        return serialize_rows(rows, fields, {'id': itemgetter('id'), 'name': itemgetter('name')})
+    return [{'id': row['id'], 'name': row['name']} for row in rows]
+
+
+def media_url(name, request=None):
+    """Return the URL of a stored file, absolute when a request is available"""
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def fast_list(view, columns, serialize):
+    """List the view's queryset through .values() and a plain serialize function
+
+    With sparse fields only their columns, the primary key and the pagination
+    ordering columns are selected.
+    """
+    fields = view.get_sparse_fields() if hasattr(view, 'get_sparse_fields') else None
+    if fields is not None:
+        ordering = {name.lstrip('-') for name in getattr(view.paginator, 'ordering', ())}
+        columns = [column for column in columns if column in fields or column == 'id' or column in ordering]
+
+    rows = view.filter_queryset(view.get_queryset()).prefetch_related(None).values(*columns)
+    page = view.paginate_queryset(rows)
+    if page is not None:
+        return view.get_paginated_response(serialize(page, fields))
+    return Response(serialize(rows, fields))
+
+
+class FastRecipeListMixin:
+    """Serve the recipe list without instantiating models or running RecipeSerializer"""
+
+    def list(self, request, *args, **kwargs):
+        if self.get_serializer_class() is not RecipeSerializer:
+            return super().list(request, *args, **kwargs)
+        expand = self.get_expanded_fields() if hasattr(self, 'get_expanded_fields') else ()
+        return fast_list(self, RECIPE_COLUMNS, partial(serialize_recipes, expand=expand))
+
+
+class FastAttributeListMixin:
+    """Serve tag and ingredient lists without instantiating models or running their serializers"""
+
+    def list(self, request, *args, **kwargs):
+        return fast_list(self, ATTRIBUTE_COLUMNS, serialize_attributes)
@@ -0,0 +1,40 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Renderer for newline delimited JSON, one object per line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(json_line(row) for row in rows).encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """Renderer for comma separated values, used for error bodies of CSV endpoints"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(row.values() if isinstance(row, dict) else [row])
+        return buffer.getvalue().encode(self.charset)
+
+
+def json_line(row):
+    """Return a row as one line of newline delimited JSON"""
+    return json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n'
@@ -1,8 +1,11 @@
 from core.models import Tag, Ingredient, Recipe
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 
+from .fieldsets import SparseFieldsSerializerMixin
 
-class TagSerializer(serializers.ModelSerializer):
+
+class TagSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer for the tag object"""
 
     class Meta:
@@ -11,7 +14,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer for the ingredient object"""
 
     class Meta:
@@ -20,7 +23,12 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeAttributeNamesSerializer(serializers.Serializer):
+    """Serializer for a list of tag or ingredient names to get or create"""
+    names = serializers.ListField(child=serializers.CharField(max_length=255), allow_empty=False, max_length=1000)
+
+
+class RecipeSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer for the recipe object"""
     ingredients = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all(), many=True)
     tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(), many=True)
@@ -35,3 +43,37 @@ class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for the recipe detail object"""
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
+    thumbnails = serializers.SerializerMethodField()
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('image', 'thumbnails')
+        read_only_fields = ('id', 'image')
+
+    def get_thumbnails(self, recipe):
+        """Return the URL of each rendered thumbnail size"""
+        request = self.context.get('request')
+        urls = {}
+        for size, name in recipe.thumbnails.items():
+            url = default_storage.url(name)
+            urls[size] = request.build_absolute_uri(url) if request is not None else url
+        return urls
+
+
+class RecipeImageSerializer(serializers.ModelSerializer):
+    """Serializer for uploading images to recipes"""
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'image')
+        read_only_fields = ('id',)
+        extra_kwargs = {'image': {'required': True}}
+
+
+class RecipeImportSerializer(serializers.Serializer):
+    """Serializer validating one imported recipe, with tags and ingredients given by name"""
+    title = serializers.CharField(max_length=255)
+    time_minutes = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=5, decimal_places=2)
+    link = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    tags = serializers.ListField(child=serializers.CharField(max_length=255), required=False, default=list)
+    ingredients = serializers.ListField(child=serializers.CharField(max_length=255), required=False, default=list)
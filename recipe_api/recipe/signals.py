@@ -0,0 +1,89 @@
+from core.models import Ingredient, Recipe, Tag
+from core.signals import is_bulk_created, recipes_bulk_created
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_versions_on_commit, reset_user_version
+from .cookable import record_write
+
+
+@receiver(post_save, sender=get_user_model())
+def start_user_version(sender, instance, created, **kwargs):
+    """Give a new user a fresh data version"""
+    if created:
+        reset_user_version(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def bump_version_on_write(sender, instance, using, **kwargs):
+    """Invalidate the cached responses of the owner of a written recipe, tag or ingredient"""
+    if sender is Recipe:
+        bump_versions_on_commit(instance.user_id, recipe_id=instance.pk, using=using)
+    else:
+        bump_versions_on_commit(instance.user_id, attributes=True, using=using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_version_on_relation_change(sender, instance, action, reverse, using, **kwargs):
+    """Invalidate the cached responses of the owner when recipe tags or ingredients change"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if reverse:
+            bump_versions_on_commit(instance.user_id, attributes=True, using=using)
+        else:
+            bump_versions_on_commit(instance.user_id, recipe_id=instance.pk, using=using)
+
+
+@receiver(recipes_bulk_created)
+def bump_version_on_bulk_create(sender, user_id, using='default', **kwargs):
+    """Invalidate the cached responses of the owner of recipes created in bulk"""
+    bump_versions_on_commit(user_id, attributes=True, using=using)
+
+
+@receiver(post_save, sender=Recipe)
+def index_created_recipe(sender, instance, created, **kwargs):
+    """Add a new recipe to its owner's cookable index"""
+    if created and not is_bulk_created(instance):
+        record_write(instance.user_id, lambda index: index.add_recipe(instance.pk), using=instance._state.db)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_deleted_recipe(sender, instance, **kwargs):
+    """Remove a deleted recipe from its owner's cookable index"""
+    record_write(instance.user_id, lambda index: index.remove_recipe(instance.pk), using=instance._state.db)
+
+
+@receiver(post_delete, sender=Ingredient)
+def unindex_deleted_ingredient(sender, instance, **kwargs):
+    """Remove a deleted ingredient, whose links go without m2m_changed, from the cookable index"""
+    record_write(instance.user_id, lambda index: index.remove_ingredient(instance.pk), using=instance._state.db)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def reindex_recipe_ingredients(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """Apply added and removed recipe ingredients to the owner's cookable index"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        pk_set = set(pk_set or ())
+        record_write(instance.user_id, lambda index: index.change_links(action, reverse, instance.pk, pk_set),
+                     using=using)
+
+
+@receiver(recipes_bulk_created)
+def index_bulk_created_recipes(sender, user_id, recipe_ids, using='default', **kwargs):
+    """Add recipes created in bulk, with their ingredients, to the owner's cookable index"""
+    links = list(Recipe.ingredients.through.objects.using(using).filter(recipe_id__in=recipe_ids)
+                 .values_list('recipe_id', 'ingredient_id'))
+
+    def update(index):
+        for recipe_id in recipe_ids:
+            index.add_recipe(recipe_id)
+        for recipe_id, ingredient_id in links:
+            index.link(recipe_id, (ingredient_id,))
+
+    record_write(user_id, update, using=using)
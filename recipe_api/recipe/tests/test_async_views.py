@@ -0,0 +1,95 @@
+import contextvars
+import threading
+
+from asgiref.sync import sync_to_async
+from core.async_views import sync_read
+from core.models import Ingredient, Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from user.authentication import token_cache
+
+ASYNC_RECIPES_URL = reverse('recipe:async-recipe-list')
+ASYNC_TAGS_URL = reverse('recipe:async-tag-list')
+ASYNC_INGREDIENTS_URL = reverse('recipe:async-ingredient-list')
+
+
+@override_settings(ASYNC_READS_THREAD_SENSITIVE=True)
+class AsyncReadViewsTests(TestCase):
+    """Test the async read endpoints match their sync counterparts"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(email='test@test.com', password='TestAsync', name='Test')
+        self.token = Token.objects.create(user=self.user)
+        self.recipe = Recipe.objects.create(user=self.user, title='Ramen', time_minutes=30, price=9.50)
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Japanese'))
+        self.recipe.ingredients.add(Ingredient.objects.create(user=self.user, name='Noodles'))
+        self.async_client = AsyncClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    async def get(self, url):
+        return await self.async_client.get(url, authorization=f'Token {self.token.key}')
+
+    async def test_endpoints_match_sync_views(self):
+        """Test async list and detail responses equal the sync API bodies"""
+        pairs = (
+            (ASYNC_RECIPES_URL, reverse('recipe:recipe-list')),
+            (reverse('recipe:async-recipe-detail', args=[self.recipe.id]),
+             reverse('recipe:recipe-detail', args=[self.recipe.id])),
+            (ASYNC_TAGS_URL, reverse('recipe:tag-list')),
+            (ASYNC_INGREDIENTS_URL, reverse('recipe:ingredient-list')),
+        )
+        for async_url, sync_url in pairs:
+            response = await self.get(async_url)
+            expected = await self.sync_get(sync_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json(), expected)
+
+    async def sync_get(self, url):
+        return (await sync_to_async(self.client.get)(url)).json()
+
+    async def test_authentication_required(self):
+        """Test async endpoints reject missing or invalid tokens"""
+        response = await self.async_client.get(ASYNC_RECIPES_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+        response = await self.async_client.get(ASYNC_TAGS_URL, authorization='Token invalid')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_recipe_limited_to_user(self):
+        """Test the async detail does not expose other users' recipes"""
+        other = await sync_to_async(get_user_model().objects.create_user)(email='other@test.com', password='Other')
+        recipe = await sync_to_async(Recipe.objects.create)(user=other, title='Secret', time_minutes=1, price=1)
+
+        response = await self.get(reverse('recipe:async-recipe-detail', args=[recipe.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_get_only(self):
+        """Test the async endpoints are read only"""
+        response = await self.async_client.post(ASYNC_TAGS_URL, {}, authorization=f'Token {self.token.key}')
+
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+@override_settings(ASYNC_READS_THREAD_SENSITIVE=False)
+class SyncReadTests(SimpleTestCase):
+
+    async def test_reads_run_in_dedicated_pool(self):
+        """Test concurrent reads run in the async-reads pool and see the context of the awaiting request"""
+        request_id = contextvars.ContextVar('request_id')
+        request_id.set(7)
+
+        def read():
+            return threading.current_thread().name, request_id.get()
+
+        name, value = await sync_read(read)()
+
+        self.assertTrue(name.startswith('async-reads'))
+        self.assertEqual(value, 7)
@@ -0,0 +1,66 @@
+from core.models import Ingredient
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..autocomplete import NameIndex, autocomplete_names, name_indexes
+
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class NameIndexTests(SimpleTestCase):
+
+    def test_search(self):
+        """Test prefix searches bisect the normalised names and stop at the limit"""
+        index = NameIndex(1, [(1, 'salt'), (2, 'Salmon'), (3, 'Sage'), (4, 'SALT'), (5, 'Pepper')])
+
+        self.assertEqual([row['id'] for row in index.search('sal', 10)], [2, 1, 4])
+        self.assertEqual(index.search('sal', 1), [{'id': 2, 'name': 'Salmon'}])
+        self.assertEqual(index.search('z', 10), [])
+
+
+@override_settings(AUTOCOMPLETE_CACHE={'HOT_AFTER': 2, 'EAGER': True}, RESPONSE_CACHE={'ENABLED': True})
+class NameIndexCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('names@test.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for name in ('Salt', 'salmon', 'Sage', 'Pepper', 'sAlsa verde'):
+            Ingredient.objects.create(user=self.user, name=name)
+        name_indexes.clear()
+
+    def tearDown(self):
+        name_indexes.clear()
+
+    def get_names(self, prefix):
+        return [row['name'] for row in self.client.get(INGREDIENTS_URL, {'prefix': prefix}).data]
+
+    def test_matches_database_order(self):
+        """Test the in-memory index answers exactly like the database lookup, non-ASCII names included"""
+        for name in ('Éclair', 'éPOISSES', 'Straße', 'STRASSENBROT', 'ﬁg jam'):
+            Ingredient.objects.create(user=self.user, name=name)
+        queryset = Ingredient.objects.filter(user=self.user)
+        index = NameIndex.build(Ingredient, self.user.pk, 0)
+        for prefix in ('s', 'SAL', 'salsa v', 'p', 'x', 'é', 'É', 'strass', 'STRAß', 'FI'):
+            expected = list(autocomplete_names(queryset, prefix).values('id', 'name')[:10])
+            self.assertEqual(index.search(prefix, 10), expected)
+
+        self.assertEqual(len(index.search('É', 10)), 2)
+        self.assertEqual(len(index.search('strass', 10)), 2)
+        self.assertEqual(index.search('fig', 10), [{'id': queryset.get(name='ﬁg jam').id, 'name': 'ﬁg jam'}])
+
+    def test_hot_users_served_from_memory(self):
+        """Test users become cached after HOT_AFTER lookups and writes reload their index"""
+        self.assertEqual(self.get_names('sal'), ['salmon', 'sAlsa verde', 'Salt'])
+        self.assertEqual(self.get_names('sal'), ['salmon', 'sAlsa verde', 'Salt'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_names('sa'), ['Sage', 'salmon', 'sAlsa verde', 'Salt'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(user=self.user, name='Saffron')
+        self.assertEqual(self.get_names('saf'), ['Saffron'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_names('saf'), ['Saffron'])
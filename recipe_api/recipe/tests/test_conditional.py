@@ -0,0 +1,95 @@
+from core.models import Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def get_recipe_detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': True})
+class ConditionalGetTests(TestCase):
+    """Test ETag and If-None-Match support"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='test@test.com', password='TestETag')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe1 = Recipe.objects.create(user=self.user, title='Pizza', time_minutes=20, price=8.00)
+        self.recipe2 = Recipe.objects.create(user=self.user, title='Pasta', time_minutes=15, price=6.00)
+
+    def test_list_not_modified(self):
+        """Test a list request with a current ETag returns 304 without a body or queries"""
+        response = self.client.get(RECIPES_URL)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    @override_settings(RESPONSE_CACHE={'ENABLED': False})
+    def test_no_etag_without_shared_versions(self):
+        """Test no ETag is sent while the data versions are not shared by every process"""
+        list_response = self.client.get(RECIPES_URL)
+        detail_response = self.client.get(get_recipe_detail_url(self.recipe1.id), HTTP_IF_NONE_MATCH='*')
+
+        self.assertNotIn('ETag', list_response)
+        self.assertEqual(detail_response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', detail_response)
+
+    def test_list_modified_after_write(self):
+        """Test a write changes the list ETag"""
+        etag = self.client.get(TAGS_URL)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=self.user, name='Italian')
+
+        response = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail_etag_is_per_recipe(self):
+        """Test editing one recipe keeps the other recipe's ETag valid"""
+        etag1 = self.client.get(get_recipe_detail_url(self.recipe1.id))['ETag']
+        etag2 = self.client.get(get_recipe_detail_url(self.recipe2.id))['ETag']
+
+        self.recipe1.title = 'Pizza margherita'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe1.save()
+
+        response1 = self.client.get(get_recipe_detail_url(self.recipe1.id), HTTP_IF_NONE_MATCH=etag1)
+        response2 = self.client.get(get_recipe_detail_url(self.recipe2.id), HTTP_IF_NONE_MATCH=etag2)
+        self.assertEqual(response1.status_code, status.HTTP_200_OK)
+        self.assertEqual(response2.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_modified_by_tag_rename(self):
+        """Test renaming a tag changes the ETag of recipe details"""
+        tag = Tag.objects.create(user=self.user, name='Italian')
+        self.recipe1.tags.add(tag)
+        etag = self.client.get(get_recipe_detail_url(self.recipe1.id))['ETag']
+
+        tag.name = 'Mediterranean'
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.save()
+
+        response = self.client.get(get_recipe_detail_url(self.recipe1.id), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['tags'][0]['name'], 'Mediterranean')
+
+    def test_deleted_recipe_not_found(self):
+        """Test a deleted recipe returns 404 even with its old ETag"""
+        etag = self.client.get(get_recipe_detail_url(self.recipe1.id))['ETag']
+        self.recipe1.delete()
+
+        response = self.client.get(get_recipe_detail_url(self.recipe1.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
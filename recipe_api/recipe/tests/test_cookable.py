@@ -0,0 +1,154 @@
+import random
+
+from core.models import Ingredient, Recipe
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..cache import bump_cookable_version
+from ..cookable import IngredientIndex, indexes, rank_in_database
+
+COOKABLE_URL = reverse('recipe:recipe-cookable')
+
+
+def brute_force_rank(recipes, have, limit):
+    ranked = []
+    for recipe_id, ingredients in recipes.items():
+        matched = len(ingredients & have)
+        if matched:
+            ranked.append((-matched / len(ingredients), len(ingredients) - matched, recipe_id, matched,
+                           len(ingredients), sorted(ingredients - have)))
+    return [(recipe_id, matched, required, missing)
+            for _, _, recipe_id, matched, required, missing in sorted(ranked)[:limit]]
+
+
+class IngredientIndexTests(SimpleTestCase):
+
+    def test_rank_matches_brute_force(self):
+        """Test the bit-sliced ranking agrees with counting ingredients recipe by recipe"""
+        rng = random.Random(7)
+        recipes = {recipe_id: set(rng.sample(range(40), rng.randint(1, 12))) for recipe_id in range(1, 300)}
+        index = IngredientIndex(version=0)
+        for recipe_id, ingredients in recipes.items():
+            index.add_recipe(recipe_id)
+            index.link(recipe_id, ingredients)
+
+        for recipe_id in range(1, 300, 7):
+            index.remove_recipe(recipe_id)
+            del recipes[recipe_id]
+        for recipe_id in range(1000, 1020):
+            recipes[recipe_id] = {recipe_id % 40, (recipe_id + 1) % 40}
+            index.add_recipe(recipe_id)
+            index.link(recipe_id, recipes[recipe_id])
+        index.remove_ingredient(3)
+        for ingredients in recipes.values():
+            ingredients.discard(3)
+        recipes = {recipe_id: ingredients for recipe_id, ingredients in recipes.items() if ingredients}
+
+        for _ in range(20):
+            have = set(rng.sample(range(40), rng.randint(1, 25)))
+            self.assertEqual(index.rank(have, 25), brute_force_rank(recipes, have, 25))
+
+    def test_reuses_freed_positions(self):
+        """Test deleted recipes free their bit position for the next recipe"""
+        index = IngredientIndex(version=0)
+        for recipe_id in (1, 2, 3):
+            index.add_recipe(recipe_id)
+        index.remove_recipe(2)
+        index.add_recipe(4)
+
+        self.assertEqual(index.positions[4], 1)
+        self.assertEqual(len(index.recipe_ids), 3)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': True})
+class CookableApiTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('cook@test.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rice, self.egg, self.leek = (Ingredient.objects.create(user=self.user, name=name)
+                                          for name in ('Rice', 'Egg', 'Leek'))
+        self.fried_rice = self.create_recipe('Fried rice', self.rice, self.egg, self.leek)
+        self.omelette = self.create_recipe('Omelette', self.egg)
+        self.create_recipe('Toast')
+
+    def create_recipe(self, title, *ingredients):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(user=self.user, title=title, time_minutes=5, price=1)
+            recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def get_ranking(self, have, **params):
+        return self.client.get(COOKABLE_URL, {'have': ','.join(str(item.id) for item in have), **params})
+
+    def test_rank_by_coverage(self):
+        """Test recipes are ranked by the share of ingredients on hand, with the missing ones"""
+        response = self.get_ranking([self.egg, self.rice])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'id': self.omelette.id, 'title': 'Omelette', 'coverage': 1.0, 'matched': 1, 'required': 1,
+             'missing': []},
+            {'id': self.fried_rice.id, 'title': 'Fried rice', 'coverage': 0.6667, 'matched': 2, 'required': 3,
+             'missing': [self.leek.id]},
+        ])
+
+    def test_limit(self):
+        """Test the ranking is cut at the limit, which is validated"""
+        self.assertEqual(len(self.get_ranking([self.egg], limit=1).data), 1)
+        self.assertEqual(self.get_ranking([self.egg], limit=0).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(COOKABLE_URL, {'have': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_writes_update_index_in_place(self):
+        """Test committed writes are applied to the cached index without rebuilding it"""
+        self.get_ranking([self.egg])
+        index = indexes._indexes[self.user.pk]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fried_rice.ingredients.remove(self.rice, self.leek)
+            self.omelette.delete()
+        response = self.get_ranking([self.egg])
+
+        self.assertIs(indexes._indexes[self.user.pk], index)
+        self.assertEqual([row['id'] for row in response.data], [self.fried_rice.id])
+        self.assertEqual(response.data[0]['coverage'], 1.0)
+
+    def test_write_from_another_process_rebuilds_index(self):
+        """Test a version change the index did not see itself makes it rebuild"""
+        self.get_ranking([self.egg])
+        index = indexes._indexes[self.user.pk]
+        Recipe.ingredients.through.objects.filter(recipe=self.omelette).delete()
+        bump_cookable_version(self.user.pk)
+
+        response = self.get_ranking([self.egg])
+
+        self.assertIsNot(indexes._indexes[self.user.pk], index)
+        self.assertEqual([row['id'] for row in response.data], [self.fried_rice.id])
+
+    def test_database_ranking_matches_index(self):
+        """Test the database ranking agrees with the in-memory index, ties included"""
+        rng = random.Random(3)
+        ingredients = [Ingredient.objects.create(user=self.user, name=f'Ingredient {number}') for number in range(12)]
+        for number in range(40):
+            self.create_recipe(f'Recipe {number}', *rng.sample(ingredients, rng.randint(0, 6)))
+        index = IngredientIndex.build(self.user.pk, 0)
+
+        for _ in range(10):
+            have = {item.id for item in rng.sample(ingredients, rng.randint(1, 8))}
+            self.assertEqual(rank_in_database(self.user.pk, have, 15), index.rank(have, 15))
+
+    @override_settings(RESPONSE_CACHE={'ENABLED': False})
+    def test_ranked_by_database_without_shared_versions(self):
+        """Test processes without the shared version cache rank in the database instead of keeping indexes"""
+        indexes.clear()
+
+        with self.assertNumQueries(3):
+            response = self.get_ranking([self.egg, self.rice])
+
+        self.assertEqual([row['id'] for row in response.data], [self.omelette.id, self.fried_rice.id])
+        self.assertEqual(response.data[1]['missing'], [self.leek.id])
+        self.assertEqual(indexes._indexes, {})
@@ -0,0 +1,124 @@
+import json
+import tempfile
+from io import StringIO
+
+from core.models import Ingredient, Recipe, RecipeStats, Tag
+from core.stats import aggregate_stats
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def to_ndjson(records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+class RecipeImportTests(TestCase):
+    """Test bulk importing recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='test@test.com', password='TestImport')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.existing_tag = Tag.objects.create(user=self.user, name='Vegan')
+
+    def post_ndjson(self, body, **params):
+        url = BULK_URL + ('?' + '&'.join(f'{key}={value}' for key, value in params.items()) if params else '')
+        return self.client.post(url, body, content_type='application/x-ndjson')
+
+    def test_bulk_import(self):
+        """Test importing recipes resolves tags and ingredients by name"""
+        records = [
+            {'title': 'Hummus', 'time_minutes': 10, 'price': '3.50', 'tags': ['Vegan', 'Dip'],
+             'ingredients': ['Chickpeas', 'Tahini']},
+            {'title': 'Falafel', 'time_minutes': 30, 'price': '4.00', 'tags': ['Vegan'], 'ingredients': ['Chickpeas']},
+            {'title': 'Toast', 'time_minutes': 2, 'price': '0.50'},
+        ]
+
+        response = self.post_ndjson(to_ndjson(records), batch_size=2)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(response.data['error_count'], 0)
+        self.assertIn('rows_per_second', response.data)
+        hummus = Recipe.objects.get(user=self.user, title='Hummus')
+        self.assertEqual(sorted(tag.name for tag in hummus.tags.all()), ['Dip', 'Vegan'])
+        self.assertIn(self.existing_tag, hummus.tags.all())
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Ingredient.objects.filter(user=self.user, name='Chickpeas').count(), 1)
+        self.assertEqual(Recipe.objects.get(title='Falafel').ingredients.get().name, 'Chickpeas')
+
+    def test_bulk_import_reports_invalid_lines(self):
+        """Test invalid lines are skipped and reported with their line numbers"""
+        body = to_ndjson([{'title': 'Soup', 'time_minutes': 20, 'price': '2.00'}]) + 'not json\n' + \
+            to_ndjson([{'title': 'No price', 'time_minutes': 5}])
+
+        response = self.post_ndjson(body)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 3])
+
+    def test_bulk_import_batches_queries(self):
+        """Test tags are resolved and through rows inserted per batch, not per recipe"""
+        records = [{'title': f'Recipe {i}', 'time_minutes': 5, 'price': '1.00', 'tags': ['Vegan', f'Tag {i % 3}']}
+                   for i in range(40)]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_ndjson(to_ndjson(records), batch_size=20)
+
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(response.data['created'], 40)
+        self.assertEqual(len([sql for sql in statements if '"core_tag"' in sql]), 3)
+        self.assertEqual(len([sql for sql in statements if sql.startswith('INSERT INTO "core_recipe_tags"')]), 2)
+        self.assertEqual(Recipe.tags.through.objects.filter(recipe__user=self.user).count(), 80)
+
+    def test_bulk_import_updates_stats(self):
+        """Test imported recipes are counted once in the user's statistics"""
+        Recipe.objects.create(user=self.user, title='Existing', time_minutes=5, price='1.00')
+        records = [{'title': f'Recipe {i}', 'time_minutes': 5 * i, 'price': f'{i}.25', 'tags': ['Vegan'],
+                    'ingredients': [f'Ingredient {i % 2}']} for i in range(5)]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_ndjson(to_ndjson(records), batch_size=2)
+
+        stats = RecipeStats.objects.get(user=self.user)
+        expected = aggregate_stats(self.user.pk)
+        self.assertEqual(stats.recipe_count, 6)
+        self.assertEqual(stats.price_counts, expected.price_counts)
+        self.assertEqual(stats.tag_counts, {str(self.existing_tag.pk): 5})
+        self.assertEqual(stats.ingredient_counts, expected.ingredient_counts)
+
+    def test_bulk_import_saves_are_not_raw(self):
+        """Test recipes inserted one by one, where bulk inserts cannot return ids, are not saved as fixtures"""
+        saves = []
+
+        def record_save(sender, instance, raw, **kwargs):
+            saves.append(raw)
+
+        post_save.connect(record_save, sender=Recipe)
+        self.addCleanup(post_save.disconnect, record_save, sender=Recipe)
+        self.post_ndjson(to_ndjson([{'title': 'Soup', 'time_minutes': 5, 'price': '1.00'}]))
+
+        self.assertNotIn(True, saves)
+
+    def test_import_recipes_command(self):
+        """Test the import_recipes management command"""
+        records = [{'title': 'Pesto', 'time_minutes': 10, 'price': '2.50', 'ingredients': ['Basil']}]
+        out = StringIO()
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as source:
+            source.write(to_ndjson(records))
+            source.flush()
+            call_command('import_recipes', source.name, email=self.user.email, stdout=out)
+
+        self.assertIn('Imported 1 recipes', out.getvalue())
+        self.assertIn('rows/sec', out.getvalue())
+        self.assertTrue(Recipe.objects.filter(user=self.user, title='Pesto').exists())
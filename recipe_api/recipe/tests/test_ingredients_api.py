@@ -1,4 +1,4 @@
-from core.models import Ingredient
+from core.models import Ingredient, Recipe
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
@@ -8,6 +8,7 @@ from rest_framework.test import APIClient
 from ..serializers import IngredientSerializer
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
+INGREDIENTS_BULK_URL = reverse('recipe:ingredient-bulk')
 
 
 class PublicIngredientsApiTest(TestCase):
@@ -70,3 +71,34 @@ class PrivateIngredientsApiTest(TestCase):
         response = self.client.post(INGREDIENTS_URL, payload)
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_ingredient_duplicate_name(self):
+        """Test creating an ingredient with a name the user already has is rejected"""
+        Ingredient.objects.create(user=self.user, name='Salt')
+        response = self.client.post(INGREDIENTS_URL, {'name': 'Salt'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Ingredient.objects.filter(user=self.user, name='Salt').count(), 1)
+
+    def test_bulk_get_or_create_ingredients(self):
+        """Test resolving ingredient names creates the missing ones"""
+        Ingredient.objects.create(user=self.user, name='Salt')
+        response = self.client.post(INGREDIENTS_BULK_URL, {'names': ['Salt', 'Pepper']}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([ingredient['name'] for ingredient in response.data], ['Salt', 'Pepper'])
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 2)
+
+    def test_retrieve_ingredients_assigned_only(self):
+        """Test filtering ingredients by those assigned to recipes"""
+        ingredient1 = Ingredient.objects.create(user=self.user, name='Assigned')
+        ingredient2 = Ingredient.objects.create(user=self.user, name='Unassigned')
+        for title in ('Apple crumble', 'Apple pie'):
+            recipe = Recipe.objects.create(user=self.user, title=title, time_minutes=5, price=10.00)
+            recipe.ingredients.add(ingredient1)
+
+        response = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, IngredientSerializer([ingredient1], many=True).data)
+        self.assertNotIn(IngredientSerializer(ingredient2).data, response.data)
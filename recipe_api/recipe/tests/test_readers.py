@@ -0,0 +1,124 @@
+import os
+import time
+from decimal import Decimal
+from unittest import skipUnless
+
+from core.models import Ingredient, Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from ..readers import (ATTRIBUTE_COLUMNS, RECIPE_COLUMNS, RECIPE_DETAIL_COLUMNS, serialize_attributes,
+                       serialize_recipe_details, serialize_recipes)
+from ..serializers import IngredientSerializer, RecipeDetailSerializer, RecipeSerializer, TagSerializer
+
+BENCHMARKS = bool(os.environ.get('RECIPE_API_BENCHMARKS'))
+
+
+def create_catalogue(user, count):
+    """Create recipes sharing a handful of tags and ingredients"""
+    tags = [Tag.objects.create(user=user, name=f'Tag {i}') for i in range(5)]
+    ingredients = [Ingredient.objects.create(user=user, name=f'Ingredient {i}') for i in range(8)]
+    Recipe.objects.bulk_create([
+        Recipe(user=user, title=f'Recipe {i}', time_minutes=i % 90, price=Decimal(i % 1000) / 10,
+               link=f'https://example.com/{i}' if i % 2 else '')
+        for i in range(count)
+    ])
+    recipes = list(Recipe.objects.filter(user=user))
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe=recipe, tag=tags[(recipe.id + offset) % 5])
+        for recipe in recipes for offset in range(recipe.id % 3)
+    ])
+    Recipe.ingredients.through.objects.bulk_create([
+        Recipe.ingredients.through(recipe=recipe, ingredient=ingredients[(recipe.id * 3 + offset) % 8])
+        for recipe in recipes for offset in range(recipe.id % 4)
+    ])
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class FastReaderEquivalenceTests(TestCase):
+    """Test the fast read path renders byte-identical output to the serializers"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='test@test.com', password='TestReaders')
+        create_catalogue(self.user, 30)
+        Recipe.objects.filter(id=Recipe.objects.first().id).update(
+            image='uploads/recipe/a.jpg', thumbnails={'small': 'uploads/recipe/a_small.webp'})
+        self.recipes = Recipe.objects.filter(user=self.user).order_by('id')
+
+    def test_recipes_identical(self):
+        """Test recipe rows match RecipeSerializer"""
+        expected = RecipeSerializer(self.recipes.prefetch_related('tags', 'ingredients'), many=True).data
+        fast = serialize_recipes(self.recipes.values(*RECIPE_COLUMNS))
+
+        self.assertEqual(render(fast), render(expected))
+
+    def test_relations_of_querysets_use_subqueries(self):
+        """Test relations of a whole queryset are selected by a subquery, and those of a page by its ids"""
+        with CaptureQueriesContext(connection) as queries:
+            serialize_recipes(self.recipes.values(*RECIPE_COLUMNS))
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(all('IN (SELECT' in query['sql'].upper() for query in queries.captured_queries[1:]))
+
+        with CaptureQueriesContext(connection) as queries:
+            page = serialize_recipes(self.recipes.values(*RECIPE_COLUMNS)[:5])
+        self.assertEqual(len(page), 5)
+        self.assertFalse(any('IN (SELECT' in query['sql'].upper() for query in queries.captured_queries))
+
+    def test_recipe_details_identical(self):
+        """Test recipe detail rows match RecipeDetailSerializer, including media URLs"""
+        request = RequestFactory().get('/')
+        expected = RecipeDetailSerializer(self.recipes, many=True, context={'request': request}).data
+        fast = serialize_recipe_details(self.recipes.values(*RECIPE_DETAIL_COLUMNS), request)
+
+        self.assertEqual(render(fast), render(expected))
+
+    def test_expanded_recipes(self):
+        """Test expanded relations match the nested serializers and share one dict per object"""
+        recipes = self.recipes.prefetch_related('tags', 'ingredients')
+        fast = serialize_recipes(self.recipes.values(*RECIPE_COLUMNS), expand=('ingredients', 'tags'))
+
+        for recipe, row in zip(recipes, fast):
+            self.assertEqual(render(row['tags']), render(TagSerializer(recipe.tags.all(), many=True).data))
+            self.assertEqual(render(row['ingredients']),
+                             render(IngredientSerializer(recipe.ingredients.all(), many=True).data))
+        tags = [tag for row in fast for tag in row['tags']]
+        self.assertEqual(len({id(tag) for tag in tags}), len({tag['id'] for tag in tags}))
+
+    def test_attributes_identical(self):
+        """Test tag and ingredient rows match their serializers"""
+        tags = Tag.objects.filter(user=self.user).order_by('-name')
+        ingredients = Ingredient.objects.filter(user=self.user).order_by('-name')
+
+        self.assertEqual(render(serialize_attributes(tags.values(*ATTRIBUTE_COLUMNS))),
+                         render(TagSerializer(tags, many=True).data))
+        self.assertEqual(render(serialize_attributes(ingredients.values(*ATTRIBUTE_COLUMNS))),
+                         render(IngredientSerializer(ingredients, many=True).data))
+
+
+@skipUnless(BENCHMARKS, 'Set RECIPE_API_BENCHMARKS=1 to run benchmarks')
+class FastReaderBenchmark(TestCase):
+
+    def test_recipe_list_10k(self):
+        """Benchmark RecipeSerializer against the fast read path at 10k rows"""
+        user = get_user_model().objects.create_user(email='bench@test.com', password='BenchReaders')
+        create_catalogue(user, 10000)
+        recipes = Recipe.objects.filter(user=user).order_by('id')
+
+        def serializer_path():
+            return render(RecipeSerializer(recipes.prefetch_related('tags', 'ingredients'), many=True).data)
+
+        def fast_path():
+            return render(serialize_recipes(recipes.values(*RECIPE_COLUMNS)))
+
+        self.assertEqual(fast_path(), serializer_path())
+        for name, path in (('RecipeSerializer', serializer_path), ('fast path', fast_path)):
+            start = time.perf_counter()
+            for _ in range(3):
+                path()
+            print(f'\n{name}: {(time.perf_counter() - start) / 3 * 1000:.1f} ms for 10k recipes')
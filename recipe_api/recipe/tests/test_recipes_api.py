@@ -1,13 +1,30 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from base64 import urlsafe_b64encode
+from decimal import Decimal
+from unittest.mock import patch
+
+from PIL import Image
 from core.models import Recipe, Tag, Ingredient
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from ..serializers import RecipeSerializer, RecipeDetailSerializer
+from ..serializers import RecipeSerializer, RecipeDetailSerializer, TagSerializer
+from ..thumbnails import get_executor, render_thumbnails
+from ..views import RecipeViewSet
 
 RECIPES_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+STATS_URL = reverse('recipe:recipe-stats')
 
 
 def create_sample_recipe(user, **params):
@@ -33,6 +50,16 @@ def get_recipe_detail_url(recipe_id):
     return reverse('recipe:recipe-detail', args=[recipe_id])
 
 
+def get_similar_url(recipe_id):
+    """Get the similar recipes url"""
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+def get_image_upload_url(recipe_id):
+    """Get the recipe image upload url"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
 class PublicRecipesTest(TestCase):
     """Test public recipes APIs"""
 
@@ -170,3 +197,419 @@ class PrivateRecipesTest(TestCase):
         self.assertEqual(recipe.price, payload['price'])
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 0)
+
+    def test_list_recipes_paginated(self):
+        """Test listing recipes page by page with keyset cursors"""
+        recipes = [create_sample_recipe(user=self.user, title=f'Recipe {i}') for i in range(5)]
+
+        response = self.client.get(RECIPES_URL, {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in response.data['results']], [recipes[0].id, recipes[1].id])
+
+        seen = [r['id'] for r in response.data['results']]
+        next_url = response.data['next']
+        while next_url:
+            response = self.client.get(next_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(r['id'] for r in response.data['results'])
+            next_url = response.data['next']
+
+        self.assertEqual(seen, [recipe.id for recipe in recipes])
+
+    def test_list_recipes_paginated_no_offset_or_count(self):
+        """Test deep recipe pages are selected by key without OFFSET or COUNT"""
+        for i in range(3):
+            create_sample_recipe(user=self.user, title=f'Recipe {i}')
+
+        first = self.client.get(RECIPES_URL, {'page_size': 1})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(first.data['next'])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sql = ' '.join(query['sql'].upper() for query in queries.captured_queries)
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
+
+    def test_list_recipes_invalid_cursor(self):
+        """Test an invalid cursor is rejected"""
+        response = self.client.get(RECIPES_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_recipes_cursor_of_wrong_type(self):
+        """Test a well formed cursor holding values of the wrong type is rejected"""
+        for position in (['abc'], [None], [[1]]):
+            cursor = urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+            response = self.client.get(RECIPES_URL, {'cursor': cursor})
+
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def assert_list_queries(self, count):
+        """Assert listing `count` recipes with tags and ingredients costs a fixed number of queries"""
+        tag = create_sample_tag(user=self.user)
+        ingredient = create_sample_ingredient(user=self.user)
+        Recipe.objects.bulk_create(
+            [Recipe(user=self.user, title=f'Recipe {i}', time_minutes=10, price=5.00) for i in range(count)])
+        recipes = Recipe.objects.filter(user=self.user)
+        Recipe.tags.through.objects.bulk_create(
+            [Recipe.tags.through(recipe=recipe, tag=tag) for recipe in recipes])
+        Recipe.ingredients.through.objects.bulk_create(
+            [Recipe.ingredients.through(recipe=recipe, ingredient=ingredient) for recipe in recipes])
+
+        with self.assertNumQueries(3):
+            response = self.client.get(RECIPES_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), count)
+        self.assertEqual(response.data[-1]['tags'], [tag.id])
+        self.assertEqual(response.data[-1]['ingredients'], [ingredient.id])
+
+    def test_list_recipes_queries_1(self):
+        """Test listing a single recipe does not issue per-recipe queries"""
+        self.assert_list_queries(1)
+
+    def test_list_recipes_queries_100(self):
+        """Test listing 100 recipes does not issue per-recipe queries"""
+        self.assert_list_queries(100)
+
+    def test_list_recipes_queries_1000(self):
+        """Test listing 1,000 recipes does not issue per-recipe queries"""
+        self.assert_list_queries(1000)
+
+    def test_retrieve_recipe_detail_queries(self):
+        """Test retrieving recipe detail prefetches nested tags and ingredients"""
+        recipe = create_sample_recipe(user=self.user)
+        recipe.tags.add(create_sample_tag(user=self.user), create_sample_tag(user=self.user, name='Other tag'))
+        recipe.ingredients.add(create_sample_ingredient(user=self.user))
+
+        with self.assertNumQueries(3):
+            response = self.client.get(get_recipe_detail_url(recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['tags']), 2)
+
+    def test_list_recipes_sparse_fields(self):
+        """Test ?fields= selects fewer columns and skips the relation queries of omitted fields"""
+        recipe = create_sample_recipe(user=self.user, title='Pancakes', price='3.50')
+        recipe.tags.add(create_sample_tag(user=self.user))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(RECIPES_URL, {'fields': 'title,price,id'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'id': recipe.id, 'title': 'Pancakes', 'price': '3.50'}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('time_minutes', queries[0]['sql'])
+        self.assertNotIn('"link"', queries[0]['sql'])
+
+        with self.assertNumQueries(2):
+            response = self.client.get(RECIPES_URL, {'omit': 'ingredients', 'page_size': 1})
+        self.assertEqual(list(response.data['results'][0]), ['id', 'title', 'tags', 'time_minutes', 'price', 'link'])
+
+    def test_retrieve_recipe_sparse_fields(self):
+        """Test ?fields= and ?omit= on the detail narrow the selected columns and prefetches"""
+        recipe = create_sample_recipe(user=self.user, link='https://example.com')
+        recipe.ingredients.add(create_sample_ingredient(user=self.user))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(get_recipe_detail_url(recipe.id), {'fields': 'id,title,ingredients'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data), ['id', 'title', 'ingredients'])
+        self.assertEqual(len(response.data['ingredients']), 1)
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"link"', queries[0]['sql'])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(get_recipe_detail_url(recipe.id), {'omit': 'tags,ingredients'})
+        self.assertEqual(response.data['link'], 'https://example.com')
+
+    def test_list_recipes_expanded(self):
+        """Test ?expand= inlines tags and ingredients in one query per relation, whatever the page size"""
+        tags = [create_sample_tag(user=self.user, name=f'Tag {i}') for i in range(3)]
+        ingredient = create_sample_ingredient(user=self.user, name='Flour')
+        for i in range(20):
+            recipe = create_sample_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(*tags[:i % 3 + 1])
+            recipe.ingredients.add(ingredient)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(RECIPES_URL, {'expand': 'tags,ingredients'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 20)
+        self.assertEqual(response.data[1]['tags'], TagSerializer(tags[:2], many=True).data)
+        self.assertEqual(response.data[1]['ingredients'], [{'id': ingredient.id, 'name': 'Flour'}])
+
+        with self.assertNumQueries(2):
+            response = self.client.get(RECIPES_URL, {'expand': 'tags', 'fields': 'id,tags'})
+        self.assertEqual(list(response.data[0]), ['id', 'tags'])
+        self.assertEqual(response.data[0]['tags'], TagSerializer(tags[:1], many=True).data)
+
+        response = self.client.get(RECIPES_URL, {'expand': 'tags,user'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sparse_fields_invalid(self):
+        """Test unknown or all omitted fields are rejected"""
+        response = self.client.get(RECIPES_URL, {'fields': 'title,secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('secret', str(response.data['fields']))
+
+        response = self.client.get(RECIPES_URL, {'omit': ','.join(RecipeSerializer.Meta.fields)})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sparse_fields_ignored_on_write(self):
+        """Test ?fields= never drops fields from the input of a write"""
+        payload = {'title': 'Omelette', 'time_minutes': 5, 'price': '2.00'}
+        response = self.client.post(f'{RECIPES_URL}?fields=title', payload)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['time_minutes'], 5)
+
+    def test_recipe_stats(self):
+        """Test the statistics endpoint follows recipes created and updated through the API"""
+        tag = create_sample_tag(user=self.user, name='Vegan')
+        ingredient = create_sample_ingredient(user=self.user, name='Tofu')
+        payload = {'title': 'Tofu bowl', 'time_minutes': 25, 'price': '8.00', 'tags': [tag.id],
+                   'ingredients': [ingredient.id]}
+        self.client.post(RECIPES_URL, payload)
+        recipe = create_sample_recipe(user=self.user, price='4.00')
+        self.client.patch(get_recipe_detail_url(recipe.id), {'price': '6.00', 'tags': [tag.id]})
+
+        response = self.client.get(STATS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['recipe_count'], 2)
+        self.assertEqual(response.data['price'], {'average': Decimal('7.00'), 'median': Decimal('7.00')})
+        self.assertEqual(response.data['top_tags'], [{'id': tag.id, 'name': 'Vegan', 'count': 2}])
+        self.assertEqual(response.data['top_ingredients'], [{'id': ingredient.id, 'name': 'Tofu', 'count': 1}])
+
+    def test_similar_recipes(self):
+        """Test similar recipes are ranked by the Jaccard similarity of their tags and ingredients"""
+        tag = create_sample_tag(user=self.user, name='Vegan')
+        tofu = create_sample_ingredient(user=self.user, name='Tofu')
+        rice = create_sample_ingredient(user=self.user, name='Rice')
+        recipe = create_sample_recipe(user=self.user, title='Tofu rice bowl')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(tofu, rice)
+        close = create_sample_recipe(user=self.user, title='Tofu rice wrap')
+        close.ingredients.add(tofu, rice)
+        far = create_sample_recipe(user=self.user, title='Vegan curry')
+        far.tags.add(tag)
+        create_sample_recipe(user=self.user, title='Steak')
+        other_user = get_user_model().objects.create_user('other@test.com', 'testpass')
+        other_recipe = create_sample_recipe(user=other_user)
+        other_recipe.ingredients.add(create_sample_ingredient(user=other_user, name='Tofu'))
+
+        response = self.client.get(get_similar_url(recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'id': close.id, 'title': 'Tofu rice wrap', 'score': 0.6667},
+            {'id': far.id, 'title': 'Vegan curry', 'score': 0.3333},
+        ])
+        self.assertEqual(len(self.client.get(get_similar_url(recipe.id), {'k': 1}).data), 1)
+
+    def test_similar_recipes_invalid(self):
+        """Test an invalid k or another user's recipe is rejected"""
+        recipe = create_sample_recipe(user=self.user)
+        other_recipe = create_sample_recipe(user=get_user_model().objects.create_user('other@test.com', 'testpass'))
+
+        self.assertEqual(self.client.get(get_similar_url(recipe.id), {'k': 0}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(get_similar_url(recipe.id), {'k': 'ten'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(get_similar_url(other_recipe.id)).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filter_recipes_by_tags(self):
+        """Test filtering recipes matching any of the given tags"""
+        recipe1 = create_sample_recipe(user=self.user, title='Thai vegetable curry')
+        recipe2 = create_sample_recipe(user=self.user, title='Aubergine with tahini')
+        recipe3 = create_sample_recipe(user=self.user, title='Fish and chips')
+        tag1 = create_sample_tag(user=self.user, name='Vegan')
+        tag2 = create_sample_tag(user=self.user, name='Vegetarian')
+        recipe1.tags.add(tag1)
+        recipe2.tags.add(tag1, tag2)
+
+        response = self.client.get(RECIPES_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(r['id'] for r in response.data), [recipe1.id, recipe2.id])
+        self.assertNotIn(recipe3.id, [r['id'] for r in response.data])
+
+    def test_filter_recipes_by_all_tags_and_ingredients(self):
+        """Test filtering recipes matching all of the given tags and ingredients"""
+        recipe1 = create_sample_recipe(user=self.user, title='Posh beans on toast')
+        recipe2 = create_sample_recipe(user=self.user, title='Chicken cacciatore')
+        tag1 = create_sample_tag(user=self.user, name='Quick')
+        tag2 = create_sample_tag(user=self.user, name='Cheap')
+        ingredient = create_sample_ingredient(user=self.user, name='Beans')
+        recipe1.tags.add(tag1, tag2)
+        recipe1.ingredients.add(ingredient)
+        recipe2.tags.add(tag1)
+        recipe2.ingredients.add(ingredient)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'ingredients': str(ingredient.id), 'match': 'all'}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in response.data], [recipe1.id])
+        self.assertIn('core_recipe_tags', queries.captured_queries[0]['sql'])
+        self.assertIn('core_recipe_ingredients', queries.captured_queries[0]['sql'])
+
+    def test_filter_recipes_invalid_ids(self):
+        """Test filtering recipes with invalid ids is rejected"""
+        response = self.client.get(RECIPES_URL, {'tags': '1,abc'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_recipes(self):
+        """Test searching recipes by title, tag and ingredient names"""
+        recipe1 = create_sample_recipe(user=self.user, title='Lemon drizzle cake')
+        recipe2 = create_sample_recipe(user=self.user, title='Roast dinner')
+        recipe2.ingredients.add(create_sample_ingredient(user=self.user, name='Lemon'))
+        recipe3 = create_sample_recipe(user=self.user, title='Summer salad')
+        recipe3.tags.add(create_sample_tag(user=self.user, name='Lemon-free'))
+        create_sample_recipe(user=self.user, title='Beef stew')
+
+        response = self.client.get(RECIPES_URL, {'search': 'lemon'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(r['id'] for r in response.data), [recipe1.id, recipe2.id, recipe3.id])
+
+    def test_search_recipes_not_paginated(self):
+        """Test search results, ordered by relevance, reject the id ordered keyset pagination"""
+        create_sample_recipe(user=self.user, title='Lemon drizzle cake')
+
+        for params in ({'page_size': 1}, {'cursor': 'WzFd'}):
+            response = self.client.get(RECIPES_URL, {'search': 'lemon', **params})
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('search', response.data)
+
+
+class RecipeExportTests(TestCase):
+    """Test streaming the recipe catalogue export"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='test@test.com', password='TestExport')
+        self.client.force_authenticate(self.user)
+        tag = create_sample_tag(user=self.user, name='Dinner')
+        for i in range(5):
+            recipe = create_sample_recipe(user=self.user, title=f'Recipe {i}', price=4.5)
+            recipe.tags.add(tag)
+            recipe.ingredients.add(create_sample_ingredient(user=self.user, name=f'Ingredient {i}'))
+        create_sample_recipe(user=get_user_model().objects.create_user(email='other@test.com', password='Other'))
+
+    def test_export_ndjson(self):
+        """Test exporting recipes as newline delimited JSON"""
+        response = self.client.get(EXPORT_URL, {'format': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['title'], 'Recipe 0')
+        self.assertEqual(rows[0]['price'], '4.50')
+        self.assertEqual(rows[0]['tags'], ['Dinner'])
+        self.assertEqual(rows[0]['ingredients'], ['Ingredient 0'])
+
+    def test_export_csv(self):
+        """Test exporting recipes as CSV"""
+        response = self.client.get(EXPORT_URL, {'format': 'csv'})
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[4]['tags'], 'Dinner')
+        self.assertEqual(rows[4]['ingredients'], 'Ingredient 4')
+
+    @patch.object(RecipeViewSet, 'export_chunk_size', 2)
+    def test_export_queries_per_chunk(self):
+        """Test each chunk of recipes costs one query per relation"""
+        response = self.client.get(EXPORT_URL)
+        with self.assertNumQueries(1 + 3 * 2):
+            rows = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(len(rows), 5)
+
+
+class RecipeImageUploadTests(TestCase):
+    """Test uploading recipe images"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            RECIPE_THUMBNAILS={'SIZES': {'small': 32, 'large': 64}, 'FORMAT': 'JPEG', 'EAGER': True})
+        self.settings_override.enable()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='test@test.com', password='TestImage')
+        self.client.force_authenticate(self.user)
+        self.recipe = create_sample_recipe(user=self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def upload_image(self, size=(200, 100)):
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', size).save(image_file, format='JPEG')
+            image_file.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.client.post(get_image_upload_url(self.recipe.id), {'image': image_file},
+                                        format='multipart')
+
+    def test_upload_image_to_recipe(self):
+        """Test uploading an image to a recipe renders its thumbnails"""
+        response = self.upload_image()
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('image', response.data)
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertEqual(set(self.recipe.thumbnails), {'small', 'large'})
+        with Image.open(os.path.join(self.media_root, self.recipe.thumbnails['small'])) as thumbnail:
+            self.assertEqual(thumbnail.size, (32, 16))
+
+    def test_upload_replaces_previous_files(self):
+        """Test uploading a new image deletes the previous image and its thumbnails"""
+        self.upload_image()
+        self.recipe.refresh_from_db()
+        previous = [self.recipe.image.path] + [os.path.join(self.media_root, name)
+                                               for name in self.recipe.thumbnails.values()]
+
+        self.upload_image()
+        self.recipe.refresh_from_db()
+
+        self.assertFalse([path for path in previous if os.path.exists(path)])
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, self.recipe.thumbnails['small'])))
+
+    def test_detail_exposes_thumbnail_urls(self):
+        """Test the recipe detail lists a URL per thumbnail size"""
+        self.upload_image()
+
+        response = self.client.get(get_recipe_detail_url(self.recipe.id))
+
+        self.assertEqual(set(response.data['thumbnails']), {'small', 'large'})
+        self.assertTrue(response.data['thumbnails']['large'].startswith('http://testserver/media/'))
+
+    def test_upload_image_bad_request(self):
+        """Test uploading an invalid image"""
+        response = self.client.post(get_image_upload_url(self.recipe.id), {'image': 'not image'}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_render_thumbnails_in_worker_process(self):
+        """Test thumbnails render in the process pool"""
+        source = os.path.join(self.media_root, 'source.png')
+        target = os.path.join(self.media_root, 'target.webp')
+        Image.new('RGBA', (300, 300)).save(source)
+
+        get_executor().submit(render_thumbnails, source, [(target, 50)], 'WEBP', 80).result(timeout=30)
+
+        with Image.open(target) as thumbnail:
+            self.assertEqual(thumbnail.size, (50, 50))
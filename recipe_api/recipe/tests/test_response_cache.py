@@ -0,0 +1,111 @@
+import tempfile
+
+from core.models import Recipe, Tag
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..cache import stats
+from ..checks import check_shared_version_cache
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': True})
+class ResponseCacheTests(TestCase):
+    """Test the per-user versioned response cache"""
+
+    def setUp(self):
+        caches['default'].clear()
+        stats.reset()
+        self.user = get_user_model().objects.create_user(email='test@test.com', password='TestCache')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(user=self.user, title='Pancakes', time_minutes=10, price=3.00)
+
+    def test_cached_list_skips_database(self):
+        """Test a repeated list request is served without queries"""
+        first = self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPES_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(stats.snapshot(), {'hits': 1, 'misses': 1})
+
+    def test_write_invalidates(self):
+        """Test writing a recipe invalidates the cached list"""
+        self.client.get(RECIPES_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(user=self.user, title='Waffles', time_minutes=15, price=4.00)
+
+        response = self.client.get(RECIPES_URL)
+
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data), 2)
+
+    def test_versions_bumped_on_commit(self):
+        """Test a write only invalidates the cached list once its transaction commits"""
+        self.client.get(RECIPES_URL)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Recipe.objects.create(user=self.user, title='Waffles', time_minutes=15, price=4.00)
+            self.assertEqual(self.client.get(RECIPES_URL)['X-Cache'], 'HIT')
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(RECIPES_URL)['X-Cache'], 'MISS')
+
+    def test_relation_change_invalidates_detail(self):
+        """Test adding a tag and renaming it invalidates the cached recipe detail"""
+        url = reverse('recipe:recipe-detail', args=[self.recipe.id])
+        self.client.get(url)
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.tags.add(tag)
+
+        response = self.client.get(url)
+        self.assertEqual(response.data['tags'], [{'id': tag.id, 'name': 'Breakfast'}])
+
+        tag.name = 'Brunch'
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data['tags'], [{'id': tag.id, 'name': 'Brunch'}])
+
+    def test_cache_is_per_user(self):
+        """Test users never receive each other's cached responses"""
+        self.client.get(TAGS_URL)
+        other = get_user_model().objects.create_user(email='other@test.com', password='TestOther')
+        Tag.objects.create(user=other, name='Vegan')
+        self.client.force_authenticate(other)
+
+        response = self.client.get(TAGS_URL)
+
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual([tag['name'] for tag in response.data], ['Vegan'])
+
+    def test_file_based_backend(self):
+        """Test the response cache works with a file based backend"""
+        with tempfile.TemporaryDirectory() as location:
+            backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+            with override_settings(CACHES={'default': backend}):
+                self.client.get(RECIPES_URL)
+                response = self.client.get(RECIPES_URL)
+
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_process_local_cache_rejected(self):
+        """Test the system check requires the data versions to be shared by every process"""
+        self.assertEqual([error.id for error in check_shared_version_cache(None)], ['recipe.E001'])
+
+        backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}
+        with override_settings(CACHES={'default': backend}):
+            self.assertEqual(check_shared_version_cache(None), [])
+        with override_settings(RESPONSE_CACHE={'ENABLED': False}):
+            self.assertEqual(check_shared_version_cache(None), [])
@@ -1,4 +1,4 @@
-from core.models import Tag
+from core.models import Tag, Recipe
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
@@ -8,6 +8,7 @@ from rest_framework.test import APIClient
 from ..serializers import TagSerializer
 
 TAGS_URL = reverse('recipe:tag-list')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
 
 
 class PublicTagsApiTest(TestCase):
@@ -69,3 +70,110 @@ class PrivateTagsApiTest(TestCase):
         response = self.client.post(TAGS_URL, payload)
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_tag_duplicate_name(self):
+        """Test creating a tag with a name the user already has is rejected"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        response = self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', response.data)
+        self.assertEqual(Tag.objects.filter(user=self.user, name='Vegan').count(), 1)
+
+    def test_same_tag_name_for_other_users(self):
+        """Test tag names are only unique per user"""
+        user2 = get_user_model().objects.create_user(email='another@test.com', password='AnotherTest')
+        Tag.objects.create(user=user2, name='Vegan')
+        response = self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_bulk_get_or_create_tags(self):
+        """Test resolving tag names creates only the missing ones and keeps the request order"""
+        existing = Tag.objects.create(user=self.user, name='Vegan')
+        payload = {'names': ['Quick', 'Vegan', 'Quick', 'Dinner']}
+
+        with self.assertNumQueries(3):
+            response = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([tag['name'] for tag in response.data], ['Quick', 'Vegan', 'Dinner'])
+        self.assertEqual(response.data[1]['id'], existing.id)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 3)
+
+    def test_bulk_get_existing_tags(self):
+        """Test resolving names that all exist takes a single query and creates nothing"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        with self.assertNumQueries(1):
+            response = self.client.post(TAGS_BULK_URL, {'names': ['Vegan']}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['name'], 'Vegan')
+
+    def test_bulk_tags_invalid(self):
+        """Test resolving an empty list of names is rejected"""
+        response = self.client.post(TAGS_BULK_URL, {'names': []}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_tags_paginated(self):
+        """Test listing tags page by page keeps the name ordering"""
+        for name in ('Vegan', 'Dessert', 'Vegetarian', 'Breakfast'):
+            Tag.objects.create(user=self.user, name=name)
+
+        seen = []
+        response = self.client.get(TAGS_URL, {'page_size': 1})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        tags = Tag.objects.filter(user=self.user).order_by('-name')
+        self.assertEqual(seen, TagSerializer(tags, many=True).data)
+
+    def test_retrieve_tags_assigned_only(self):
+        """Test filtering tags by those assigned to recipes"""
+        tag1 = Tag.objects.create(user=self.user, name='Assigned')
+        tag2 = Tag.objects.create(user=self.user, name='Unassigned')
+        for title in ('Apple crumble', 'Apple pie'):
+            recipe = Recipe.objects.create(user=self.user, title=title, time_minutes=5, price=10.00)
+            recipe.tags.add(tag1)
+
+        response = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, TagSerializer([tag1], many=True).data)
+        self.assertNotIn(TagSerializer(tag2).data, response.data)
+
+    def test_autocomplete_tags(self):
+        """Test tags are autocompleted by name prefix or substring, ignoring case, ordered by name"""
+        for name in ('Vegetarian', 'vegan', 'Very spicy', 'Dessert', 'Cheap vegan'):
+            Tag.objects.create(user=self.user, name=name)
+        Tag.objects.create(user=get_user_model().objects.create_user('other@test.com', 'testpass'), name='Vegan')
+
+        response = self.client.get(TAGS_URL, {'prefix': 'veg'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag['name'] for tag in response.data], ['vegan', 'Vegetarian'])
+        response = self.client.get(TAGS_URL, {'q': 'EGA', 'limit': 1})
+        self.assertEqual([tag['name'] for tag in response.data], ['Cheap vegan'])
+        response = self.client.get(TAGS_URL, {'prefix': 'v', 'q': 'an'})
+        self.assertEqual([tag['name'] for tag in response.data], ['vegan', 'Vegetarian'])
+        self.assertEqual(self.client.get(TAGS_URL, {'prefix': 'v', 'limit': 101}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_list_tags_sparse_fields(self):
+        """Test ?fields= narrows tag pages, which still paginate by name"""
+        for name in ('Vegan', 'Dessert', 'Breakfast'):
+            Tag.objects.create(user=self.user, name=name)
+
+        response = self.client.get(TAGS_URL, {'fields': 'name', 'page_size': 2})
+        self.assertEqual(response.data['results'], [{'name': 'Vegan'}, {'name': 'Dessert'}])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'], [{'name': 'Breakfast'}])
+
+        response = self.client.get(TAGS_URL, {'prefix': 'v', 'omit': 'name'})
+        self.assertEqual(response.data, [{'id': Tag.objects.get(name='Vegan').id}])
@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from core.models import Recipe
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+from .cache import bump_recipe_version, bump_user_version
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'SIZES': {'small': 160, 'medium': 480, 'large': 1080},
+    'FORMAT': 'WEBP',
+    'QUALITY': 80,
+    'WORKERS': 2,
+    'EAGER': False,
+}
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_config(name):
+    """Return a thumbnail setting from RECIPE_THUMBNAILS"""
+    return getattr(settings, 'RECIPE_THUMBNAILS', {}).get(name, DEFAULTS[name])
+
+
+def get_executor():
+    """Return the process pool rendering thumbnails, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=get_config('WORKERS'))
+        return _executor
+
+
+def get_thumbnail_names(image_name):
+    """Return the storage name of each thumbnail size of an image"""
+    root = os.path.splitext(image_name)[0]
+    extension = EXTENSIONS[get_config('FORMAT')]
+    return {size: f'{root}_{size}.{extension}' for size in get_config('SIZES')}
+
+
+def render_thumbnails(source_path, targets, image_format, quality):
+    """Resize the source image into each (target path, edge length) and re-encode it
+
+    Runs in a worker process, so it only takes and returns plain values.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        for path, edge in targets:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((edge, edge))
+            thumbnail.save(path, image_format, quality=quality)
+
+
+def generate_thumbnails(recipe_id, user_id, image_name):
+    """Render the thumbnails of a recipe image and record them on the recipe"""
+    names = get_thumbnail_names(image_name)
+    sizes = get_config('SIZES')
+    targets = [(default_storage.path(names[size]), sizes[size]) for size in names]
+    args = (default_storage.path(image_name), targets, get_config('FORMAT'), get_config('QUALITY'))
+
+    if get_config('EAGER'):
+        render_thumbnails(*args)
+        store_thumbnails(recipe_id, user_id, image_name, names)
+        return
+
+    future = get_executor().submit(render_thumbnails, *args)
+    future.add_done_callback(lambda done: _on_rendered(done, recipe_id, user_id, image_name, names))
+
+
+def _on_rendered(future, recipe_id, user_id, image_name, names):
+    try:
+        future.result()
+        store_thumbnails(recipe_id, user_id, image_name, names)
+    except Exception:
+        logger.exception('Failed to generate thumbnails for recipe %s', recipe_id)
+    finally:
+        connections.close_all()
+
+
+def store_thumbnails(recipe_id, user_id, image_name, names):
+    """Record rendered thumbnails, or delete them when the recipe image was replaced meanwhile"""
+    updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(thumbnails=names)
+    if updated:
+        bump_user_version(user_id)
+        bump_recipe_version(user_id, recipe_id)
+    else:
+        delete_files(names.values())
+
+
+def delete_files(names):
+    """Delete files from the media storage, logging the ones that could not be removed"""
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except OSError:
+            logger.exception('Failed to delete %s', name)
+
+
+def schedule_thumbnails(recipe, replaced_image=None, replaced_thumbnails=None):
+    """Generate thumbnails off the request thread once the upload is committed
+
+    The image and thumbnails the upload replaced are deleted at the same
+    time, once the recipe no longer refers to them.
+    """
+    recipe_id, user_id, image_name = recipe.pk, recipe.user_id, recipe.image.name
+    replaced = [name for name in (replaced_image, *(replaced_thumbnails or {}).values()) if name and name != image_name]
+
+    def on_commit():
+        delete_files(replaced)
+        generate_thumbnails(recipe_id, user_id, image_name)
+
+    transaction.on_commit(on_commit)
@@ -1,7 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register('tags', views.TagViewSet)
@@ -12,4 +12,8 @@ app_name = 'recipe'
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('async/recipes/', async_views.recipe_list, name='async-recipe-list'),
+    path('async/recipes/<int:pk>/', async_views.recipe_detail, name='async-recipe-detail'),
+    path('async/tags/', async_views.tag_list, name='async-tag-list'),
+    path('async/ingredients/', async_views.ingredient_list, name='async-ingredient-list'),
 ]
@@ -1,53 +1,302 @@
 from core.models import Tag, Ingredient, Recipe
-from rest_framework import viewsets, mixins
-from rest_framework.authentication import TokenAuthentication
+from core.replicas import ReplicaReadsMixin
+from core.search import search_recipes
+from core.similarity import get_similar
+from core.stats import get_stats, summarize_stats
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, OuterRef, Prefetch
+from django.http import StreamingHttpResponse
+from rest_framework import status, viewsets, mixins
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from user.authentication import CachedTokenAuthentication
 
-from .serializers import TagSerializer, IngredientSerializer, RecipeSerializer, RecipeDetailSerializer
+from .autocomplete import autocomplete_names, name_indexes
+from .cache import CachedListMixin, CachedRetrieveMixin, bump_versions_on_commit
+from .conditional import ConditionalListMixin, ConditionalRetrieveMixin
+from .cookable import rank_cookable
+from .export import csv_lines, iter_export_rows, ndjson_lines
+from .fieldsets import SparseFieldsMixin, get_only_columns
+from .importer import ATOMIC_MODES, RecipeImporter
+from .pagination import RecipeAttributePagination, RecipePagination
+from .parsers import NDJSONParser
+from .readers import ATTRIBUTE_COLUMNS, FastAttributeListMixin, FastRecipeListMixin, serialize_attributes
+from .renderers import CSVRenderer, NDJSONRenderer
+from .serializers import (TagSerializer, IngredientSerializer, RecipeSerializer, RecipeDetailSerializer,
+                          RecipeImageSerializer, RecipeAttributeNamesSerializer)
+from .thumbnails import schedule_thumbnails
 
 
-class BaseRecipeAttributeViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin):
+def params_to_ints(request, param):
+    """Convert a comma separated list of ids in a query parameter to a list of integers"""
+    value = request.query_params.get(param)
+    if not value:
+        return []
+    try:
+        return sorted({int(str_id) for str_id in value.split(',')})
+    except ValueError:
+        raise ValidationError({param: ['Expected a comma separated list of ids.']})
+
+
+def param_to_int(request, param, default, maximum):
+    """Return the integer between 1 and maximum in a query parameter, or the default when it is missing"""
+    try:
+        value = int(request.query_params.get(param, default))
+    except ValueError:
+        value = 0
+    if not 0 < value <= maximum:
+        raise ValidationError({param: [f'Expected an integer between 1 and {maximum}.']})
+    return value
+
+
+class BaseRecipeAttributeViewSet(ReplicaReadsMixin, ConditionalListMixin, CachedListMixin, FastAttributeListMixin,
+                                 SparseFieldsMixin, viewsets.GenericViewSet, mixins.ListModelMixin,
+                                 mixins.CreateModelMixin):
     """Base API view set for recipe attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeAttributePagination
+    recipe_field = None
+    autocomplete_limit = 10
+    autocomplete_max_limit = 100
 
     def get_queryset(self):
         """Return recipe attributes for the authenticated user"""
-        return self.queryset.filter(user=self.request.user).order_by('-name')
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.is_assigned_only():
+            through = getattr(Recipe, self.recipe_field).through
+            assigned = through.objects.filter(**{f'{self.queryset.model._meta.model_name}_id': OuterRef('pk')})
+            queryset = queryset.filter(Exists(assigned))
+        return queryset.order_by('-name')
+
+    def list(self, request, *args, **kwargs):
+        """List recipe attributes, or autocomplete their names when `prefix` or `q` is given"""
+        if 'prefix' in request.query_params or 'q' in request.query_params:
+            return self.autocomplete(request)
+        return super().list(request, *args, **kwargs)
+
+    def autocomplete(self, request):
+        """Return up to `limit` attributes whose name starts with `prefix` and contains `q`, ignoring case
+
+        Prefix lookups of users autocompleting a lot are answered from an
+        in-memory sorted name index, the others from the database indexes.
+        """
+        limit = param_to_int(request, 'limit', self.autocomplete_limit, self.autocomplete_max_limit)
+        prefix = request.query_params.get('prefix', '').strip()
+        term = request.query_params.get('q', '').strip()
+
+        if prefix and not term and not self.is_assigned_only():
+            rows = name_indexes.search(self.queryset.model, request.user.pk, prefix, limit)
+            if rows is not None:
+                return Response(serialize_attributes(rows, self.get_sparse_fields()))
+        rows = autocomplete_names(self.get_queryset(), prefix, term).values(*ATTRIBUTE_COLUMNS)[:limit]
+        return Response(serialize_attributes(rows, self.get_sparse_fields()))
+
+    def is_assigned_only(self):
+        """Return whether only attributes assigned to a recipe are requested"""
+        value = self.request.query_params.get('assigned_only', '0')
+        if value not in ('0', '1'):
+            raise ValidationError({'assigned_only': ['Expected 0 or 1.']})
+        return value == '1'
 
     def perform_create(self, serializer):
         """Create a new recipe attribute"""
-        serializer.save(user=self.request.user)
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise ValidationError({'name': ['You already have one with this name.']})
+
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Return the attributes with the given names, creating the missing ones in bulk"""
+        serializer = RecipeAttributeNamesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        names = serializer.validated_data['names']
+        found, created = self.queryset.model.objects.get_or_create_names(request.user, names)
+        if created:
+            bump_versions_on_commit(request.user.pk, attributes=True)
+
+        data = self.get_serializer([found[name] for name in dict.fromkeys(names)], many=True).data
+        return Response(data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
 
 class TagViewSet(BaseRecipeAttributeViewSet):
     """API view set for managing tags"""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    recipe_field = 'tags'
 
 
 class IngredientViewSet(BaseRecipeAttributeViewSet):
     """API view set for managing ingredients"""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    recipe_field = 'ingredients'
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadsMixin, ConditionalListMixin, ConditionalRetrieveMixin, CachedListMixin,
+                    CachedRetrieveMixin, FastRecipeListMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     """API view set for managing recipes"""
-    queryset = Recipe.objects.all()
+    queryset = Recipe.objects.defer('search_vector')
     serializer_class = RecipeSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipePagination
+    export_chunk_size = 2000
+    expandable_fields = ('ingredients', 'tags')
+    cookable_limit = 50
+    cookable_max_limit = 500
+    similar_k = 10
+    similar_max_k = 50
 
     def get_queryset(self):
         """Return the recipes for the authenticated user"""
-        return self.queryset.filter(user=self.request.user)
+        queryset = self.filter_by_attributes(self.queryset.filter(user=self.request.user))
+        queryset = self.filter_by_search(queryset)
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            queryset = queryset.only(*get_only_columns(Recipe, fields))
+        return queryset.prefetch_related(*self.get_prefetch_lookups())
+
+    def filter_by_attributes(self, queryset):
+        """Filter recipes by the `tags` and `ingredients` ids, matching any or all of them"""
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': ['Expected "any" or "all".']})
+
+        for field, through_field in (('tags', 'tag_id'), ('ingredients', 'ingredient_id')):
+            ids = params_to_ints(self.request, field)
+            if not ids:
+                continue
+            through = getattr(Recipe, field).through.objects.filter(**{f'{through_field}__in': ids})
+            if match == 'any':
+                queryset = queryset.filter(Exists(through.filter(recipe_id=OuterRef('pk'))))
+            else:
+                matched = through.values('recipe_id').annotate(matched=Count(through_field)).filter(matched=len(ids))
+                queryset = queryset.filter(pk__in=matched.values('recipe_id'))
+        return queryset
+
+    def filter_by_search(self, queryset):
+        """Filter recipes by the `search` term, ranked by relevance
+
+        Keyset pages are ordered by id, which would discard the ranking, so
+        search results cannot be paginated.
+        """
+        term = self.request.query_params.get('search', '').strip()
+        if not term:
+            return queryset
+        if self.paginator is not None and self.paginator.is_requested(self.request):
+            raise ValidationError({'search': ['Search results are ranked by relevance and cannot be paginated.']})
+        return search_recipes(queryset, term)
+
+    def get_prefetch_lookups(self):
+        """Return the prefetches needed to serialize the current action in a fixed number of queries
+
+        Relations left out by sparse fields are not prefetched.
+        """
+        if self.action in ('destroy', 'upload_image', 'export', 'similar'):
+            return ()
+        if issubclass(self.get_serializer_class(), RecipeDetailSerializer):
+            lookups = (
+                Prefetch('ingredients', queryset=Ingredient.objects.order_by('id')),
+                Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            )
+        else:
+            lookups = (
+                Prefetch('ingredients', queryset=Ingredient.objects.only('id').order_by('id')),
+                Prefetch('tags', queryset=Tag.objects.only('id').order_by('id')),
+            )
+        fields = self.get_sparse_fields()
+        return tuple(lookup for lookup in lookups if fields is None or lookup.prefetch_through in fields)
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
         if self.action == 'retrieve':
             return RecipeDetailSerializer
+        elif self.action == 'upload_image':
+            return RecipeImageSerializer
         return self.serializer_class
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+    @action(methods=['POST'], detail=True, url_path='upload-image')
+    def upload_image(self, request, pk=None):
+        """Upload an image to a recipe, streaming it to disk, and queue its thumbnails"""
+        request.upload_handlers = [TemporaryFileUploadHandler(request)]
+        recipe = self.get_object()
+        serializer = self.get_serializer(recipe, data=request.data)
+
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        replaced_image, replaced_thumbnails = recipe.image.name, recipe.thumbnails
+        recipe = serializer.save(thumbnails={})
+        schedule_thumbnails(recipe, replaced_image, replaced_thumbnails)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=False, renderer_classes=(NDJSONRenderer, CSVRenderer))
+    def export(self, request):
+        """Stream every recipe of the user as NDJSON or CSV (?format=ndjson|csv)"""
+        rows = iter_export_rows(self.get_queryset(), self.export_chunk_size)
+        renderer = request.accepted_renderer
+        content = csv_lines(rows) if renderer.format == 'csv' else ndjson_lines(rows)
+
+        response = StreamingHttpResponse(content, content_type=f'{renderer.media_type}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="recipes.{renderer.format}"'
+        return response
+
+    @action(methods=['GET'], detail=False)
+    def stats(self, request):
+        """Return recipe count, price average and median, time histogram and top tags and ingredients"""
+        stats = get_stats(request.user.pk)
+        return Response(summarize_stats(stats))
+
+    @action(methods=['GET'], detail=False)
+    def cookable(self, request):
+        """Rank recipes by the share of their ingredients on hand (?have=1,2&limit=50) and list the missing ones"""
+        have = params_to_ints(request, 'have')
+        limit = param_to_int(request, 'limit', self.cookable_limit, self.cookable_max_limit)
+
+        ranking = rank_cookable(request.user.pk, have, limit)
+        titles = dict(Recipe.objects.filter(user=request.user, pk__in=[row[0] for row in ranking])
+                      .values_list('id', 'title'))
+        return Response([
+            {'id': recipe_id, 'title': titles[recipe_id], 'coverage': round(matched / required, 4),
+             'matched': matched, 'required': required, 'missing': missing}
+            for recipe_id, matched, required, missing in ranking if recipe_id in titles
+        ])
+
+    @action(methods=['GET'], detail=True)
+    def similar(self, request, pk=None):
+        """Return the k recipes sharing the most tags and ingredients with the recipe (?k=10), by Jaccard similarity"""
+        k = param_to_int(request, 'k', self.similar_k, self.similar_max_k)
+        recipe = self.get_object()
+
+        similar = get_similar(recipe, k)
+        titles = dict(Recipe.objects.filter(user=request.user, pk__in=[row[0] for row in similar])
+                      .values_list('id', 'title'))
+        return Response([
+            {'id': recipe_id, 'title': titles[recipe_id], 'score': round(score, 4)}
+            for recipe_id, score in similar if recipe_id in titles
+        ])
+
+    @action(methods=['POST'], detail=False, url_path='bulk', parser_classes=(NDJSONParser,))
+    def bulk(self, request):
+        """Import recipes from an NDJSON body in batches (?batch_size=500&atomic=batch|all)"""
+        atomic = request.query_params.get('atomic', 'batch')
+        if atomic not in ATOMIC_MODES:
+            raise ValidationError({'atomic': [f'Expected one of {", ".join(ATOMIC_MODES)}.']})
+        try:
+            batch_size = int(request.query_params.get('batch_size', 500))
+            importer = RecipeImporter(request.user, batch_size=batch_size, atomic=atomic)
+        except ValueError:
+            raise ValidationError({'batch_size': ['Expected a positive integer.']})
+
+        result = importer.run(request.data)
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED)
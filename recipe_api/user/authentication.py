@@ -0,0 +1,190 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+DEFAULTS = {
+    'MAX_ENTRIES': 10000,
+    'TTL': 5,
+    'CACHE_ALIAS': None,
+}
+
+SHARED_KEY_PREFIX = 'auth-token:'
+GENERATION_KEY = 'auth-token-generation:{}'
+
+
+def get_config(name):
+    """Return a token cache setting from TOKEN_AUTH_CACHE"""
+    return getattr(settings, 'TOKEN_AUTH_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def token_digest(key):
+    """Return the digest the token key is cached under, so raw keys are never stored"""
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class TokenCache:
+    """Thread-safe process-local LRU of authenticated tokens with a time to live"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._user_digests = {}
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        """Return the cached (user id, payload, generation) for the digest, or None if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            expires, user_id, payload, generation = entry
+            if expires < time.monotonic():
+                self._remove(digest)
+                return None
+            self._entries.move_to_end(digest)
+            return user_id, payload, generation
+
+    def set(self, digest, user_id, payload, generation=None):
+        """Cache the payload, evicting the least recently used entries over the limit"""
+        with self._lock:
+            self._remove(digest)
+            self._entries[digest] = (time.monotonic() + get_config('TTL'), user_id, payload, generation)
+            self._user_digests.setdefault(user_id, set()).add(digest)
+            while len(self._entries) > get_config('MAX_ENTRIES'):
+                self._remove(next(iter(self._entries)))
+
+    def evict(self, digest):
+        """Remove the entry for the digest"""
+        with self._lock:
+            self._remove(digest)
+
+    def evict_user(self, user_id):
+        """Remove every entry belonging to the user"""
+        with self._lock:
+            for digest in list(self._user_digests.get(user_id, ())):
+                self._remove(digest)
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._user_digests.clear()
+
+    def _remove(self, digest):
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+        digests = self._user_digests.get(entry[1])
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._user_digests[entry[1]]
+
+
+token_cache = TokenCache()
+
+
+def get_shared_cache():
+    """Return the optional shared cache tier configured by TOKEN_AUTH_CACHE['CACHE_ALIAS']"""
+    alias = get_config('CACHE_ALIAS')
+    return caches[alias] if alias else None
+
+
+def get_generation(shared, digest):
+    """Return the shared generation of a token digest, initialising it if missing
+
+    Missing generations start from the clock, so an evicted one never
+    returns to a value older entries were cached under.
+    """
+    key = GENERATION_KEY.format(digest)
+    generation = shared.get(key)
+    if generation is None:
+        shared.add(key, time.time_ns(), None)
+        generation = shared.get(key)
+    return generation
+
+
+def bump_generations(digests):
+    """Reject the credentials of the token digests cached by any process under earlier generations"""
+    shared = get_shared_cache()
+    if shared is None:
+        return
+    for digest in digests:
+        try:
+            shared.incr(GENERATION_KEY.format(digest))
+        except ValueError:
+            shared.add(GENERATION_KEY.format(digest), time.time_ns(), None)
+
+
+def get_cached_credentials(key):
+    """Return the (user, token) cached in this process for a token key, or None
+
+    With a shared cache, hits must be checked against its generation, which
+    is left to authenticate_credentials, so None is returned.
+    """
+    if get_shared_cache() is not None:
+        return None
+    entry = token_cache.get(token_digest(key))
+    return pickle.loads(entry[1]) if entry is not None else None
+
+
+def invalidate_token(key, using='default'):
+    """Drop a token from every cache tier, and from other processes once the deletion commits"""
+    invalidate_digests([token_digest(key)], using)
+
+
+def invalidate_user(user_id, keys=(), using='default'):
+    """Drop the tokens of a user from every cache tier, and from other processes once the change commits"""
+    token_cache.evict_user(user_id)
+    invalidate_digests([token_digest(key) for key in keys], using)
+
+
+def invalidate_digests(digests, using='default'):
+    for digest in digests:
+        token_cache.evict(digest)
+    shared = get_shared_cache()
+    if shared is not None and digests:
+        shared.delete_many([SHARED_KEY_PREFIX + digest for digest in digests])
+        transaction.on_commit(lambda: bump_generations(digests), using=using)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the token and user lookup
+
+    Valid tokens are kept in a process-local LRU and, when configured, in a
+    shared Django cache, keyed by the SHA-256 digest of the token. Entries
+    expire after TOKEN_AUTH_CACHE['TTL'] seconds and are invalidated by
+    signals when the token is deleted or the user is saved. With a shared
+    cache, every hit is also checked against the user's shared generation,
+    which those signals bump, so other processes stop accepting the token
+    right away; without one they may keep it for up to the TTL.
+    """
+
+    def authenticate_credentials(self, key):
+        digest = token_digest(key)
+        shared = get_shared_cache()
+        # Read before the database, so an invalidation committing meanwhile rejects what is cached below
+        generation = get_generation(shared, digest) if shared is not None else None
+        entry = token_cache.get(digest)
+        if entry is None and shared is not None:
+            entry = shared.get(SHARED_KEY_PREFIX + digest)
+            if entry is not None:
+                token_cache.set(digest, *entry)
+        if entry is not None:
+            user_id, payload, cached_generation = entry
+            if cached_generation == generation:
+                return pickle.loads(payload)
+            token_cache.evict(digest)
+
+        user, token = super().authenticate_credentials(key)
+        entry = (user.pk, pickle.dumps((user, token), pickle.HIGHEST_PROTOCOL), generation)
+        token_cache.set(digest, *entry)
+        if shared is not None:
+            shared.set(SHARED_KEY_PREFIX + digest, entry, get_config('TTL'))
+        return user, token
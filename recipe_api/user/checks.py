@@ -0,0 +1,25 @@
+from core.checks import is_process_local_cache
+from django.core.checks import Error, Tags, register
+
+from .authentication import get_config
+
+# Longest time, in seconds, other processes may accept a revoked token without a shared cache
+MAX_LOCAL_TTL = 5
+
+
+@register(Tags.caches, Tags.security)
+def check_token_cache_invalidation(app_configs, **kwargs):
+    """Bound how long processes that did not handle a token deletion or user change keep accepting the token
+
+    Invalidation only reaches other processes through a shared cache;
+    without one their cached tokens live until the TTL expires.
+    """
+    alias = get_config('CACHE_ALIAS')
+    if (alias and not is_process_local_cache(alias)) or get_config('TTL') <= MAX_LOCAL_TTL:
+        return []
+    return [Error(
+        f'TOKEN_AUTH_CACHE keeps tokens for {get_config("TTL")} seconds without a shared cache to invalidate them.',
+        hint=f'Set TOKEN_AUTH_CACHE_ALIAS to a cache shared by every process, or TOKEN_AUTH_CACHE_TTL to at most '
+             f'{MAX_LOCAL_TTL}.',
+        id='user.E001',
+    )]
@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token, invalidate_user
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, using, **kwargs):
+    """Stop accepting a deleted token from the authentication cache"""
+    invalidate_token(instance.key, using)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_saved_user(sender, instance, created, using, **kwargs):
+    """Drop cached tokens when a user changes, e.g. is deactivated or has a new password"""
+    if not created:
+        keys = list(Token.objects.using(using).filter(user=instance).values_list('key', flat=True))
+        invalidate_user(instance.pk, keys, using)
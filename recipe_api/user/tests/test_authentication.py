@@ -0,0 +1,118 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from ..authentication import bump_generations, token_cache, token_digest
+from ..checks import check_token_cache_invalidation
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test the cached token authentication backend"""
+
+    def setUp(self):
+        token_cache.clear()
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='test@test.com', password='test123', name='Test')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cached_token_saves_lookup(self):
+        """Test repeated requests skip the token and user query"""
+        with self.assertNumQueries(1):
+            response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], self.user.email)
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token stops authenticating"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test a deactivated user stops authenticating"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates(self):
+        """Test changing the password drops the cached user"""
+        self.client.get(ME_URL)
+        self.user.set_password('newPassword')
+        self.user.save()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(TOKEN_AUTH_CACHE={'CACHE_ALIAS': 'default'})
+    def test_shared_cache_tier(self):
+        """Test the shared cache tier serves tokens missing from the local cache"""
+        self.client.get(ME_URL)
+        token_cache.clear()
+
+        with self.assertNumQueries(0):
+            response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.token.delete()
+        token_cache.clear()
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_AUTH_CACHE={'CACHE_ALIAS': 'default'})
+    def test_shared_cache_invalidates_other_processes(self):
+        """Test tokens cached locally are rejected once another process invalidates them in the shared cache"""
+        self.client.get(ME_URL)
+        with self.assertNumQueries(0):
+            self.client.get(ME_URL)
+
+        # Deactivate the user the way another process would be seen from here: the local entry stays
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+        bump_generations([token_digest(self.token.key)])
+        response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_AUTH_CACHE={'CACHE_ALIAS': 'default'})
+    def test_shared_cache_invalidated_on_commit(self):
+        """Test other processes stop accepting a token once its deletion commits"""
+        self.client.get(ME_URL)
+        digest = token_digest(self.token.key)
+        entry = token_cache.get(digest)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        # Another process still holds the entry in its local cache
+        token_cache.set(digest, *entry)
+        response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_local_ttl_bounded_without_shared_cache(self):
+        """Test the system check caps the TTL of tokens no other process can invalidate"""
+        self.assertEqual(check_token_cache_invalidation(None), [])
+
+        with override_settings(TOKEN_AUTH_CACHE={'TTL': 60}):
+            self.assertEqual([error.id for error in check_token_cache_invalidation(None)], ['user.E001'])
+        backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}
+        with override_settings(TOKEN_AUTH_CACHE={'TTL': 60, 'CACHE_ALIAS': 'default'}, CACHES={'default': backend}):
+            self.assertEqual(check_token_cache_invalidation(None), [])